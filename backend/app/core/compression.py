@@ -0,0 +1,24 @@
+from starlette.middleware.gzip import GZipMiddleware
+
+# ---------------------------------------------------------------------------
+# Compresion gzip solo para respuestas JSON de la API
+# ---------------------------------------------------------------------------
+# Los estaticos ya vienen precomprimidos y las imagenes (PNG/WebP/JPEG) no se reducen
+EXCLUDED_PREFIXES = ("/api/media", "/api/predict/heatmaps")
+
+
+class ApiGZipMiddleware:
+    """GZipMiddleware aplicado solo bajo /api, y solo a respuestas de al menos
+    `minimum_size` bytes (una prediccion con mapas y embeddings pesa decenas de KB)."""
+
+    def __init__(self, app, minimum_size: int = 1024, compresslevel: int = 6):
+        self.app = app
+        self.gzip = GZipMiddleware(app, minimum_size=minimum_size, compresslevel=compresslevel)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            path = scope["path"]
+            if path.startswith("/api/") and not path.startswith(EXCLUDED_PREFIXES):
+                await self.gzip(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
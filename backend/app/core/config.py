@@ -1,6 +1,7 @@
 from pydantic_settings import BaseSettings
 from typing import Optional
 import os
+import tempfile
 
 class Settings(BaseSettings):
     # App
@@ -16,6 +17,17 @@ class Settings(BaseSettings):
     JWT_SECRET_KEY: str = "tu-secreto-super-seguro-cambiar-en-produccion"
     JWT_ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24  # 24 horas
+    JWT_CACHE_SIZE: int = 1024
+    PASSWORD_HASH_WORKERS: int = 2
+    LOGIN_MAX_FAILURES: int = 5
+    # Limite por usuario (desde cualquier IP), mas holgado: frena la fuerza bruta distribuida
+    # sin que unos pocos intentos ajenos bloqueen la cuenta admin
+    LOGIN_USER_MAX_FAILURES: int = 50
+    LOGIN_WINDOW_SECONDS: float = 300.0
+    # Detras de un proxy (Railway) la IP real llega en X-Forwarded-For. Solo activar si el
+    # proxy agrega su entrada: se toma la N-esima desde la derecha (TRUSTED_PROXY_COUNT)
+    TRUST_PROXY_HEADERS: bool = False
+    TRUSTED_PROXY_COUNT: int = 1
 
     # CORS
     ALLOWED_ORIGINS: list = [
@@ -31,6 +43,84 @@ class Settings(BaseSettings):
     # AI Model (placeholder - actualizar cuando tengas el modelo)
     AI_MODEL_PATH: Optional[str] = None
 
+    # Runtime de torch: workers de inferencia concurrentes y threads por worker
+    # (None = derivar de la cuota de CPU del contenedor)
+    INFERENCE_WORKERS: int = 1
+    TORCH_INTRA_OP_THREADS: Optional[int] = None
+    TORCH_INTER_OP_THREADS: Optional[int] = None
+
+    # Precision de inferencia: "fp32", "bf16_autocast" o "bf16_weights".
+    # MODEL_PRECISION_OVERRIDES permite fijarla por modelo, ej. {"vit_b16": "bf16_weights"}
+    MODEL_PRECISION: str = "fp32"
+    MODEL_PRECISION_OVERRIDES: dict = {}
+    # Usar bf16 aunque la CPU no tenga instrucciones nativas (emulado, mas lento)
+    FORCE_BF16: bool = False
+
+    # Inferencias de prueba tras cargar cada modelo (minimo una)
+    WARMUP_ITERATIONS: int = 2
+
+    # Mapas Grad-CAM cacheados por digest de imagen (entradas imagen x modelo)
+    HEATMAP_CACHE_SIZE: int = 512
+    # Validez de las URLs firmadas de los overlays (incluyen una miniatura de la imagen)
+    HEATMAP_URL_TTL_SECONDS: int = 3600
+
+    # Embeddings de 256-d (modelos EA) guardados para busqueda de casos similares
+    EMBEDDINGS_ENABLED: bool = False
+    EMBEDDINGS_DIR: str = os.getenv("EMBEDDINGS_DIR", "/app/data/embeddings")
+    # Sincronizar matriz y meta.json cada N altas o tras N segundos (y siempre al cerrar)
+    EMBEDDINGS_FLUSH_EVERY: int = 64
+    EMBEDDINGS_FLUSH_INTERVAL_SECONDS: float = 30.0
+
+    # Registro write-behind de predicciones en MongoDB
+    RECORDER_BATCH_SIZE: int = 100
+    RECORDER_FLUSH_INTERVAL: float = 1.0
+    RECORDER_MAX_BUFFER: int = 5000
+    RECORDER_ENQUEUE_TIMEOUT: float = 2.0
+    RECORDER_DRAIN_TIMEOUT: float = 10.0
+
+    # Casi-duplicados por hash perceptual: "off", "flag" (solo marcar) o "reuse"
+    # (devolver el resultado almacenado). Salvo en "off", los duplicados exactos se reutilizan
+    NEAR_DUPLICATE_MODE: str = "flag"
+    NEAR_DUPLICATE_MAX_DISTANCE: int = 4
+
+    # Subida de imagenes: limite de tamano, umbral para pasar a disco y dimensiones
+    UPLOAD_MAX_BYTES: int = 30 * 1024 * 1024
+    # Por encima de este tamano la copia propia va a disco y no a RAM (la subida ya viene
+    # en el spool de Starlette: no conviene duplicarla entera en memoria)
+    UPLOAD_SPOOL_BYTES: int = 2 * 1024 * 1024
+    UPLOAD_SPOOL_DIR: str = os.path.join(tempfile.gettempdir(), "retinopatia_uploads")
+    UPLOAD_MIN_DIMENSION: int = 64
+    UPLOAD_MAX_PIXELS: int = 80_000_000
+
+    # Recorte del disco de retina antes del resize: "off" (cuadro completo) o "fundus"
+    ROI_CROP_MODE: str = "off"
+    ROI_THRESHOLD: int = 12
+    ROI_CACHE_SIZE: int = 4096
+
+    # Cache de /api/pages (respuestas serializadas + ETag)
+    PAGES_CACHE_TTL: float = 300.0
+    PAGES_CACHE_MAX_ENTRIES: int = 512
+    PAGES_CACHE_CONTROL: str = "public, no-cache"
+
+    # Imagenes del CMS: originales por digest + derivados WebP/JPEG por ancho
+    MEDIA_DIR: str = os.getenv("MEDIA_DIR", "/app/uploads/media" if os.path.isdir("/app/uploads") else
+                               os.path.join(os.path.dirname(__file__), "..", "..", "..", "uploads", "media"))
+    MEDIA_WIDTHS: list[int] = [320, 640, 1024, 1600]
+    MEDIA_FORMATS: list[str] = ["webp", "jpeg"]
+    MEDIA_QUALITY: int = 80
+    MEDIA_MAX_BYTES: int = 15 * 1024 * 1024
+
+    # Compresion gzip de respuestas /api a partir de este tamano (bytes)
+    API_GZIP_MIN_SIZE: int = 1024
+
+    # Logging: nivel, formato ("json" o "text") y fraccion de eventos DEBUG que se registran
+    LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: str = "json"
+    LOG_DEBUG_SAMPLE_RATE: float = 0.05
+
+    # Profiling bajo demanda (trazas y estadisticas de la ultima sesion)
+    PROFILER_DIR: str = os.path.join(tempfile.gettempdir(), "retinopatia_profiles")
+
     class Config:
         env_file = ".env"
         case_sensitive = True
@@ -0,0 +1,77 @@
+import logging
+import time
+from pymongo import ASCENDING, DESCENDING
+from app.core.database import get_database
+
+logger = logging.getLogger(__name__)
+
+# Indices de la coleccion de predicciones: cubren la paginacion por fecha (keyset sobre
+# createdAt + _id), el filtro por severidad y la busqueda por digest de imagen
+PREDICTION_INDEXES = [
+    {"keys": [("createdAt", DESCENDING), ("_id", DESCENDING)], "name": "createdAt_id"},
+    {"keys": [("consensus.severity", ASCENDING), ("createdAt", DESCENDING), ("_id", DESCENDING)],
+     "name": "severity_createdAt_id"},
+    {"keys": [("image_digest", ASCENDING), ("createdAt", DESCENDING)], "name": "image_digest_createdAt"},
+]
+
+# Unicidad de usuarios y slugs (reemplaza los find_one previos a cada insercion, que
+# tienen carrera) y un indice parcial solo con las paginas publicadas, ordenado por slug
+USER_INDEXES = [
+    {"keys": [("username", ASCENDING)], "name": "username_unique", "unique": True},
+]
+
+PAGE_INDEXES = [
+    {"keys": [("slug", ASCENDING)], "name": "slug_unique", "unique": True},
+    {"keys": [("isPublished", ASCENDING), ("slug", ASCENDING)], "name": "published_slug",
+     "partialFilterExpression": {"isPublished": True}},
+]
+
+INDEX_SPECS = {
+    "predictions": PREDICTION_INDEXES,
+    "users": USER_INDEXES,
+    "pages": PAGE_INDEXES,
+}
+
+# Estado de la ultima verificacion: "coleccion.nombre" -> {state, duration_ms, error}
+index_status: dict = {}
+
+
+async def ensure_indexes():
+    """Crear indices si no existen (create_index es idempotente).
+
+    Un fallo no bloquea el arranque: las consultas funcionan (mas lentas) sin indices. Un
+    indice unico falla si ya hay duplicados; queda registrado en index_status."""
+    db = get_database()
+    created = 0
+    for collection, specs in INDEX_SPECS.items():
+        for spec in specs:
+            label = f"{collection}.{spec['name']}"
+            options = {k: v for k, v in spec.items() if k not in ("keys", "name")}
+            index_status[label] = {"state": "building", "duration_ms": None, "error": None}
+            start = time.perf_counter()
+            try:
+                await db[collection].create_index(spec["keys"], name=spec["name"], background=True, **options)
+                index_status[label]["state"] = "ready"
+                created += 1
+            except Exception as e:
+                index_status[label]["state"] = "error"
+                index_status[label]["error"] = str(e)
+                logger.warning("No se pudo crear el indice %s: %s", label, e)
+            index_status[label]["duration_ms"] = round((time.perf_counter() - start) * 1000.0, 2)
+
+    total = sum(len(specs) for specs in INDEX_SPECS.values())
+    logger.info("Indices verificados (%d/%d)", created, total)
+
+
+def unique_index_ready(collection: str, name: str) -> bool:
+    """True si el indice unico quedo construido; si fallo o sigue en construccion, las
+    rutas que dependen de DuplicateKeyError deben verificar duplicados por su cuenta."""
+    return index_status.get(f"{collection}.{name}", {}).get("state") == "ready"
+
+
+def get_index_status() -> dict:
+    states = [entry["state"] for entry in index_status.values()]
+    return {
+        "ready": bool(states) and all(state == "ready" for state in states),
+        "indexes": index_status,
+    }
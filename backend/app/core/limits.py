@@ -0,0 +1,90 @@
+import json
+
+from fastapi import HTTPException
+
+# ---------------------------------------------------------------------------
+# Limite de tamano del cuerpo aplicado mientras se recibe (antes del parseo multipart)
+# ---------------------------------------------------------------------------
+# Margen para los encabezados y delimitadores del multipart
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+def _too_large_detail(limit: int) -> str:
+    return f"El archivo excede el tamano maximo permitido ({limit // (1024 * 1024)} MB)"
+
+
+class _BodyTooLarge(HTTPException):
+    """HTTPException para que FastAPI la propague tal cual: si se lanza mientras parsea el
+    formulario, cualquier otra excepcion se convierte en un 400 generico."""
+
+    def __init__(self, limit: int):
+        super().__init__(status_code=413, detail=_too_large_detail(limit), headers={"Connection": "close"})
+
+
+class BodySizeLimitMiddleware:
+    """Rechaza con 413 los cuerpos que superan el limite de su ruta.
+
+    Usa Content-Length si viene; si no (chunked), cuenta los bytes a medida que llegan y
+    corta la peticion en cuanto se excede, sin esperar a que termine la subida."""
+
+    def __init__(self, app, limits: dict):
+        self.app = app
+        # Prefijos mas largos primero
+        self.limits = sorted(limits.items(), key=lambda kv: len(kv[0]), reverse=True)
+
+    def _limit_for(self, path: str):
+        for prefix, limit in self.limits:
+            if path.startswith(prefix):
+                return limit
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in ("POST", "PUT", "PATCH"):
+            await self.app(scope, receive, send)
+            return
+
+        limit = self._limit_for(scope["path"])
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        content_length = headers.get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > limit:
+            await self._reject(send, limit)
+            return
+
+        received = 0
+        response_started = False
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    raise _BodyTooLarge(limit)
+            return message
+
+        async def tracking_send(message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracking_send)
+        except _BodyTooLarge:
+            if not response_started:
+                await self._reject(send, limit)
+
+    @staticmethod
+    async def _reject(send, limit: int):
+        body = json.dumps({"detail": _too_large_detail(limit)}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode()),
+                        (b"connection", b"close")],
+        })
+        await send({"type": "http.response.body", "body": body})
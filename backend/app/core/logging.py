@@ -0,0 +1,181 @@
+import atexit
+import logging
+import queue
+import random
+import sys
+import time
+import traceback
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
+import orjson
+
+from app.core.config import settings
+
+# ---------------------------------------------------------------------------
+# Logging estructurado: los handlers de la app solo encolan, un hilo escribe a stdout
+# ---------------------------------------------------------------------------
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+# Atributos estandar de LogRecord: todo lo demas viene de `extra=` y va al JSON
+_RESERVED_ATTRS = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+_listener: Optional[QueueListener] = None
+
+
+class JsonFormatter(logging.Formatter):
+    """Una linea JSON por registro: ts, level, logger, msg, request_id y los campos extra."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        elif record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        # default=str: un extra no serializable no debe perder el registro
+        return orjson.dumps(entry, default=str).decode("utf-8")
+
+
+class TextFormatter(logging.Formatter):
+    """Formato legible para desarrollo; agrega el request_id cuando lo hay."""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)-7s %(name)s %(message)s", datefmt="%H:%M:%S")
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        request_id = getattr(record, "request_id", None)
+        return f"{line} [req={request_id}]" if request_id else line
+
+
+class ContextQueueHandler(QueueHandler):
+    """Encola el registro con el request_id del contexto actual.
+
+    El mensaje y la traza de la excepcion se resuelven aqui (los argumentos pueden cambiar
+    despues); el formateo a JSON y la escritura ocurren en el hilo del QueueListener."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.request_id = request_id_var.get()
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = "".join(traceback.format_exception(*record.exc_info)).rstrip()
+            record.exc_info = None
+        return record
+
+
+class DebugSamplingFilter(logging.Filter):
+    """Deja pasar solo una fraccion de los DEBUG (eventos por request de alto volumen).
+    INFO y superiores pasan siempre."""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+        self.dropped = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG or self.rate >= 1.0:
+            return True
+        if random.random() < self.rate:
+            record.sample_rate = self.rate
+            return True
+        self.dropped += 1
+        return False
+
+
+def setup_logging():
+    """Configura el logger raiz una sola vez (idempotente)."""
+    global _listener
+    if _listener is not None:
+        return
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(JsonFormatter() if settings.LOG_FORMAT == "json" else TextFormatter())
+
+    log_queue: queue.Queue = queue.Queue(-1)
+    queue_handler = ContextQueueHandler(log_queue)
+    queue_handler.addFilter(DebugSamplingFilter(settings.LOG_DEBUG_SAMPLE_RATE))
+
+    root = logging.getLogger()
+    root.handlers = [queue_handler]
+    root.setLevel(settings.LOG_LEVEL.upper())
+
+    # Los logs de uvicorn pasan por la misma cola; el access log lo reemplaza
+    # RequestContextMiddleware (con request_id y duracion)
+    for name in ("uvicorn", "uvicorn.error"):
+        logging.getLogger(name).handlers = []
+        logging.getLogger(name).propagate = True
+    logging.getLogger("uvicorn.access").handlers = []
+    logging.getLogger("uvicorn.access").propagate = False
+
+    _listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging():
+    """Vacia la cola y detiene el hilo escritor."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+# Rutas de alto volumen que se registran en DEBUG (y por lo tanto se muestrean)
+_QUIET_PREFIXES = ("/static", "/uploads", "/health", "/ready")
+
+request_logger = logging.getLogger("app.request")
+
+
+class RequestContextMiddleware:
+    """Asigna un request_id (o respeta X-Request-ID), lo devuelve en la respuesta y registra
+    una linea por peticion con metodo, ruta, estado y duracion."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        incoming = headers.get(b"x-request-id", b"").decode("latin-1")
+        request_id = incoming[:64] if incoming else uuid.uuid4().hex[:16]
+        token = request_id_var.set(request_id)
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_with_id(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [(b"x-request-id", request_id.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            path = scope["path"]
+            is_quiet = path.startswith(_QUIET_PREFIXES) or not path.startswith("/api")
+            level = logging.DEBUG if is_quiet and status_code < 400 else logging.INFO
+            if request_logger.isEnabledFor(level):
+                request_logger.log(level, "%s %s %s", scope["method"], path, status_code, extra={
+                    "method": scope["method"],
+                    "path": path,
+                    "status": status_code,
+                    "duration_ms": round((time.perf_counter() - start) * 1000.0, 2),
+                })
+            request_id_var.reset(token)
@@ -0,0 +1,152 @@
+"""
+Configuracion del runtime de torch segun la CPU realmente disponible.
+
+Dentro de Docker/Railway torch ve todos los cores del host y no la cuota del contenedor,
+lo que provoca sobre-suscripcion. Aqui se lee la cuota de cgroup (v1 y v2) y la afinidad
+del proceso, y se reparten los threads entre los workers de inferencia.
+"""
+import asyncio
+import contextvars
+import logging
+import math
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_THREAD_ENV_VARS = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS")
+
+runtime_config: dict = {}
+_inference_executor: Optional[ThreadPoolExecutor] = None
+
+
+def _read_file(path: str) -> Optional[str]:
+    try:
+        with open(path, "r") as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def cgroup_cpu_quota() -> Optional[float]:
+    """CPUs permitidos por la cuota CFS del cgroup, o None si no hay limite."""
+    # cgroup v2: "<quota> <period>" o "max <period>"
+    cpu_max = _read_file("/sys/fs/cgroup/cpu.max")
+    if cpu_max:
+        quota, _, period = cpu_max.partition(" ")
+        if quota != "max" and period:
+            return int(quota) / int(period)
+        return None
+
+    # cgroup v1
+    quota = _read_file("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") or _read_file("/sys/fs/cgroup/cpu,cpuacct/cpu.cfs_quota_us")
+    period = _read_file("/sys/fs/cgroup/cpu/cpu.cfs_period_us") or _read_file("/sys/fs/cgroup/cpu,cpuacct/cpu.cfs_period_us")
+    if quota and period and int(quota) > 0:
+        return int(quota) / int(period)
+    return None
+
+
+def affinity_cpus() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except (AttributeError, OSError):
+        return os.cpu_count() or 1
+
+
+def detect_cpu_budget() -> dict:
+    quota = cgroup_cpu_quota()
+    affinity = affinity_cpus()
+    effective = affinity
+    if quota is not None:
+        # Redondear hacia abajo: una fraccion de CPU no sostiene un thread de computo completo
+        effective = min(affinity, max(1, math.floor(quota)))
+    return {
+        "host_cpus": os.cpu_count() or 1,
+        "affinity_cpus": affinity,
+        "cgroup_quota_cpus": quota,
+        "effective_cpus": max(1, effective),
+    }
+
+
+def plan_threads(effective_cpus: int, workers: int) -> tuple[int, int]:
+    """Threads intra-op e inter-op por worker para no exceder el presupuesto de CPU."""
+    env_intra = os.environ.get("OMP_NUM_THREADS")
+    if settings.TORCH_INTRA_OP_THREADS:
+        intra = settings.TORCH_INTRA_OP_THREADS
+    elif env_intra and env_intra.isdigit():
+        intra = int(env_intra)
+    else:
+        intra = max(1, effective_cpus // max(1, workers))
+    # Los modelos se ejecutan secuencialmente: el paralelismo inter-op no aporta
+    interop = settings.TORCH_INTER_OP_THREADS or 1
+    return intra, interop
+
+
+def configure_runtime() -> dict:
+    """Fija OMP/MKL y los pools de torch. Llamar antes de la primera operacion de torch."""
+    budget = detect_cpu_budget()
+    workers = max(1, settings.INFERENCE_WORKERS)
+    intra, interop = plan_threads(budget["effective_cpus"], workers)
+
+    for var in _THREAD_ENV_VARS:
+        os.environ[var] = str(intra)
+
+    import torch
+    torch.set_num_threads(intra)
+    try:
+        torch.set_num_interop_threads(interop)
+    except RuntimeError:
+        # Solo puede fijarse una vez y antes de usar el pool inter-op
+        interop = torch.get_num_interop_threads()
+
+    runtime_config.clear()
+    runtime_config.update({
+        **budget,
+        "inference_workers": workers,
+        "torch_intra_op_threads": torch.get_num_threads(),
+        "torch_inter_op_threads": interop,
+        "mkldnn_enabled": torch.backends.mkldnn.is_available(),
+    })
+    logger.info("CPUs efectivas=%s (host=%s, cuota=%s) workers=%s intra-op=%s inter-op=%s",
+                budget['effective_cpus'], budget['host_cpus'], budget['cgroup_quota_cpus'],
+                workers, intra, interop)
+    return runtime_config
+
+
+def _init_inference_worker(intra_threads: int):
+    import torch
+    torch.set_num_threads(intra_threads)
+
+
+def get_inference_executor() -> ThreadPoolExecutor:
+    """Pool acotado donde corre la inferencia, fuera del event loop."""
+    global _inference_executor
+    if _inference_executor is None:
+        workers = max(1, settings.INFERENCE_WORKERS)
+        intra = runtime_config.get("torch_intra_op_threads") or plan_threads(detect_cpu_budget()["effective_cpus"], workers)[0]
+        _inference_executor = ThreadPoolExecutor(
+            max_workers=workers,
+            thread_name_prefix="inference",
+            initializer=_init_inference_worker,
+            initargs=(intra,),
+        )
+    return _inference_executor
+
+
+async def run_inference(fn, *args, **kwargs):
+    """Ejecuta `fn` en el pool de inferencia sin bloquear el event loop."""
+    loop = asyncio.get_running_loop()
+    # Copiar el contexto: los logs del worker conservan el request_id de la peticion
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(get_inference_executor(), partial(context.run, fn, *args, **kwargs))
+
+
+def shutdown_inference_executor():
+    global _inference_executor
+    if _inference_executor is not None:
+        _inference_executor.shutdown(wait=True)
+        _inference_executor = None
@@ -1,13 +1,26 @@
 from datetime import datetime, timedelta
 from typing import Optional
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import hashlib
+import hmac
+import math
+import threading
+import time
 from jose import JWTError, jwt
 from passlib.context import CryptContext
-from fastapi import HTTPException, status
+from fastapi import HTTPException, Request, status, Depends
+from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from app.core.config import settings
 
 # Configuración para hasheo de passwords
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# bcrypt consume decenas a cientos de ms de CPU: corre en un pool acotado, fuera del event loop
+_hash_executor = ThreadPoolExecutor(max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+_dummy_hash: Optional[str] = None
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verificar password"""
     return pwd_context.verify(plain_password, hashed_password)
@@ -16,6 +29,41 @@ def get_password_hash(password: str) -> str:
     """Generar hash de password"""
     return pwd_context.hash(password)
 
+async def verify_password_async(plain_password: str, hashed_password: Optional[str]) -> bool:
+    """verify_password en el pool de bcrypt. Sin hash (usuario inexistente) se verifica
+    contra un hash ficticio para que el tiempo de respuesta no revele si el usuario existe."""
+    global _dummy_hash
+    loop = asyncio.get_running_loop()
+    if hashed_password is None:
+        if _dummy_hash is None:
+            _dummy_hash = await loop.run_in_executor(_hash_executor, get_password_hash, "dummy-password")
+        await loop.run_in_executor(_hash_executor, verify_password, plain_password, _dummy_hash)
+        return False
+    return await loop.run_in_executor(_hash_executor, verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    """get_password_hash en el pool de bcrypt"""
+    return await asyncio.get_running_loop().run_in_executor(_hash_executor, get_password_hash, password)
+
+def shutdown_hash_executor():
+    _hash_executor.shutdown(wait=False)
+
+def sign_resource(resource: str, ttl_seconds: int) -> str:
+    """Token opaco 'expira.firma' que autoriza a leer `resource` hasta que expire (HMAC con
+    la clave de JWT). Sirve para URLs que el navegador carga sin encabezado Authorization."""
+    expires = int(time.time()) + ttl_seconds
+    signature = hmac.new(settings.JWT_SECRET_KEY.encode(), f"{resource}|{expires}".encode(),
+                         hashlib.sha256).hexdigest()[:32]
+    return f"{expires}.{signature}"
+
+def verify_resource_token(resource: str, token: Optional[str]) -> bool:
+    expires, _, signature = (token or "").partition(".")
+    if not expires.isdigit() or int(expires) < time.time():
+        return False
+    expected = hmac.new(settings.JWT_SECRET_KEY.encode(), f"{resource}|{expires}".encode(),
+                        hashlib.sha256).hexdigest()[:32]
+    return hmac.compare_digest(signature, expected)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """Crear JWT token"""
     to_encode = data.copy()
@@ -28,14 +76,143 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, settings.JWT_SECRET_KEY, algorithm=settings.JWT_ALGORITHM)
     return encoded_jwt
 
+class TokenCache:
+    """LRU token -> payload ya validado. Cada entrada vence con el `exp` del propio token,
+    asi que un token expirado nunca se acepta desde el cache."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, token: str) -> Optional[dict]:
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                return None
+            payload, expires_at = entry
+            if expires_at <= time.time():
+                del self._entries[token]
+                return None
+            self._entries.move_to_end(token)
+            return dict(payload)
+
+    def put(self, token: str, payload: dict):
+        expires_at = payload.get("exp")
+        if not isinstance(expires_at, (int, float)):
+            return  # sin exp no se cachea: no habria cuando desalojarlo
+        with self._lock:
+            self._entries[token] = (dict(payload), float(expires_at))
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+token_cache = TokenCache(settings.JWT_CACHE_SIZE)
+
 def decode_access_token(token: str):
     """Decodificar JWT token"""
+    cached = token_cache.get(token)
+    if cached is not None:
+        return cached
     try:
         payload = jwt.decode(token, settings.JWT_SECRET_KEY, algorithms=[settings.JWT_ALGORITHM])
-        return payload
     except JWTError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Token inválido o expirado",
             headers={"WWW-Authenticate": "Bearer"},
         )
+    token_cache.put(token, payload)
+    return payload
+
+class LoginThrottle:
+    """Limita los intentos fallidos de login por clave (IP o usuario) en una ventana deslizante.
+
+    Al superar LOGIN_MAX_FAILURES dentro de LOGIN_WINDOW_SECONDS se responde 429 sin tocar
+    Mongo ni bcrypt, hasta que el fallo mas antiguo salga de la ventana."""
+
+    def __init__(self, max_failures: int, window_seconds: float, max_keys: int = 10000):
+        self.max_failures = max_failures
+        self.window_seconds = window_seconds
+        self.max_keys = max_keys
+        self._failures: dict = {}
+        self._lock = threading.Lock()
+
+    def _prune(self, key: str, now: float) -> deque:
+        failures = self._failures.get(key)
+        if failures is None:
+            return deque()
+        while failures and failures[0] <= now - self.window_seconds:
+            failures.popleft()
+        if not failures:
+            del self._failures[key]
+        return failures
+
+    def check(self, *keys: str):
+        """Lanza 429 con Retry-After si alguna clave esta bloqueada"""
+        now = time.monotonic()
+        with self._lock:
+            retry_after = 0.0
+            for key in keys:
+                failures = self._prune(key, now)
+                if len(failures) >= self.max_failures:
+                    retry_after = max(retry_after, failures[0] + self.window_seconds - now)
+        if retry_after > 0:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Demasiados intentos fallidos. Intente de nuevo más tarde.",
+                headers={"Retry-After": str(math.ceil(retry_after))},
+            )
+
+    def record_failure(self, *keys: str):
+        now = time.monotonic()
+        with self._lock:
+            if len(self._failures) >= self.max_keys:
+                # Acotar memoria: descartar las claves cuyas ventanas ya vencieron
+                for key in list(self._failures):
+                    self._prune(key, now)
+            for key in keys:
+                self._failures.setdefault(key, deque()).append(now)
+
+    def reset(self, *keys: str):
+        with self._lock:
+            for key in keys:
+                self._failures.pop(key, None)
+
+def client_ip(request: Request) -> str:
+    """IP del cliente. Con TRUST_PROXY_HEADERS se toma de X-Forwarded-For la entrada que
+    agrego el ultimo proxy de confianza (la N-esima desde la derecha): las de la izquierda
+    las controla el cliente y no sirven para limitar intentos."""
+    if settings.TRUST_PROXY_HEADERS:
+        forwarded = [ip.strip() for ip in request.headers.get("x-forwarded-for", "").split(",") if ip.strip()]
+        hops = max(1, settings.TRUSTED_PROXY_COUNT)
+        if len(forwarded) >= hops:
+            return forwarded[-hops]
+    return request.client.host if request.client else "unknown"
+
+login_throttle = LoginThrottle(settings.LOGIN_MAX_FAILURES, settings.LOGIN_WINDOW_SECONDS)
+user_login_throttle = LoginThrottle(settings.LOGIN_USER_MAX_FAILURES, settings.LOGIN_WINDOW_SECONDS)
+
+# Esquema Bearer para rutas protegidas
+bearer_scheme = HTTPBearer(auto_error=False)
+
+async def get_current_admin(credentials: Optional[HTTPAuthorizationCredentials] = Depends(bearer_scheme)) -> dict:
+    """Dependencia que exige un token valido con rol admin"""
+    if credentials is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="No autenticado",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+
+    payload = decode_access_token(credentials.credentials)
+    if payload.get("role") != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Se requieren permisos de administrador",
+        )
+    return payload
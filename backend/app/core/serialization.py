@@ -0,0 +1,32 @@
+from typing import Any
+
+import orjson
+from bson import ObjectId
+from fastapi.responses import JSONResponse
+
+# ---------------------------------------------------------------------------
+# Serializacion JSON rapida (orjson) para las respuestas de la API
+# ---------------------------------------------------------------------------
+# numpy (mapas Grad-CAM, embeddings) y datetime se serializan sin conversion previa
+ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+def _default(obj: Any):
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if hasattr(obj, "model_dump"):
+        return obj.model_dump(mode="json")
+    raise TypeError(f"Tipo no serializable: {type(obj).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(content, default=_default, option=ORJSON_OPTIONS)
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse con orjson. Las rutas pueden devolverla con el dict ya armado para
+    evitar construir y validar modelos Pydantic; `response_model` se mantiene en el
+    decorador solo para el esquema OpenAPI."""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,124 @@
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+from pathlib import Path
+from typing import Optional
+
+from fastapi import Request
+from fastapi.responses import Response
+from starlette.staticfiles import StaticFiles
+
+# ---------------------------------------------------------------------------
+# Archivos estaticos del frontend: variantes precomprimidas y cache inmutable
+# ---------------------------------------------------------------------------
+# Orden de preferencia: brotli comprime mejor que gzip para JS/CSS
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+# Los assets del build de React llevan hash de contenido: main.6fd2bb7c.js
+HASHED_ASSET_RE = re.compile(r"\.[0-9a-f]{8,}\.(?:chunk\.)?(?:js|css|map|woff2?|ttf|svg|png|jpe?g|gif|webp)$")
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE = "no-cache"
+
+
+def accepted_encodings(accept_encoding: str) -> set:
+    """Codificaciones aceptadas por el cliente (ignora las marcadas con q=0)."""
+    accepted = set()
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        if params.strip().replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        if name:
+            accepted.add(name.strip().lower())
+    return accepted
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    """StaticFiles que sirve `archivo.br` / `archivo.gz` generados en el build cuando el
+    cliente los acepta, y marca como inmutables los assets con hash en el nombre.
+
+    Las variantes disponibles se indexan una vez al montar: el build no cambia en runtime,
+    asi que no se hace un stat extra por cada peticion."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._variants: dict = {}
+        root = Path(self.directory) if self.directory else None
+        if root is not None and root.is_dir():
+            for dirpath, _, filenames in os.walk(root):
+                names = set(filenames)
+                for name in filenames:
+                    relative = os.path.relpath(os.path.join(dirpath, name), root).replace(os.sep, "/")
+                    available = tuple(enc for enc, suffix in ENCODINGS if name + suffix in names)
+                    if available:
+                        self._variants[relative] = available
+
+    async def get_response(self, path: str, scope) -> Response:
+        encoding = None
+        available = self._variants.get(path.lstrip("/"))
+        if available:
+            headers = dict(scope["headers"])
+            accepted = accepted_encodings(headers.get(b"accept-encoding", b"").decode("latin-1"))
+            encoding = next((enc for enc in available if enc in accepted), None)
+
+        if encoding is None:
+            response = await super().get_response(path, scope)
+        else:
+            suffix = dict(ENCODINGS)[encoding]
+            response = await super().get_response(path + suffix, scope)
+            if response.status_code in (200, 304):
+                response.headers["content-encoding"] = encoding
+                content_type = self._media_type(path)
+                if content_type:
+                    response.headers["content-type"] = content_type
+
+        if available:
+            response.headers["vary"] = "Accept-Encoding"
+        if response.status_code in (200, 304):
+            response.headers["cache-control"] = IMMUTABLE_CACHE if HASHED_ASSET_RE.search(path) else REVALIDATE_CACHE
+        return response
+
+    @staticmethod
+    def _media_type(path: str) -> Optional[str]:
+        media_type, _ = mimetypes.guess_type(path)
+        if media_type and (media_type.startswith("text/") or media_type == "application/javascript"):
+            media_type += "; charset=utf-8"
+        return media_type
+
+
+class SpaIndex:
+    """index.html en memoria (plano y gzip) con ETag fuerte y revalidacion por 304."""
+
+    def __init__(self, index_file: Path):
+        self.index_file = index_file
+        self._body: Optional[bytes] = None
+        self._gzip_body: Optional[bytes] = None
+        self.etag: Optional[str] = None
+
+    def load(self) -> bool:
+        if not self.index_file.exists():
+            return False
+        body = self.index_file.read_bytes()
+        self._body = body
+        self._gzip_body = gzip.compress(body, compresslevel=9, mtime=0)
+        self.etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+        return True
+
+    @property
+    def available(self) -> bool:
+        return self._body is not None or self.load()
+
+    def response(self, request: Request) -> Response:
+        use_gzip = "gzip" in accepted_encodings(request.headers.get("accept-encoding", ""))
+        # Un ETag fuerte distinto por codificacion: los bytes enviados difieren
+        etag = self.etag[:-1] + '-gz"' if use_gzip else self.etag
+        headers = {"ETag": etag, "Cache-Control": REVALIDATE_CACHE, "Vary": "Accept-Encoding"}
+        if_none_match = request.headers.get("if-none-match", "")
+        if etag in [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]:
+            return Response(status_code=304, headers=headers)
+
+        if use_gzip:
+            headers["Content-Encoding"] = "gzip"
+            return Response(content=self._gzip_body, media_type="text/html", headers=headers)
+        return Response(content=self._body, media_type="text/html", headers=headers)
@@ -1,18 +1,36 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import JSONResponse
 from app.core.config import settings
 from app.core.database import connect_to_mongo, close_mongo_connection
-from app.routes import auth, pages, prediction
+from app.core.runtime import configure_runtime, shutdown_inference_executor
+from app.core.limits import BodySizeLimitMiddleware, MULTIPART_OVERHEAD
+from app.core.static_files import PrecompressedStaticFiles, SpaIndex
+from app.core.serialization import FastJSONResponse
+from app.core.compression import ApiGZipMiddleware
+from app.core.logging import setup_logging, RequestContextMiddleware
+
+# Logging encolado antes de cualquier otro modulo que registre eventos
+setup_logging()
+
+# Fijar threads de OMP/MKL/torch antes de que las rutas importen torch
+configure_runtime()
+
+from app.routes import auth, pages, prediction, admin, analytics, history, media
 from pathlib import Path
+import asyncio
+import logging
 import os
 
+logger = logging.getLogger(__name__)
+
 # Crear instancia de FastAPI
 app = FastAPI(
     title=settings.APP_NAME,
     version=settings.VERSION,
-    description="API Backend para sistema de deteccion de retinopatia diabetica"
+    description="API Backend para sistema de deteccion de retinopatia diabetica",
+    default_response_class=FastJSONResponse,
 )
 
 # Configurar CORS
@@ -24,45 +42,88 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Comprimir respuestas JSON grandes de /api (los estaticos ya vienen precomprimidos)
+app.add_middleware(ApiGZipMiddleware, minimum_size=settings.API_GZIP_MIN_SIZE)
+
+# Cortar subidas demasiado grandes mientras se reciben, antes del parseo multipart
+app.add_middleware(
+    BodySizeLimitMiddleware,
+    limits={
+        "/api/predict": settings.UPLOAD_MAX_BYTES + MULTIPART_OVERHEAD,
+        "/api/media": settings.MEDIA_MAX_BYTES + MULTIPART_OVERHEAD,
+    },
+)
+
+# Ultimo en agregarse = mas externo: el request_id cubre toda la peticion
+app.add_middleware(RequestContextMiddleware)
+
 # Eventos de inicio y cierre
 @app.on_event("startup")
 async def startup_event():
     """Ejecutar al iniciar la aplicacion"""
     await connect_to_mongo()
 
+    from app.core.indexes import ensure_indexes
+    await ensure_indexes()
+
+    # Reconstruir el indice de casi-duplicados en segundo plano
+    from app.services.near_duplicates import near_duplicate_index
+    asyncio.create_task(near_duplicate_index.load_from_db())
+
+    from app.services.page_search import page_search_index
+    asyncio.create_task(page_search_index.load_from_db())
+
+    from app.services.prediction_recorder import prediction_recorder
+    await prediction_recorder.start()
+
+    from app.services.media_service import media_service
+    await media_service.start()
+
     # Cargar modelos de IA
     from app.services.model_service import model_service
     models_dir = os.environ.get("MODELS_DIR", "/app/models_weights")
     model_service.load_all_models(models_dir)
 
-    print(f"[OK] {settings.APP_NAME} v{settings.VERSION} iniciado")
+    logger.info("%s v%s iniciado", settings.APP_NAME, settings.VERSION)
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Ejecutar al cerrar la aplicacion"""
+    # Escribir predicciones pendientes antes de cerrar el cliente de Mongo
+    from app.services.prediction_recorder import prediction_recorder
+    await prediction_recorder.stop()
+
+    from app.services.media_service import media_service
+    await media_service.stop()
+
     await close_mongo_connection()
-    print("[*] Aplicacion cerrada")
+    shutdown_inference_executor()
+
+    from app.core.security import shutdown_hash_executor
+    shutdown_hash_executor()
+
+    from app.services.vector_index import embedding_store
+    embedding_store.close()
+    logger.info("Aplicacion cerrada")
 
 # Servir archivos estáticos del frontend PRIMERO (antes de las rutas de API)
 PUBLIC_DIR = Path("/app/public")
 STATIC_DIR = PUBLIC_DIR / "static"
 
-print(f"[DEBUG] Buscando frontend en: {PUBLIC_DIR}")
-print(f"[DEBUG] Buscando estáticos en: {STATIC_DIR}")
+logger.debug("Buscando frontend en: %s (estaticos en %s)", PUBLIC_DIR, STATIC_DIR)
 
 if PUBLIC_DIR.exists():
-    print(f"[INFO] Carpeta public encontrada: {PUBLIC_DIR}")
-    files = list(PUBLIC_DIR.glob("*"))
-    print(f"[INFO] Archivos en public: {[f.name for f in files]}")
+    logger.info("Carpeta public encontrada: %s (%s)", PUBLIC_DIR, [f.name for f in PUBLIC_DIR.glob("*")])
     
     # Montar archivos estáticos - la carpeta STATIC_DIR se monta en /static
     if STATIC_DIR.exists():
-        print(f"[INFO] Montando archivos estáticos desde: {STATIC_DIR} en /static")
-        app.mount("/static", StaticFiles(directory=str(STATIC_DIR)), name="static")
+        logger.info("Montando archivos estaticos desde: %s en /static", STATIC_DIR)
+        # Sirve .br/.gz generados en el build (precompress_static.py) y cachea los assets con hash
+        app.mount("/static", PrecompressedStaticFiles(directory=str(STATIC_DIR)), name="static")
     else:
-        print(f"[WARNING] Carpeta static NO encontrada en {STATIC_DIR}")
+        logger.warning("Carpeta static NO encontrada en %s", STATIC_DIR)
 else:
-    print(f"[WARNING] Carpeta public NO encontrada en {PUBLIC_DIR}")
+    logger.warning("Carpeta public NO encontrada en %s", PUBLIC_DIR)
 
 # Montar carpeta de uploads para servir imágenes subidas
 # En producción (Docker): /app/uploads
@@ -70,25 +131,39 @@ else:
 UPLOADS_DIR = Path("/app/uploads") if Path("/app/uploads").exists() else Path(__file__).parent.parent.parent / "uploads"
 
 if UPLOADS_DIR.exists():
-    print(f"[INFO] Montando carpeta uploads desde: {UPLOADS_DIR} en /uploads")
+    logger.info("Montando carpeta uploads desde: %s en /uploads", UPLOADS_DIR)
     app.mount("/uploads", StaticFiles(directory=str(UPLOADS_DIR)), name="uploads")
 else:
-    print(f"[WARNING] Carpeta uploads NO encontrada en {UPLOADS_DIR}")
+    logger.warning("Carpeta uploads NO encontrada en %s", UPLOADS_DIR)
     # Crear la carpeta si no existe
     UPLOADS_DIR.mkdir(parents=True, exist_ok=True)
-    print(f"[INFO] Carpeta uploads creada en {UPLOADS_DIR}")
+    logger.info("Carpeta uploads creada en %s", UPLOADS_DIR)
     app.mount("/uploads", StaticFiles(directory=str(UPLOADS_DIR)), name="uploads")
 
 # Registrar rutas de API
 app.include_router(auth.router, prefix="/api")
 app.include_router(pages.router, prefix="/api")
 app.include_router(prediction.router, prefix="/api")
+app.include_router(admin.router, prefix="/api")
+app.include_router(analytics.router, prefix="/api")
+app.include_router(history.router, prefix="/api")
+app.include_router(media.router, prefix="/api")
 
-# Health check
+# Health check (liveness): el proceso responde aunque los modelos sigan cargando
 @app.get("/health")
 async def health():
     """Health check endpoint"""
-    return {"status": "healthy"}
+    from app.services.model_service import model_service
+    return {"status": "healthy", "models_loading": model_service.loading}
+
+# Readiness: solo 200 cuando los modelos estan cargados y calentados
+@app.get("/ready")
+async def ready():
+    """Readiness endpoint con estado por modelo"""
+    from app.services.model_service import model_service
+    readiness = model_service.readiness()
+    status_code = 200 if readiness["ready"] else 503
+    return JSONResponse(status_code=status_code, content=readiness)
 
 # Debug endpoint - para testear que el backend recibe requests
 @app.get("/api/debug")
@@ -100,35 +175,35 @@ async def debug():
         "origin_header": "check browser console"
     }
 
-# SPA fallback - servir index.html para todas las rutas que no sean /api, /docs, /health, /static, /openapi.json
+# SPA fallback - servir index.html para todas las rutas que no sean /api, /docs, /health, /ready, /static, /openapi.json
+# index.html se lee una vez y se sirve desde memoria con ETag
+spa_index = SpaIndex(PUBLIC_DIR / "index.html")
+
 @app.get("/{full_path:path}")
-async def serve_spa(full_path: str):
+async def serve_spa(full_path: str, request: Request):
     """Servir la aplicación React (SPA) - fallback para todas las rutas no capturadas"""
     # Excluir rutas de API y documentación
     if full_path.startswith("api/"):
         from fastapi import HTTPException
         raise HTTPException(status_code=404, detail="API endpoint not found")
     
-    if full_path in ["docs", "openapi.json", "redoc", "health"]:
+    if full_path in ["docs", "openapi.json", "redoc", "health", "ready"]:
         from fastapi import HTTPException
         raise HTTPException(status_code=404, detail="Not found")
     
     # Servir index.html para cualquier otra ruta (SPA)
-    index_file = PUBLIC_DIR / "index.html"
-    if index_file.exists():
-        print(f"[DEBUG] Sirviendo index.html para ruta: /{full_path}")
-        return FileResponse(index_file, media_type="text/html")
+    if spa_index.available:
+        return spa_index.response(request)
     
     from fastapi import HTTPException
     raise HTTPException(status_code=404, detail="Frontend index.html not found")
 
 # Ruta raiz - servir index.html
 @app.get("/")
-async def root():
+async def root(request: Request):
     """Servir el frontend React en la raiz"""
-    index_file = PUBLIC_DIR / "index.html"
-    if index_file.exists():
-        return FileResponse(index_file, media_type="text/html")
+    if spa_index.available:
+        return spa_index.response(request)
     
     # Fallback si no existe
     return {
@@ -0,0 +1,8 @@
+from pydantic import BaseModel, Field
+from typing import Optional
+
+
+class ProfilingRequest(BaseModel):
+    max_predictions: Optional[int] = Field(default=None, ge=1, le=200)
+    duration_seconds: Optional[float] = Field(default=None, gt=0, le=600)
+    record_shapes: bool = False
@@ -0,0 +1,23 @@
+from pydantic import BaseModel
+from typing import List, Optional
+
+
+class MediaVariant(BaseModel):
+    width: int
+    height: int
+    format: str
+    bytes: int
+    url: str
+
+
+class MediaAsset(BaseModel):
+    digest: str
+    url: str
+    width: int
+    height: int
+    format: str
+    bytes: int
+    status: str  # pending | ready | error
+    deduplicated: bool = False
+    variants: List[MediaVariant] = []
+    srcset: Optional[dict] = None  # formato -> "url 320w, url 640w, ..."
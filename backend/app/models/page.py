@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
 from typing import List, Optional
 from datetime import datetime
 
@@ -20,8 +20,16 @@ class PageBase(BaseModel):
     metaDescription: Optional[str] = ""
     isPublished: bool = True
 
+# Rutas fijas de /pages que se declaran antes de /{slug}: una pagina con ese slug seria inaccesible
+RESERVED_SLUGS = frozenset({"summary", "search"})
+
 class PageCreate(PageBase):
-    pass
+    @field_validator("slug")
+    @classmethod
+    def slug_not_reserved(cls, value: str) -> str:
+        if value.strip().lower() in RESERVED_SLUGS:
+            raise ValueError(f"El slug '{value}' esta reservado")
+        return value
 
 class PageUpdate(BaseModel):
     title: Optional[str] = None
@@ -39,3 +47,18 @@ class PageInDB(PageBase):
 
     class Config:
         populate_by_name = True
+
+class PageSummaryPage(BaseModel):
+    items: List[dict]
+    next_cursor: Optional[str] = None
+
+class PageSearchHit(BaseModel):
+    slug: str
+    title: str
+    score: float
+    snippet: Optional[str] = None
+
+class PageSearchResponse(BaseModel):
+    query: str
+    took_ms: float
+    results: List[PageSearchHit]
@@ -1,5 +1,6 @@
 from pydantic import BaseModel
-from typing import List
+from typing import List, Dict, Optional
+from datetime import datetime
 
 
 class SingleModelResult(BaseModel):
@@ -19,7 +20,54 @@ class ConsensusResult(BaseModel):
     recommendation: str
 
 
+class HeatmapResult(BaseModel):
+    model_name: str
+    width: int
+    height: int
+    values: List[List[float]]
+    overlay_url: str
+
+
+class DuplicateInfo(BaseModel):
+    image_digest: str
+    distance: int
+    reused: bool
+    prediction_id: Optional[str] = None
+
+
 class MultiModelPredictionResponse(BaseModel):
     results: List[SingleModelResult]
     consensus: ConsensusResult
     image_filename: str
+    image_digest: Optional[str] = None
+    heatmaps: Optional[Dict[str, HeatmapResult]] = None
+    embeddings: Optional[Dict[str, List[float]]] = None
+    duplicate_of: Optional[DuplicateInfo] = None
+
+
+class SimilarCase(BaseModel):
+    image_digest: str
+    similarity: float
+
+
+class SimilarCasesResponse(BaseModel):
+    image_digest: str
+    model_key: str
+    results: List[SimilarCase]
+
+
+class PredictionSummary(BaseModel):
+    id: str
+    image_digest: str
+    image_filename: str
+    createdAt: datetime
+    prediction: str
+    severity: str
+    confidence: float
+    agreement_count: int
+    total_models: int
+
+
+class PredictionHistoryPage(BaseModel):
+    items: List[PredictionSummary]
+    next_cursor: Optional[str] = None
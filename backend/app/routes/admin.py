@@ -0,0 +1,88 @@
+from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi.responses import FileResponse
+from starlette.concurrency import run_in_threadpool
+from app.core.security import get_current_admin
+from app.core.runtime import runtime_config
+from app.core.indexes import get_index_status
+from app.models.admin import ProfilingRequest
+from app.services.profiler_service import profiler_service
+from app.services.prediction_recorder import prediction_recorder
+from app.services.page_cache import page_cache
+from app.services.media_service import media_service
+
+router = APIRouter(prefix="/admin", tags=["Admin"], dependencies=[Depends(get_current_admin)])
+
+
+@router.post("/profiling/start", response_model=dict)
+async def start_profiling(request: ProfilingRequest):
+    """Activar profiling para las siguientes N predicciones o T segundos"""
+    try:
+        return profiler_service.start(
+            max_predictions=request.max_predictions,
+            duration_seconds=request.duration_seconds,
+            record_shapes=request.record_shapes,
+        )
+    except RuntimeError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+
+
+@router.post("/profiling/stop", response_model=dict)
+async def stop_profiling():
+    """Detener la sesion de profiling activa"""
+    return profiler_service.stop()
+
+
+@router.get("/profiling", response_model=dict)
+async def get_profiling_report(top: int = 20):
+    """Reporte agregado: operadores principales por modelo y funciones Python"""
+    return profiler_service.report(top=max(1, min(top, 100)))
+
+
+@router.get("/profiling/trace")
+async def download_profiling_trace():
+    """Descargar trazas chrome (chrome://tracing, Perfetto) y python.prof de la ultima sesion"""
+    # Comprimir las trazas (pueden ser decenas de MB) fuera del event loop
+    archive_path = await run_in_threadpool(profiler_service.build_trace_archive)
+    if archive_path is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No hay una sesion de profiling finalizada",
+        )
+    return FileResponse(archive_path, media_type="application/zip", filename="profile_trace.zip")
+
+
+@router.get("/runtime", response_model=dict)
+async def get_runtime_config():
+    """Presupuesto de CPU detectado y reparto de threads de inferencia"""
+    return runtime_config
+
+
+@router.get("/recorder", response_model=dict)
+async def get_recorder_status():
+    """Estado del registro write-behind de predicciones"""
+    return prediction_recorder.status()
+
+
+@router.get("/indexes", response_model=dict)
+async def get_indexes_status():
+    """Resultado de la verificacion de indices del arranque"""
+    return get_index_status()
+
+
+@router.get("/page-cache", response_model=dict)
+async def get_page_cache_status():
+    """Entradas y aciertos del cache de /api/pages"""
+    return page_cache.status()
+
+
+@router.delete("/page-cache", response_model=dict)
+async def clear_page_cache():
+    """Vaciar el cache de paginas (p. ej. tras correr init_db.py o migrate_db.py)"""
+    page_cache.invalidate()
+    return page_cache.status()
+
+
+@router.get("/media", response_model=dict)
+async def get_media_status():
+    """Contadores del almacenamiento de imagenes y cola de derivados"""
+    return media_service.status()
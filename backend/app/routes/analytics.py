@@ -0,0 +1,19 @@
+from fastapi import APIRouter, HTTPException, Depends, Query, status
+from datetime import date
+from typing import Optional
+from app.core.security import get_current_admin
+from app.services import prediction_analytics
+
+router = APIRouter(prefix="/analytics", tags=["Analytics"], dependencies=[Depends(get_current_admin)])
+
+
+@router.get("/predictions", response_model=dict)
+async def get_prediction_analytics(
+    start: Optional[date] = Query(None, description="Fecha inicial (YYYY-MM-DD), por defecto hace 30 dias"),
+    end: Optional[date] = Query(None, description="Fecha final (YYYY-MM-DD), por defecto hoy"),
+):
+    """Distribucion de severidad, acuerdo entre modelos y desacuerdo por modelo por dia"""
+    try:
+        return await prediction_analytics.query_range(start, end)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
@@ -1,31 +1,49 @@
-from fastapi import APIRouter, HTTPException, status, Depends
+from fastapi import APIRouter, HTTPException, Request, status, Depends
 from app.models.user import UserLogin, TokenResponse, UserCreate
-from app.core.security import verify_password, create_access_token, get_password_hash
+from app.core.security import (
+    verify_password_async,
+    create_access_token,
+    get_password_hash_async,
+    login_throttle,
+    user_login_throttle,
+    client_ip,
+)
 from app.core.database import get_database
+from app.core.indexes import unique_index_ready
 from datetime import datetime
+from pymongo.errors import DuplicateKeyError
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 
+# Solo los campos que usa el login
+LOGIN_PROJECTION = {"username": 1, "password": 1, "email": 1, "role": 1}
+
 @router.post("/login", response_model=TokenResponse)
-async def login(credentials: UserLogin):
+async def login(credentials: UserLogin, request: Request):
     """Login de usuario admin"""
+    # Intentos fallidos por IP (estricto) y por usuario (holgado): 429 antes de tocar Mongo o bcrypt
+    ip_key = f"ip:{client_ip(request)}"
+    user_key = f"user:{credentials.username.lower()}"
+    login_throttle.check(ip_key)
+    user_login_throttle.check(user_key)
+
     db = get_database()
 
     # Buscar usuario
-    user = await db.users.find_one({"username": credentials.username})
+    user = await db.users.find_one({"username": credentials.username}, LOGIN_PROJECTION)
 
-    if not user:
+    # Verificar password (en el pool de bcrypt; tambien si el usuario no existe, para
+    # que el tiempo de respuesta no lo delate)
+    if not await verify_password_async(credentials.password, user["password"] if user else None):
+        login_throttle.record_failure(ip_key)
+        user_login_throttle.record_failure(user_key)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Usuario o contraseña incorrectos"
         )
 
-    # Verificar password
-    if not verify_password(credentials.password, user["password"]):
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Usuario o contraseña incorrectos"
-        )
+    login_throttle.reset(ip_key)
+    user_login_throttle.reset(user_key)
 
     # Crear token
     access_token = create_access_token(
@@ -46,21 +64,28 @@ async def register(user_data: UserCreate):
     """Registrar nuevo usuario admin (solo para setup inicial)"""
     db = get_database()
 
-    # Verificar si el usuario ya existe
-    existing_user = await db.users.find_one({"username": user_data.username})
-    if existing_user:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="El usuario ya existe"
-        )
+    # Sin el indice unico (duplicados previos o aun construyendose) insert_one no falla:
+    # mantener la verificacion previa como respaldo
+    if not unique_index_ready("users", "username_unique"):
+        if await db.users.find_one({"username": user_data.username}, {"_id": 1}):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="El usuario ya existe"
+            )
 
-    # Crear usuario
+    # Crear usuario (el indice unico en username rechaza duplicados sin carrera)
     user_dict = user_data.model_dump()
-    user_dict["password"] = get_password_hash(user_data.password)
+    user_dict["password"] = await get_password_hash_async(user_data.password)
     user_dict["createdAt"] = datetime.utcnow()
     user_dict["updatedAt"] = datetime.utcnow()
 
-    result = await db.users.insert_one(user_dict)
+    try:
+        await db.users.insert_one(user_dict)
+    except DuplicateKeyError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="El usuario ya existe"
+        )
 
     return {
         "message": "Usuario creado exitosamente",
@@ -0,0 +1,105 @@
+from fastapi import APIRouter, HTTPException, Depends, Query, status
+from typing import Optional
+from datetime import datetime
+from bson import ObjectId
+from bson.errors import InvalidId
+import base64
+from app.core.database import get_database
+from app.core.security import get_current_admin
+from app.models.prediction import PredictionSummary, PredictionHistoryPage
+
+router = APIRouter(prefix="/history", tags=["Prediction History"], dependencies=[Depends(get_current_admin)])
+
+# Solo los campos que muestra el listado: nunca se cargan los arrays de probabilidades
+SUMMARY_PROJECTION = {
+    "image_digest": 1,
+    "image_filename": 1,
+    "createdAt": 1,
+    "consensus.prediction": 1,
+    "consensus.severity": 1,
+    "consensus.confidence": 1,
+    "consensus.agreement_count": 1,
+    "consensus.total_models": 1,
+}
+
+
+def encode_cursor(created_at: datetime, doc_id: ObjectId) -> str:
+    raw = f"{created_at.isoformat()}|{doc_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, ObjectId]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, _, doc_id = base64.urlsafe_b64decode(padded).decode().partition("|")
+        return datetime.fromisoformat(created_at), ObjectId(doc_id)
+    except (ValueError, InvalidId, UnicodeDecodeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cursor invalido")
+
+
+def summary_helper(doc) -> PredictionSummary:
+    consensus = doc.get("consensus", {})
+    return PredictionSummary(
+        id=str(doc["_id"]),
+        image_digest=doc["image_digest"],
+        image_filename=doc.get("image_filename", ""),
+        createdAt=doc["createdAt"],
+        prediction=consensus.get("prediction", ""),
+        severity=consensus.get("severity", ""),
+        confidence=consensus.get("confidence", 0.0),
+        agreement_count=consensus.get("agreement_count", 0),
+        total_models=consensus.get("total_models", 0),
+    )
+
+
+@router.get("/", response_model=PredictionHistoryPage)
+async def list_predictions(
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="next_cursor de la pagina anterior"),
+    severity: Optional[str] = Query(None),
+    image_digest: Optional[str] = Query(None),
+):
+    """Historial de analisis, del mas reciente al mas antiguo (paginacion por cursor)"""
+    db = get_database()
+
+    query = {}
+    if severity:
+        query["consensus.severity"] = severity
+    if image_digest:
+        query["image_digest"] = image_digest
+    if cursor:
+        created_at, doc_id = decode_cursor(cursor)
+        # Keyset: continuar justo despues del ultimo elemento, sin skip()
+        query["$or"] = [
+            {"createdAt": {"$lt": created_at}},
+            {"createdAt": created_at, "_id": {"$lt": doc_id}},
+        ]
+
+    docs = await db.predictions.find(query, SUMMARY_PROJECTION) \
+        .sort([("createdAt", -1), ("_id", -1)]) \
+        .limit(limit + 1) \
+        .to_list(limit + 1)
+
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        next_cursor = encode_cursor(docs[-1]["createdAt"], docs[-1]["_id"])
+
+    return PredictionHistoryPage(items=[summary_helper(d) for d in docs], next_cursor=next_cursor)
+
+
+@router.get("/{prediction_id}", response_model=dict)
+async def get_prediction(prediction_id: str):
+    """Registro completo de un analisis (resultados por modelo, tiempos y versiones)"""
+    db = get_database()
+    try:
+        oid = ObjectId(prediction_id)
+    except InvalidId:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Id invalido")
+
+    doc = await db.predictions.find_one({"_id": oid})
+    if not doc:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Analisis no encontrado")
+
+    doc["_id"] = str(doc["_id"])
+    return doc
@@ -0,0 +1,101 @@
+import os
+from typing import Optional
+
+from fastapi import APIRouter, Depends, File, Header, HTTPException, Query, UploadFile, status
+from fastapi.responses import FileResponse
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+from app.core.security import get_current_admin
+from app.models.media import MediaAsset, MediaVariant
+from app.services.ingestion import ingest_image
+from app.services.media_service import media_service, media_dir, pick_variant, DIGEST_RE, MEDIA_TYPES
+
+router = APIRouter(prefix="/media", tags=["Media"])
+
+# El digest y el ancho fijan el contenido: la respuesta nunca cambia para esa URL
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+# Mientras se generan los derivados se sirve el original con cache corto
+PENDING_CACHE = "public, max-age=60"
+
+
+def asset_response(manifest: dict, deduplicated: bool = False) -> MediaAsset:
+    base_url = f"/api/media/{manifest['digest']}"
+    variants = [
+        MediaVariant(width=v["width"], height=v["height"], format=v["format"], bytes=v["bytes"],
+                     url=f"{base_url}?w={v['width']}&format={v['format']}")
+        for v in manifest.get("variants", [])
+    ]
+    srcset = {}
+    for fmt in settings.MEDIA_FORMATS:
+        entries = [f"{v.url} {v.width}w" for v in variants if v.format == fmt]
+        if entries:
+            srcset[fmt] = ", ".join(entries)
+    return MediaAsset(
+        digest=manifest["digest"],
+        url=base_url,
+        width=manifest["width"],
+        height=manifest["height"],
+        format=manifest["format"],
+        bytes=manifest["bytes"],
+        status=manifest["status"],
+        deduplicated=deduplicated,
+        variants=variants,
+        srcset=srcset or None,
+    )
+
+
+def get_manifest_or_404(digest: str) -> dict:
+    manifest = media_service.get_manifest(digest) if DIGEST_RE.match(digest) else None
+    if manifest is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Imagen no encontrada")
+    return manifest
+
+
+@router.post("/", response_model=MediaAsset, status_code=status.HTTP_201_CREATED,
+             dependencies=[Depends(get_current_admin)])
+async def upload_media(image: UploadFile = File(...)):
+    """Subir una imagen para el CMS; los derivados WebP/JPEG se generan en segundo plano"""
+    ingested = await ingest_image(image, max_bytes=settings.MEDIA_MAX_BYTES)
+    try:
+        manifest, created = await run_in_threadpool(media_service.store, ingested)
+    finally:
+        ingested.cleanup()
+
+    if created or manifest["status"] == "error":
+        media_service.enqueue(manifest["digest"])
+    return asset_response(manifest, deduplicated=not created)
+
+
+@router.get("/{digest}/manifest", response_model=MediaAsset)
+async def get_media_manifest(digest: str):
+    """Dimensiones, estado y variantes disponibles (para armar srcset)"""
+    return asset_response(get_manifest_or_404(digest))
+
+
+@router.get("/{digest}")
+async def get_media(
+    digest: str,
+    w: Optional[int] = Query(None, ge=1, le=4096, description="Ancho de visualizacion en px"),
+    format: Optional[str] = Query(None, description="webp o jpeg; por defecto segun Accept"),
+    accept: Optional[str] = Header(None),
+):
+    """Servir la variante mas adecuada (ancho y formato) con cache inmutable"""
+    manifest = get_manifest_or_404(digest)
+    if format is not None and format not in settings.MEDIA_FORMATS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail=f"Formato no disponible. Use: {', '.join(settings.MEDIA_FORMATS)}")
+
+    variant = pick_variant(manifest, w, f"image/{format}" if format else accept)
+    if variant is None:
+        filename = manifest["original"]
+        cache_control = PENDING_CACHE
+    else:
+        filename = variant["file"]
+        cache_control = IMMUTABLE_CACHE
+
+    path = os.path.join(media_dir(digest), filename)
+    headers = {"Cache-Control": cache_control}
+    if format is None:
+        headers["Vary"] = "Accept"
+    return FileResponse(path, media_type=MEDIA_TYPES[filename.rsplit(".", 1)[1]], headers=headers)
@@ -1,12 +1,30 @@
-from fastapi import APIRouter, HTTPException, status
-from typing import List
-from app.models.page import PageCreate, PageUpdate, PageInDB
+from fastapi import APIRouter, HTTPException, Header, Query, Response, status
+from typing import List, Optional
+from app.models.page import PageCreate, PageUpdate, PageInDB, PageSummaryPage, PageSearchHit, PageSearchResponse
 from app.core.database import get_database
+from app.core.config import settings
+from app.core.indexes import unique_index_ready
+from app.services.page_search import page_search_index
+from app.services.page_cache import page_cache, page_key, summary_key, etag_matches, LIST_KEY, CachedResponse
 from datetime import datetime
 from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+import base64
+import time
 
 router = APIRouter(prefix="/pages", tags=["Pages"])
 
+# Campos que expone la API; evita traer campos heredados de migraciones
+PAGE_PROJECTION = {
+    "slug": 1, "title": 1, "subtitle": 1, "heroImage": 1, "heroImageStyle": 1, "sections": 1,
+    "metaDescription": 1, "isPublished": 1, "createdAt": 1, "updatedAt": 1,
+}
+
+# Campos permitidos en el listado resumido (nunca sections)
+SUMMARY_FIELDS = ("slug", "title", "subtitle", "heroImage", "metaDescription", "updatedAt")
+DEFAULT_SUMMARY_FIELDS = ("slug", "title")
+
 def page_helper(page) -> dict:
     """Helper para convertir documento de MongoDB a dict"""
     return {
@@ -23,79 +41,177 @@ def page_helper(page) -> dict:
         "updatedAt": page.get("updatedAt")
     }
 
+def cached_response(entry: CachedResponse, if_none_match: Optional[str]) -> Response:
+    """200 con el cuerpo ya serializado, o 304 si el cliente tiene la misma version"""
+    headers = {"ETag": entry.etag, "Cache-Control": settings.PAGES_CACHE_CONTROL}
+    if etag_matches(if_none_match, entry.etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
+
 @router.get("/", response_model=List[dict])
-async def get_all_pages():
+async def get_all_pages(if_none_match: Optional[str] = Header(None)):
     """Obtener todas las páginas"""
-    db = get_database()
-    pages = []
-
-    cursor = db.pages.find({"isPublished": True})
-    async for page in cursor:
-        pages.append(page_helper(page))
-
-    return pages
+    entry = page_cache.get(LIST_KEY)
+    if entry is None:
+        generation = page_cache.generation
+        db = get_database()
+        docs = []
+
+        cursor = db.pages.find({"isPublished": True}, PAGE_PROJECTION)
+        async for page in cursor:
+            docs.append(page)
+
+        entry = page_cache.put(LIST_KEY, [page_helper(page) for page in docs], docs, generation)
+
+    return cached_response(entry, if_none_match)
+
+def encode_slug_cursor(slug: str) -> str:
+    return base64.urlsafe_b64encode(slug.encode()).decode().rstrip("=")
+
+def decode_slug_cursor(cursor: str) -> str:
+    try:
+        return base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cursor invalido")
+
+def parse_summary_fields(fields: Optional[str]) -> tuple:
+    if not fields:
+        return DEFAULT_SUMMARY_FIELDS
+    requested = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = [f for f in requested if f not in SUMMARY_FIELDS]
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Campos no permitidos: {', '.join(unknown)}. Disponibles: {', '.join(SUMMARY_FIELDS)}"
+        )
+    # slug siempre va: es la clave del cursor y del enlace a la pagina completa
+    return tuple(["slug"] + [f for f in SUMMARY_FIELDS if f in requested and f != "slug"])
+
+@router.get("/summary", response_model=PageSummaryPage)
+async def get_pages_summary(
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = Query(None, description="next_cursor de la pagina anterior"),
+    fields: Optional[str] = Query(None, description="Campos separados por coma (por defecto slug,title)"),
+    if_none_match: Optional[str] = Header(None),
+):
+    """Listado liviano de páginas publicadas para menús (sin sections), paginado por slug"""
+    selected = parse_summary_fields(fields)
+    key = summary_key(selected, cursor, limit)
+
+    entry = page_cache.get(key)
+    if entry is None:
+        generation = page_cache.generation
+        db = get_database()
+
+        query = {"isPublished": True}
+        if cursor:
+            # Keyset sobre slug (indice parcial published_slug), sin skip()
+            query["slug"] = {"$gt": decode_slug_cursor(cursor)}
+
+        projection = {f: 1 for f in selected}
+        projection["updatedAt"] = 1  # para el ETag
+        docs = await db.pages.find(query, projection).sort("slug", 1).limit(limit + 1).to_list(limit + 1)
+
+        next_cursor = None
+        if len(docs) > limit:
+            docs = docs[:limit]
+            next_cursor = encode_slug_cursor(docs[-1]["slug"])
+
+        items = [{f: doc.get(f) for f in selected} for doc in docs]
+        entry = page_cache.put(key, {"items": items, "next_cursor": next_cursor}, docs, generation)
+
+    return cached_response(entry, if_none_match)
+
+@router.get("/search", response_model=PageSearchResponse)
+async def search_pages(
+    q: str = Query(..., min_length=1, max_length=200, description="Texto a buscar (sin distinguir acentos)"),
+    limit: int = Query(10, ge=1, le=50),
+):
+    """Búsqueda de texto completo en títulos y contenido de las páginas publicadas"""
+    start = time.perf_counter()
+    hits = page_search_index.search(q, limit=limit)
+    return PageSearchResponse(
+        query=q,
+        took_ms=round((time.perf_counter() - start) * 1000.0, 3),
+        results=[PageSearchHit(**hit) for hit in hits],
+    )
 
 @router.get("/{slug}", response_model=dict)
-async def get_page_by_slug(slug: str):
+async def get_page_by_slug(slug: str, if_none_match: Optional[str] = Header(None)):
     """Obtener página por slug"""
-    db = get_database()
+    entry = page_cache.get(page_key(slug))
+    if entry is None:
+        generation = page_cache.generation
+        db = get_database()
 
-    page = await db.pages.find_one({"slug": slug})
+        page = await db.pages.find_one({"slug": slug}, PAGE_PROJECTION)
 
-    if not page:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Página con slug '{slug}' no encontrada"
-        )
+        if not page:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Página con slug '{slug}' no encontrada"
+            )
 
-    return page_helper(page)
+        entry = page_cache.put(page_key(slug), page_helper(page), [page], generation)
+
+    return cached_response(entry, if_none_match)
 
 @router.post("/", response_model=dict, status_code=status.HTTP_201_CREATED)
 async def create_page(page_data: PageCreate):
     """Crear nueva página"""
     db = get_database()
 
-    # Verificar si ya existe una página con ese slug
-    existing_page = await db.pages.find_one({"slug": page_data.slug})
-    if existing_page:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Ya existe una página con el slug '{page_data.slug}'"
-        )
+    # Sin el indice unico (duplicados previos o aun construyendose) insert_one no falla:
+    # mantener la verificacion previa como respaldo
+    if not unique_index_ready("pages", "slug_unique"):
+        if await db.pages.find_one({"slug": page_data.slug}, {"_id": 1}):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Ya existe una página con el slug '{page_data.slug}'"
+            )
 
-    # Crear página
+    # Crear página (el indice unico en slug rechaza duplicados sin carrera)
     page_dict = page_data.model_dump()
     page_dict["createdAt"] = datetime.utcnow()
     page_dict["updatedAt"] = datetime.utcnow()
 
-    result = await db.pages.insert_one(page_dict)
-    created_page = await db.pages.find_one({"_id": result.inserted_id})
+    try:
+        await db.pages.insert_one(page_dict)
+    except DuplicateKeyError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Ya existe una página con el slug '{page_data.slug}'"
+        )
+    page_cache.invalidate(page_data.slug)
+    page_search_index.upsert(page_dict)
 
-    return page_helper(created_page)
+    # insert_one agrega el _id al documento: no hace falta releerlo
+    return page_helper(page_dict)
 
 @router.put("/{slug}", response_model=dict)
 async def update_page(slug: str, page_data: PageUpdate):
     """Actualizar página existente"""
     db = get_database()
 
-    # Verificar que la página existe
-    existing_page = await db.pages.find_one({"slug": slug})
-    if not existing_page:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Página con slug '{slug}' no encontrada"
-        )
-
     # Actualizar solo los campos proporcionados
     update_data = {k: v for k, v in page_data.model_dump(exclude_unset=True).items() if v is not None}
     update_data["updatedAt"] = datetime.utcnow()
 
-    await db.pages.update_one(
+    # Una sola operacion atomica: actualiza y devuelve el documento resultante
+    updated_page = await db.pages.find_one_and_update(
         {"slug": slug},
-        {"$set": update_data}
+        {"$set": update_data},
+        projection=PAGE_PROJECTION,
+        return_document=ReturnDocument.AFTER,
     )
+    if not updated_page:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Página con slug '{slug}' no encontrada"
+        )
+    page_cache.invalidate(slug)
+    page_search_index.upsert(updated_page)
 
-    updated_page = await db.pages.find_one({"slug": slug})
     return page_helper(updated_page)
 
 @router.delete("/{slug}", status_code=status.HTTP_204_NO_CONTENT)
@@ -104,6 +220,8 @@ async def delete_page(slug: str):
     db = get_database()
 
     result = await db.pages.delete_one({"slug": slug})
+    page_cache.invalidate(slug)
+    page_search_index.remove(slug)
 
     if result.deleted_count == 0:
         raise HTTPException(
@@ -1,17 +1,38 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException
+from fastapi import APIRouter, UploadFile, File, HTTPException, Query, Response, Depends
+from typing import Optional
 from app.models.prediction import (
     SingleModelResult,
-    ConsensusResult,
     MultiModelPredictionResponse,
+    SimilarCase,
+    SimilarCasesResponse,
 )
-from app.services.model_service import model_service
-from collections import Counter
+from app.services.model_service import model_service, get_model_configs
+from app.services.heatmap_cache import heatmap_cache
+from app.services.vector_index import embedding_store
+from app.services.prediction_recorder import prediction_recorder
+from app.services.near_duplicates import near_duplicate_index, compute_dhash, format_phash
+from app.services.ingestion import ingest_image
+from app.services.consensus import compute_consensus
+from app.core.database import get_database
+from starlette.concurrency import run_in_threadpool
+from app.core.config import settings
+from app.core.runtime import run_inference
+from app.core.serialization import FastJSONResponse
+from app.core.security import get_current_admin, sign_resource, verify_resource_token
+import numpy as np
+from datetime import datetime
+import time
 
 router = APIRouter(prefix="/predict", tags=["AI Prediction"])
 
 
 @router.post("/", response_model=MultiModelPredictionResponse)
-async def predict_retinopathy(image: UploadFile = File(...)):
+async def predict_retinopathy(
+    image: UploadFile = File(...),
+    tta: bool = Query(False, description="Test-time augmentation (flips y rotaciones) en un solo forward por modelo"),
+    heatmap: Optional[str] = Query(None, description="Modelos con mapa Grad-CAM: claves separadas por coma (ej. densenet121_ea) o 'all'"),
+    return_embedding: bool = Query(False, description="Incluir el feature de 256-d de los modelos EA"),
+):
     """Endpoint para prediccion de retinopatia diabetica con 5 modelos de IA"""
 
     if not image.content_type or not image.content_type.startswith('image/'):
@@ -29,61 +50,245 @@ async def predict_retinopathy(image: UploadFile = File(...)):
             detail="Los modelos de IA no pudieron cargarse. Revise los logs del servidor.",
         )
 
-    contents = await image.read()
+    heatmap_models = _parse_heatmap_models(heatmap)
+    embedding_models = set()
+    if settings.EMBEDDINGS_ENABLED or return_embedding:
+        embedding_models = {info.get('key') for info in model_service.models.values()
+                            if model_service.supports_embedding(info.get('key'))}
 
-    raw_results = model_service.predict_all(contents)
+    request_start = time.perf_counter()
+    # Tamano, firma y dimensiones se validan antes de ocupar un slot de inferencia
+    ingested = await ingest_image(image)
+    try:
+        return await _predict_ingested(image, ingested, request_start, tta, heatmap_models,
+                                       embedding_models, return_embedding)
+    finally:
+        ingested.cleanup()
 
-    results = [SingleModelResult(**r) for r in raw_results]
 
-    consensus = _compute_consensus(results)
+async def _predict_ingested(image: UploadFile, ingested, request_start: float, tta: bool,
+                            heatmap_models: set, embedding_models: set, return_embedding: bool):
+    contents = ingested.source
+    image_digest = ingested.digest
 
-    return MultiModelPredictionResponse(
-        results=results,
-        consensus=consensus,
-        image_filename=image.filename or "imagen.jpg",
-    )
+    phash = None
+    duplicate = None
+    if settings.NEAR_DUPLICATE_MODE != "off":
+        try:
+            phash = await run_in_threadpool(compute_dhash, contents)
+        except Exception:
+            phash = None  # imagen ilegible: predict_all reportara el error
+        if phash is not None:
+            duplicate = await _find_duplicate(image_digest, phash)
 
+    inference_start = time.perf_counter()
+    if duplicate is not None and _can_reuse(duplicate, tta, heatmap_models, return_embedding):
+        # Mismo caso ya analizado con los mismos modelos: no repetir la inferencia
+        duplicate["reused"] = True
+        raw_results = [dict(r) for r in duplicate["record"]["results"]]
+    else:
+        raw_results = await run_inference(
+            model_service.predict_all, contents, tta=tta,
+            heatmap_models=heatmap_models, image_digest=image_digest,
+            embedding_models=embedding_models,
+        )
+    inference_ms = (time.perf_counter() - inference_start) * 1000.0
 
-def _compute_consensus(results: list[SingleModelResult]) -> ConsensusResult:
-    valid = [r for r in results if r.prediction != 'Error']
-    total = len(results)
+    embeddings = {}
+    for r in raw_results:
+        vector = r.pop('embedding', None)
+        if vector is None:
+            continue
+        if settings.EMBEDDINGS_ENABLED:
+            # Escritura al memmap + flush + meta.json: fuera del event loop
+            await run_in_threadpool(embedding_store.add, r['model_key'], image_digest, vector)
+        if return_embedding:
+            embeddings[r['model_key']] = vector
 
-    if not valid:
-        return ConsensusResult(
-            prediction='Error',
-            severity='none',
-            confidence=0.0,
-            agreement_count=0,
-            total_models=total,
-            recommendation='No se pudo realizar el analisis. Intente de nuevo.',
-        )
+    heatmaps = {}
+    for r in raw_results:
+        cam = r.pop('heatmap', None)
+        if cam is not None:
+            heatmaps[r['model_key']] = (r['model_name'], cam)
+
+    consensus = compute_consensus(raw_results)
+
+    duplicate_info = None
+    if duplicate is not None:
+        duplicate_info = {
+            'image_digest': duplicate["image_digest"],
+            'distance': duplicate["distance"],
+            'reused': duplicate["reused"],
+            'prediction_id': str(duplicate["record"]["_id"]) if duplicate["record"] else None,
+        }
 
-    votes = Counter(r.severity for r in valid)
-    winner_severity, agreement_count = votes.most_common(1)[0]
+    await prediction_recorder.record({
+        'image_digest': image_digest,
+        'image_filename': image.filename or "imagen.jpg",
+        'createdAt': datetime.utcnow(),
+        'results': raw_results,
+        'consensus': consensus,
+        'timings': {
+            'total_ms': round((time.perf_counter() - request_start) * 1000.0, 2),
+            'inference_ms': round(inference_ms, 2),
+        },
+        'model_versions': model_service.model_versions(),
+        'options': {'tta': tta, 'heatmap': sorted(heatmap_models), **_inference_settings()},
+        'phash': format_phash(phash) if phash is not None else None,
+        'duplicate_of': duplicate_info,
+    })
+    if phash is not None:
+        near_duplicate_index.add(image_digest, phash)
 
-    winners = [r for r in valid if r.severity == winner_severity]
-    avg_confidence = sum(r.confidence for r in winners) / len(winners)
+    return FastJSONResponse(build_prediction_payload(
+        raw_results, consensus, image.filename or "imagen.jpg", image_digest,
+        heatmaps, embeddings, duplicate_info, tta=tta,
+    ))
 
-    winner_idx = ['none', 'mild', 'moderate', 'severe', 'proliferative'].index(winner_severity)
-    from app.services.model_service import CLASS_LABELS
-    prediction = CLASS_LABELS[winner_idx]
 
-    return ConsensusResult(
-        prediction=prediction,
-        severity=winner_severity,
-        confidence=round(avg_confidence, 4),
-        agreement_count=agreement_count,
-        total_models=total,
-        recommendation=_get_recommendation(winner_severity),
+# Campos publicos de cada resultado (el registro interno tambien guarda clave y latencia)
+RESULT_FIELDS = tuple(SingleModelResult.model_fields)
+
+
+def build_prediction_payload(raw_results: list[dict], consensus: dict, image_filename: str,
+                             image_digest: Optional[str], heatmaps: dict, embeddings: dict,
+                             duplicate_info: Optional[dict], tta: bool = False) -> dict:
+    """Cuerpo de MultiModelPredictionResponse armado directamente desde los resultados
+    internos, sin instanciar modelos Pydantic. Los mapas y embeddings se quedan como
+    arrays numpy redondeados; orjson los serializa sin convertirlos a listas."""
+    return {
+        'results': [{field: r[field] for field in RESULT_FIELDS} for r in raw_results],
+        'consensus': consensus,
+        'image_filename': image_filename,
+        'image_digest': image_digest,
+        'heatmaps': {
+            key: {
+                'model_name': model_name,
+                'width': cam.shape[1],
+                'height': cam.shape[0],
+                'values': np.round(cam.astype(np.float64), 3),
+                'overlay_url': overlay_url(image_digest, key, tta),
+            }
+            for key, (model_name, cam) in heatmaps.items()
+        } or None,
+        'embeddings': {key: np.round(np.asarray(vector, dtype=np.float64), 5)
+                       for key, vector in embeddings.items()} or None,
+        'duplicate_of': duplicate_info,
+    }
+
+
+def _overlay_resource(image_digest: str, model_key: str, tta: bool) -> str:
+    return f"heatmap:{image_digest}:{model_key}:{int(tta)}"
+
+
+def overlay_url(image_digest: str, model_key: str, tta: bool) -> str:
+    """URL del overlay firmada para quien recibio la respuesta: conocer el digest no basta."""
+    token = sign_resource(_overlay_resource(image_digest, model_key, tta), settings.HEATMAP_URL_TTL_SECONDS)
+    return f"/api/predict/heatmaps/{image_digest}/{model_key}.png?tta={int(tta)}&token={token}"
+
+
+async def _find_duplicate(image_digest: str, phash: int) -> Optional[dict]:
+    """Analisis previo de la misma imagen o de una casi identica (re-codificada, escalada)."""
+    if near_duplicate_index.contains(image_digest):
+        match_digest, distance = image_digest, 0
+    else:
+        match = near_duplicate_index.lookup(phash, settings.NEAR_DUPLICATE_MAX_DISTANCE)
+        if match is None:
+            return None
+        match_digest, distance = match
+
+    record = await get_database().predictions.find_one(
+        {"image_digest": match_digest},
+        {"results": 1, "model_versions": 1, "options": 1},
+        sort=[("createdAt", -1)],
     )
+    return {"image_digest": match_digest, "distance": distance, "record": record, "reused": False,
+            "exact": match_digest == image_digest}
 
 
-def _get_recommendation(severity: str) -> str:
-    recommendations = {
-        'none': 'No se detectaron signos de retinopatia diabetica. Se recomienda control anual de rutina.',
-        'mild': 'Se detectaron signos leves de retinopatia diabetica. Consulte con su oftalmologo para evaluacion y seguimiento.',
-        'moderate': 'Se detectaron signos moderados de retinopatia diabetica. Se recomienda consulta con oftalmologo a la brevedad.',
-        'severe': 'Se detectaron signos severos de retinopatia diabetica. Se requiere atencion oftalmologica urgente.',
-        'proliferative': 'Se detecto retinopatia diabetica proliferativa. Se requiere atencion oftalmologica inmediata.',
+def _inference_settings() -> dict:
+    """Configuracion que afecta el resultado, guardada con cada analisis para reutilizarlo
+    solo si coincide con la actual."""
+    return {
+        'roi_crop_mode': settings.ROI_CROP_MODE,
+        'precision': {info.get('key') or name: info.get('precision')
+                      for name, info in model_service.models.items()},
     }
-    return recommendations.get(severity, 'Consulte con un especialista para evaluacion.')
+
+
+def _can_reuse(duplicate: dict, tta: bool, heatmap_models: set, return_embedding: bool) -> bool:
+    record = duplicate["record"]
+    if record is None or heatmap_models or return_embedding:
+        return False
+    if not duplicate["exact"] and settings.NEAR_DUPLICATE_MODE != "reuse":
+        return False
+    options = record.get("options", {})
+    if options.get("tta", False) != tta:
+        return False
+    # Recorte ROI y precision cambian las probabilidades aunque los checkpoints sean los mismos
+    current = _inference_settings()
+    if any(options.get(name) != value for name, value in current.items()):
+        return False
+    # Solo si el resultado lo produjeron exactamente los modelos cargados ahora
+    return record.get("model_versions") == model_service.model_versions()
+
+
+# Modelos EA (los que exponen forward_features y por lo tanto producen embeddings)
+EMBEDDING_MODEL_KEYS = frozenset(cfg['key'] for cfg in get_model_configs('') if 'class' in cfg)
+
+
+# Devuelve digests de casos de otros pacientes: mismo nivel de acceso que /history
+@router.get("/similar/{image_digest}", response_model=SimilarCasesResponse,
+            dependencies=[Depends(get_current_admin)])
+async def get_similar_cases(image_digest: str, model: str = Query("densenet121_ea"), k: int = Query(10, ge=1, le=100)):
+    """Casos previos mas parecidos (similitud coseno del embedding de un modelo EA)"""
+    # `model` forma parte de una ruta en disco: solo se aceptan las claves conocidas
+    if model not in EMBEDDING_MODEL_KEYS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Modelo no soportado. Modelos con embeddings: {', '.join(sorted(EMBEDDING_MODEL_KEYS))}",
+        )
+    if not embedding_store.has_index(model):
+        raise HTTPException(status_code=404, detail=f"No hay embeddings almacenados para el modelo '{model}'")
+
+    hits = await run_in_threadpool(embedding_store.similar, model, image_digest, k=k)
+    if hits is None:
+        raise HTTPException(status_code=404, detail="La imagen no esta en el indice de casos")
+
+    return SimilarCasesResponse(
+        image_digest=image_digest,
+        model_key=model,
+        results=[SimilarCase(image_digest=d, similarity=score) for d, score in hits],
+    )
+
+
+@router.get("/heatmaps/{image_digest}/{model_key}.png")
+async def get_heatmap_overlay(image_digest: str, model_key: str, tta: bool = Query(False),
+                              token: Optional[str] = Query(None)):
+    """Overlay PNG de un mapa Grad-CAM ya calculado (servido desde cache)"""
+    if not verify_resource_token(_overlay_resource(image_digest, model_key, tta), token):
+        raise HTTPException(status_code=403, detail="Enlace del mapa de calor invalido o vencido")
+    # El primer acceso codifica el PNG (optimize=True): fuera del event loop
+    png = await run_in_threadpool(heatmap_cache.overlay_png, image_digest, model_key, tta)
+    if png is None:
+        raise HTTPException(status_code=404, detail="Mapa de calor no disponible; vuelva a analizar la imagen")
+    return Response(content=png, media_type="image/png", headers={"Cache-Control": "private, max-age=86400"})
+
+
+def _parse_heatmap_models(heatmap: Optional[str]) -> set:
+    if not heatmap:
+        return set()
+    supported = {info.get('key') for info in model_service.models.values()
+                 if model_service.supports_heatmap(info.get('key'))}
+    if heatmap.strip().lower() == 'all':
+        return supported
+    requested = {k.strip() for k in heatmap.split(',') if k.strip()}
+    unsupported = requested - supported
+    if unsupported:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Mapa de calor no disponible para: {', '.join(sorted(unsupported))}. "
+                   f"Modelos soportados: {', '.join(sorted(supported))}",
+        )
+    return requested
+
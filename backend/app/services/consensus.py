@@ -0,0 +1,54 @@
+from collections import Counter
+
+# ---------------------------------------------------------------------------
+# Consenso del ensamble: voto por mayoria de severidad entre los modelos
+# (compartido por /api/predict y el scoring por lotes de batch_score.py)
+# ---------------------------------------------------------------------------
+SEVERITY_ORDER = ['none', 'mild', 'moderate', 'severe', 'proliferative']
+
+RECOMMENDATIONS = {
+    'none': 'No se detectaron signos de retinopatia diabetica. Se recomienda control anual de rutina.',
+    'mild': 'Se detectaron signos leves de retinopatia diabetica. Consulte con su oftalmologo para evaluacion y seguimiento.',
+    'moderate': 'Se detectaron signos moderados de retinopatia diabetica. Se recomienda consulta con oftalmologo a la brevedad.',
+    'severe': 'Se detectaron signos severos de retinopatia diabetica. Se requiere atencion oftalmologica urgente.',
+    'proliferative': 'Se detecto retinopatia diabetica proliferativa. Se requiere atencion oftalmologica inmediata.',
+}
+
+
+def compute_consensus(results: list[dict]) -> dict:
+    """Voto por mayoria de severidad; mismos campos que ConsensusResult."""
+    valid = [r for r in results if r['prediction'] != 'Error']
+    total = len(results)
+
+    if not valid:
+        return {
+            'prediction': 'Error',
+            'severity': 'none',
+            'confidence': 0.0,
+            'agreement_count': 0,
+            'total_models': total,
+            'recommendation': 'No se pudo realizar el analisis. Intente de nuevo.',
+        }
+
+    votes = Counter(r['severity'] for r in valid)
+    winner_severity, agreement_count = votes.most_common(1)[0]
+
+    winners = [r for r in valid if r['severity'] == winner_severity]
+    avg_confidence = sum(r['confidence'] for r in winners) / len(winners)
+
+    # Import diferido: model_service arrastra torch y este modulo no lo necesita
+    from app.services.model_service import CLASS_LABELS
+    prediction = CLASS_LABELS[SEVERITY_ORDER.index(winner_severity)]
+
+    return {
+        'prediction': prediction,
+        'severity': winner_severity,
+        'confidence': round(avg_confidence, 4),
+        'agreement_count': agreement_count,
+        'total_models': total,
+        'recommendation': get_recommendation(winner_severity),
+    }
+
+
+def get_recommendation(severity: str) -> str:
+    return RECOMMENDATIONS.get(severity, 'Consulte con un especialista para evaluacion.')
@@ -0,0 +1,110 @@
+import io
+import math
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+from PIL import Image
+
+from app.core.config import settings
+
+# ---------------------------------------------------------------------------
+# Region de interes del fondo de ojo (disco de retina sin el borde negro)
+# ---------------------------------------------------------------------------
+ROI_DETECT_SIZE = 256
+# Fraccion minima de pixeles encendidos para que una fila/columna cuente como retina
+ROI_LINE_FRACTION = 0.02
+ROI_MARGIN = 0.02
+# Por debajo de esta area el umbral fallo (imagen oscura): se usa el cuadro completo
+ROI_MIN_AREA = 0.10
+# Por encima de esta area recortar no aporta nada
+ROI_MAX_AREA = 0.97
+
+
+def _open(image_source) -> Image.Image:
+    if isinstance(image_source, (bytes, bytearray)):
+        image_source = io.BytesIO(image_source)
+    return Image.open(image_source)
+
+
+def detect_fundus_box(image_source, threshold: Optional[int] = None) -> Optional[tuple]:
+    """(left, top, right, bottom) del disco de retina en coordenadas de la imagen completa,
+    o None si no hay nada que recortar.
+
+    Se decodifica a ~256 px (draft() en JPEG escala en la DCT) y se umbraliza en numpy:
+    las filas/columnas con suficientes pixeles por encima del umbral delimitan el disco."""
+    threshold = settings.ROI_THRESHOLD if threshold is None else threshold
+    img = _open(image_source)
+    full_w, full_h = img.size
+    img.draft('L', (ROI_DETECT_SIZE, ROI_DETECT_SIZE))
+    small = img.convert('L')
+    small.thumbnail((ROI_DETECT_SIZE, ROI_DETECT_SIZE), Image.BILINEAR)
+
+    mask = np.asarray(small) > threshold
+    h, w = mask.shape
+    rows = np.flatnonzero(mask.sum(axis=1) > max(1, ROI_LINE_FRACTION * w))
+    cols = np.flatnonzero(mask.sum(axis=0) > max(1, ROI_LINE_FRACTION * h))
+    if rows.size == 0 or cols.size == 0:
+        return None
+
+    sx, sy = full_w / w, full_h / h
+    mx, my = ROI_MARGIN * w, ROI_MARGIN * h
+    left = max(0, int(math.floor((cols[0] - mx) * sx)))
+    top = max(0, int(math.floor((rows[0] - my) * sy)))
+    right = min(full_w, int(math.ceil((cols[-1] + 1 + mx) * sx)))
+    bottom = min(full_h, int(math.ceil((rows[-1] + 1 + my) * sy)))
+
+    area = (right - left) * (bottom - top) / float(full_w * full_h)
+    if area < ROI_MIN_AREA or area > ROI_MAX_AREA:
+        return None
+    return left, top, right, bottom
+
+
+def load_cropped(image_source, box: tuple, size: tuple) -> Image.Image:
+    """Decodifica solo lo necesario para `box` y lo redimensiona a `size` en un paso.
+
+    draft() reduce la escala de decodificacion JPEG mientras el recorte siga midiendo al
+    menos `size`; resize(box=...) recorta y escala sin copiar la imagen completa."""
+    img = _open(image_source)
+    full_w, full_h = img.size
+    crop_w, crop_h = box[2] - box[0], box[3] - box[1]
+    scale = max(1.0, min(crop_w / size[0], crop_h / size[1]))
+    img.draft('RGB', (math.ceil(full_w / scale), math.ceil(full_h / scale)))
+    dx, dy = full_w / img.size[0], full_h / img.size[1]
+    scaled_box = (box[0] / dx, box[1] / dy, box[2] / dx, box[3] / dy)
+    return img.convert('RGB').resize(size, Image.BILINEAR, box=scaled_box)
+
+
+class FundusRoiCache:
+    """LRU digest -> caja de recorte; las re-subidas no repiten la deteccion."""
+
+    _MISSING = object()
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._boxes: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def box_for(self, image_source, image_digest: Optional[str] = None) -> Optional[tuple]:
+        if image_digest is not None:
+            with self._lock:
+                box = self._boxes.get(image_digest, self._MISSING)
+                if box is not self._MISSING:
+                    self._boxes.move_to_end(image_digest)
+                    return box
+
+        box = detect_fundus_box(image_source)
+        if image_digest is not None:
+            with self._lock:
+                self._boxes[image_digest] = box
+                while len(self._boxes) > self.max_entries:
+                    self._boxes.popitem(last=False)
+        return box
+
+    def size(self) -> int:
+        with self._lock:
+            return len(self._boxes)
+
+
+fundus_roi_cache = FundusRoiCache(settings.ROI_CACHE_SIZE)
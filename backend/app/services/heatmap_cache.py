@@ -0,0 +1,91 @@
+import io
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+from PIL import Image
+
+from app.core.config import settings
+
+# ---------------------------------------------------------------------------
+# Cache de mapas Grad-CAM por digest de imagen
+# ---------------------------------------------------------------------------
+OVERLAY_SIZE = 224
+OVERLAY_ALPHA = 0.45
+
+
+def _jet_colormap(values: np.ndarray) -> np.ndarray:
+    """[H, W] en [0, 1] -> [H, W, 3] uint8 con una paleta tipo 'jet'."""
+    v = np.clip(values, 0.0, 1.0)
+    r = np.clip(1.5 - np.abs(4.0 * v - 3.0), 0.0, 1.0)
+    g = np.clip(1.5 - np.abs(4.0 * v - 2.0), 0.0, 1.0)
+    b = np.clip(1.5 - np.abs(4.0 * v - 1.0), 0.0, 1.0)
+    return (np.stack([r, g, b], axis=-1) * 255).astype(np.uint8)
+
+
+def render_overlay(cam: np.ndarray, thumbnail: Image.Image) -> bytes:
+    """Superpone el mapa (escalado bilinealmente) sobre la miniatura y devuelve un PNG."""
+    cam_img = Image.fromarray((cam * 255).astype(np.uint8), 'L').resize(thumbnail.size, Image.BILINEAR)
+    heat = _jet_colormap(np.asarray(cam_img, dtype=np.float32) / 255.0)
+    base = np.asarray(thumbnail.convert('RGB'), dtype=np.float32)
+    blended = (1.0 - OVERLAY_ALPHA) * base + OVERLAY_ALPHA * heat
+    buf = io.BytesIO()
+    Image.fromarray(blended.astype(np.uint8), 'RGB').save(buf, format='PNG', optimize=True)
+    return buf.getvalue()
+
+
+class HeatmapCache:
+    """LRU en memoria: (digest, modelo, tta) -> mapa de baja resolucion + overlay PNG perezoso.
+
+    Con TTA la clase objetivo del Grad-CAM es el argmax del promedio de las vistas, que puede
+    diferir de la de una sola vista: cada variante se guarda por separado."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: OrderedDict = OrderedDict()
+        self._thumbnails: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, digest: str, model_key: str, tta: bool = False) -> Optional[np.ndarray]:
+        with self._lock:
+            entry = self._entries.get((digest, model_key, tta))
+            if entry is None:
+                return None
+            self._entries.move_to_end((digest, model_key, tta))
+            return entry['cam']
+
+    def put(self, digest: str, model_key: str, cam: np.ndarray, image: Optional[Image.Image] = None,
+            tta: bool = False):
+        with self._lock:
+            self._entries[(digest, model_key, tta)] = {'cam': cam, 'png': None}
+            self._entries.move_to_end((digest, model_key, tta))
+            if image is not None and digest not in self._thumbnails:
+                self._thumbnails[digest] = image.resize((OVERLAY_SIZE, OVERLAY_SIZE), Image.BILINEAR)
+            while len(self._entries) > self.max_entries:
+                (old_digest, _, _), _ = self._entries.popitem(last=False)
+                if not any(d == old_digest for d, _, _ in self._entries):
+                    self._thumbnails.pop(old_digest, None)
+
+    def overlay_png(self, digest: str, model_key: str, tta: bool = False) -> Optional[bytes]:
+        """PNG del overlay; se genera una sola vez y queda cacheado."""
+        with self._lock:
+            entry = self._entries.get((digest, model_key, tta))
+            if entry is None:
+                return None
+            if entry['png'] is not None:
+                return entry['png']
+            cam = entry['cam']
+            thumbnail = self._thumbnails.get(digest)
+
+        if thumbnail is None:
+            thumbnail = Image.new('RGB', (OVERLAY_SIZE, OVERLAY_SIZE))
+        png = render_overlay(cam, thumbnail)
+        with self._lock:
+            if (digest, model_key, tta) in self._entries:
+                self._entries[(digest, model_key, tta)]['png'] = png
+        return png
+
+
+# Singleton
+heatmap_cache = HeatmapCache(max_entries=settings.HEATMAP_CACHE_SIZE)
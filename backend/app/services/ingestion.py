@@ -0,0 +1,176 @@
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+from typing import Optional, Union
+
+from fastapi import HTTPException, UploadFile, status
+from PIL import Image, UnidentifiedImageError
+from starlette.concurrency import run_in_threadpool
+
+from app.core.config import settings
+
+# ---------------------------------------------------------------------------
+# Ingesta de imagenes: lectura por bloques, limite de tamano y validacion temprana
+# ---------------------------------------------------------------------------
+CHUNK_SIZE = 256 * 1024
+
+# Firmas (magic bytes) de los formatos aceptados
+_SIGNATURES = [
+    (b"\xff\xd8\xff", "JPEG"),
+    (b"\x89PNG\r\n\x1a\n", "PNG"),
+    (b"BM", "BMP"),
+    (b"II*\x00", "TIFF"),
+    (b"MM\x00*", "TIFF"),
+]
+
+
+# Formato que reporta PIL para cada firma. Los JPEG multi-imagen de camaras y celulares
+# (MPO) empiezan con la misma firma y se abren como "MPO"
+_HEADER_FORMATS = {"JPEG": {"JPEG", "MPO"}}
+
+
+def sniff_format(head: bytes) -> Optional[str]:
+    for signature, fmt in _SIGNATURES:
+        if head.startswith(signature):
+            return fmt
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "WEBP"
+    return None
+
+
+class IngestedImage:
+    """Imagen subida y validada. Pequena: en memoria; grande: en un archivo temporal."""
+
+    def __init__(self, digest: str, size: int, fmt: str, width: int, height: int,
+                 data: Optional[bytes] = None, path: Optional[str] = None):
+        self.digest = digest
+        self.size = size
+        self.format = fmt
+        self.width = width
+        self.height = height
+        self._data = data
+        self._path = path
+
+    @property
+    def source(self) -> Union[bytes, str]:
+        """Bytes o ruta en disco; ambos los acepta Image.open (via decode_image)."""
+        return self._data if self._data is not None else self._path
+
+    def read_bytes(self) -> bytes:
+        if self._data is not None:
+            return self._data
+        with open(self._path, "rb") as f:
+            return f.read()
+
+    def save_to(self, destination: str):
+        """Escribe la imagen en `destination`; si ya estaba en disco solo se mueve."""
+        if self._data is not None:
+            with open(destination, "wb") as f:
+                f.write(self._data)
+        else:
+            shutil.move(self._path, destination)
+            self._path = None
+
+    def cleanup(self):
+        if self._path is not None:
+            try:
+                os.remove(self._path)
+            except OSError:
+                pass
+            self._path = None
+
+
+def _reject(status_code: int, detail: str):
+    raise HTTPException(status_code=status_code, detail=detail)
+
+
+async def ingest_image(upload: UploadFile, max_bytes: Optional[int] = None) -> IngestedImage:
+    """Lee la subida por bloques calculando el sha256, corta al superar el limite, valida
+    la firma y el encabezado (formato y dimensiones) sin decodificar los pixeles, y pasa
+    a disco cuando supera UPLOAD_SPOOL_BYTES.
+
+    Starlette ya dejo el cuerpo en su SpooledTemporaryFile: la lectura, la escritura del
+    temporal propio y Image.open son bloqueantes, asi que todo corre en el threadpool."""
+    return await run_in_threadpool(_ingest_file, upload.file, max_bytes or settings.UPLOAD_MAX_BYTES)
+
+
+def _ingest_file(fileobj, max_bytes: int) -> IngestedImage:
+    fileobj.seek(0)
+    hasher = hashlib.sha256()
+    buffer = bytearray()
+    spool_file = None
+    total = 0
+    fmt = None
+
+    try:
+        while True:
+            chunk = fileobj.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            if fmt is None:
+                fmt = sniff_format(chunk[:16])
+                if fmt is None:
+                    _reject(status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+                            "Formato no soportado. Use JPEG, PNG, BMP, TIFF o WEBP")
+            total += len(chunk)
+            if total > max_bytes:
+                _reject(status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                        f"La imagen excede el tamano maximo permitido ({max_bytes // (1024 * 1024)} MB)")
+            hasher.update(chunk)
+
+            if spool_file is None and len(buffer) + len(chunk) > settings.UPLOAD_SPOOL_BYTES:
+                os.makedirs(settings.UPLOAD_SPOOL_DIR, exist_ok=True)
+                spool_file = tempfile.NamedTemporaryFile(dir=settings.UPLOAD_SPOOL_DIR, prefix="upload_",
+                                                         delete=False)
+                spool_file.write(buffer)
+                buffer = None
+            if spool_file is not None:
+                spool_file.write(chunk)
+            else:
+                buffer.extend(chunk)
+
+        if total == 0:
+            _reject(status.HTTP_400_BAD_REQUEST, "El archivo esta vacio")
+
+        if spool_file is not None:
+            spool_file.close()
+            ingested = IngestedImage(hasher.hexdigest(), total, fmt, 0, 0, path=spool_file.name)
+        else:
+            ingested = IngestedImage(hasher.hexdigest(), total, fmt, 0, 0, data=bytes(buffer))
+    except BaseException:
+        if spool_file is not None:
+            spool_file.close()
+            os.remove(spool_file.name)
+        raise
+
+    try:
+        _validate_header(ingested)
+    except BaseException:
+        ingested.cleanup()
+        raise
+    return ingested
+
+
+def _validate_header(ingested: IngestedImage):
+    """Image.open solo lee el encabezado: formato y dimensiones sin decodificar pixeles."""
+    source = ingested.source
+    try:
+        with Image.open(io.BytesIO(source) if isinstance(source, bytes) else source) as img:
+            header_format = img.format
+            width, height = img.size
+    except (UnidentifiedImageError, OSError, Image.DecompressionBombError):
+        _reject(status.HTTP_400_BAD_REQUEST, "La imagen esta corrupta o no se puede leer")
+
+    if header_format not in _HEADER_FORMATS.get(ingested.format, {ingested.format}):
+        _reject(status.HTTP_400_BAD_REQUEST, "El contenido no coincide con el formato de imagen declarado")
+    if min(width, height) < settings.UPLOAD_MIN_DIMENSION:
+        _reject(status.HTTP_400_BAD_REQUEST,
+                f"La imagen es demasiado pequena ({width}x{height}); minimo {settings.UPLOAD_MIN_DIMENSION}px")
+    if width * height > settings.UPLOAD_MAX_PIXELS:
+        _reject(status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                f"La imagen tiene demasiados pixeles ({width}x{height})")
+
+    ingested.width = width
+    ingested.height = height
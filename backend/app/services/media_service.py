@@ -0,0 +1,223 @@
+import asyncio
+import json
+import os
+import re
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from PIL import Image, ImageOps
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------------
+# Imagenes del CMS: almacenamiento por contenido y derivados responsivos
+# ---------------------------------------------------------------------------
+# MEDIA_DIR/<digest[:2]>/<digest>/original.<ext> | w640.webp | w640.jpg | manifest.json
+DIGEST_RE = re.compile(r"^[0-9a-f]{64}$")
+ORIGINAL_EXTENSIONS = {"JPEG": "jpg", "PNG": "png", "WEBP": "webp", "BMP": "bmp", "TIFF": "tif"}
+VARIANT_EXTENSIONS = {"webp": "webp", "jpeg": "jpg"}
+MEDIA_TYPES = {"webp": "image/webp", "jpeg": "image/jpeg", "jpg": "image/jpeg", "png": "image/png",
+               "bmp": "image/bmp", "tif": "image/tiff"}
+
+
+def media_dir(digest: str) -> str:
+    return os.path.join(settings.MEDIA_DIR, digest[:2], digest)
+
+
+def _write_atomic(path: str, data: bytes):
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def read_manifest(digest: str) -> Optional[dict]:
+    try:
+        with open(os.path.join(media_dir(digest), "manifest.json"), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_manifest(manifest: dict):
+    data = json.dumps(manifest, ensure_ascii=False, indent=2).encode("utf-8")
+    _write_atomic(os.path.join(media_dir(manifest["digest"]), "manifest.json"), data)
+
+
+def target_widths(original_width: int) -> list[int]:
+    """Anchos configurados menores al original, mas el original si es menor al maximo."""
+    widths = sorted(w for w in settings.MEDIA_WIDTHS if w < original_width)
+    if original_width <= max(settings.MEDIA_WIDTHS):
+        widths.append(original_width)
+    return widths or [min(original_width, max(settings.MEDIA_WIDTHS))]
+
+
+def generate_derivatives(digest: str) -> dict:
+    """Genera los derivados WebP/JPEG de un original (CPU, corre fuera del event loop)."""
+    manifest = read_manifest(digest)
+    directory = media_dir(digest)
+    original_path = os.path.join(directory, manifest["original"])
+    start = time.perf_counter()
+
+    with Image.open(original_path) as source:
+        source = ImageOps.exif_transpose(source)
+        has_alpha = source.mode in ("RGBA", "LA") or (source.mode == "P" and "transparency" in source.info)
+        base = source.convert("RGBA" if has_alpha else "RGB")
+
+    variants = []
+    for width in target_widths(base.width):
+        height = max(1, round(base.height * width / base.width))
+        resized = base if width == base.width else base.resize((width, height), Image.LANCZOS)
+        for fmt in settings.MEDIA_FORMATS:
+            image = resized
+            if fmt == "jpeg" and image.mode == "RGBA":
+                # JPEG no tiene alfa: componer sobre blanco
+                flattened = Image.new("RGB", image.size, (255, 255, 255))
+                flattened.paste(image, mask=image.split()[-1])
+                image = flattened
+            filename = f"w{width}.{VARIANT_EXTENSIONS[fmt]}"
+            path = os.path.join(directory, filename)
+            with open(f"{path}.tmp", "wb") as f:
+                if fmt == "webp":
+                    image.save(f, format="WEBP", quality=settings.MEDIA_QUALITY, method=4)
+                else:
+                    image.save(f, format="JPEG", quality=settings.MEDIA_QUALITY, optimize=True, progressive=True)
+            os.replace(f"{path}.tmp", path)
+            variants.append({"width": width, "height": height, "format": fmt, "file": filename,
+                             "bytes": os.path.getsize(path)})
+
+    manifest["variants"] = variants
+    manifest["status"] = "ready"
+    manifest["processing_ms"] = round((time.perf_counter() - start) * 1000.0, 1)
+    write_manifest(manifest)
+    return manifest
+
+
+def pick_variant(manifest: dict, width: Optional[int], accept: str) -> Optional[dict]:
+    """Variante mas chica que cubre `width` (o la mas grande), en WebP si el cliente lo acepta."""
+    variants = manifest.get("variants") or []
+    if not variants:
+        return None
+    fmt = "webp" if "image/webp" in (accept or "") and "webp" in settings.MEDIA_FORMATS else "jpeg"
+    candidates = [v for v in variants if v["format"] == fmt] or variants
+    candidates.sort(key=lambda v: v["width"])
+    if width:
+        for variant in candidates:
+            if variant["width"] >= width:
+                return variant
+    return candidates[-1]
+
+
+class MediaService:
+    """Guarda originales por digest (deduplica) y genera derivados en segundo plano.
+
+    Un solo worker con su propio pool de un hilo: el redimensionado no compite por los
+    threads de inferencia. Los manifiestos 'pending' se re-encolan al arrancar."""
+
+    def __init__(self):
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._ready: dict = {}
+        self.stats = {'stored': 0, 'deduplicated': 0, 'processed': 0, 'failed': 0}
+
+    async def start(self):
+        os.makedirs(settings.MEDIA_DIR, exist_ok=True)
+        self._queue = asyncio.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="media")
+        self._task = asyncio.create_task(self._run(), name="media-derivatives")
+        pending = await asyncio.get_running_loop().run_in_executor(self._executor, self._find_pending)
+        for digest in pending:
+            self._queue.put_nowait(digest)
+        logger.info("Worker de derivados iniciado (%d pendientes)", len(pending))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    @staticmethod
+    def _find_pending() -> list[str]:
+        pending = []
+        if not os.path.isdir(settings.MEDIA_DIR):
+            return pending
+        for prefix in os.listdir(settings.MEDIA_DIR):
+            prefix_dir = os.path.join(settings.MEDIA_DIR, prefix)
+            if not os.path.isdir(prefix_dir):
+                continue
+            for digest in os.listdir(prefix_dir):
+                manifest = read_manifest(digest) if DIGEST_RE.match(digest) else None
+                if manifest is not None and manifest.get("status") == "pending":
+                    pending.append(digest)
+        return pending
+
+    def get_manifest(self, digest: str) -> Optional[dict]:
+        """Manifiesto del digest; los ya procesados quedan en memoria (no cambian mas)."""
+        manifest = self._ready.get(digest)
+        if manifest is None:
+            manifest = read_manifest(digest)
+            if manifest is not None and manifest.get("status") == "ready":
+                self._ready[digest] = manifest
+        return manifest
+
+    def store(self, ingested) -> tuple[dict, bool]:
+        """Guarda el original de una imagen ya validada. Devuelve (manifiesto, creado)."""
+        existing = read_manifest(ingested.digest)
+        if existing is not None:
+            self.stats['deduplicated'] += 1
+            return existing, False
+
+        directory = media_dir(ingested.digest)
+        os.makedirs(directory, exist_ok=True)
+        original = f"original.{ORIGINAL_EXTENSIONS.get(ingested.format, 'bin')}"
+        ingested.save_to(os.path.join(directory, original))
+        manifest = {
+            "digest": ingested.digest,
+            "original": original,
+            "format": ingested.format,
+            "width": ingested.width,
+            "height": ingested.height,
+            "bytes": ingested.size,
+            "status": "pending",
+            "variants": [],
+        }
+        write_manifest(manifest)
+        self.stats['stored'] += 1
+        return manifest, True
+
+    def enqueue(self, digest: str):
+        if self._queue is not None:
+            self._queue.put_nowait(digest)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            digest = await self._queue.get()
+            try:
+                await loop.run_in_executor(self._executor, generate_derivatives, digest)
+                self.stats['processed'] += 1
+            except Exception:
+                self.stats['failed'] += 1
+                logger.exception("No se pudieron generar los derivados de %s", digest)
+                manifest = read_manifest(digest)
+                if manifest is not None:
+                    manifest["status"] = "error"
+                    write_manifest(manifest)
+
+    def status(self) -> dict:
+        return {**self.stats, 'queued': self._queue.qsize() if self._queue is not None else 0}
+
+
+# Singleton
+media_service = MediaService()
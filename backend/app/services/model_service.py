@@ -2,12 +2,24 @@ import torch
 import torch.nn as nn
 import torch.nn.functional as F
 from torchvision import models, transforms
-from PIL import Image
+from torchvision.transforms import functional as TF
+from PIL import Image, ImageOps
 import io
 import os
 import gc
+import contextlib
+import hashlib
+import logging
 import threading
-import traceback
+import time
+
+from app.core.config import settings
+
+from app.services.profiler_service import profiler_service
+from app.services.heatmap_cache import heatmap_cache
+from app.services.fundus_roi import fundus_roi_cache, load_cropped
+
+logger = logging.getLogger(__name__)
 
 # ---------------------------------------------------------------------------
 # Constantes
@@ -24,6 +36,9 @@ SEVERITY_LEVELS = ['none', 'mild', 'moderate', 'severe', 'proliferative']
 
 NUM_CLASSES = 5
 
+# Precisiones soportadas en CPU: fp32, autocast bf16 (pesos fp32) y pesos almacenados en bf16
+PRECISIONS = ('fp32', 'bf16_autocast', 'bf16_weights')
+
 # ---------------------------------------------------------------------------
 # External Attention (modulo compartido por DenseNet, EfficientNet y ResNet)
 # ---------------------------------------------------------------------------
@@ -77,7 +92,8 @@ class DenseNet121WithExternalAttention(nn.Module):
         self.external_attention = ExternalAttention(dim=256, num_heads=8, dim_head=32, dropout=0.1)
         self.classifier = nn.Sequential(nn.Linear(256, 512), nn.ReLU(inplace=True), nn.Dropout(0.5), nn.Linear(512, num_classes))
 
-    def forward(self, x):
+    def forward_features(self, x):
+        """Mapa de activaciones de la ultima capa convolucional: [B, 256, 7, 7]."""
         x = self.features(x)
         x = self.extra_conv1(x)
         x = self.extra_conv2(x)
@@ -85,12 +101,18 @@ class DenseNet121WithExternalAttention(nn.Module):
         x = self.extra_conv4(x)
         x = self.extra_conv5(x)
         x = self.extra_conv6(x)
+        return x
+
+    def forward_head(self, x):
         x = self.gap(x).flatten(1)
         x = x.unsqueeze(1)
         x = self.external_attention(x)
         x = x.squeeze(1)
         return self.classifier(x)
 
+    def forward(self, x):
+        return self.forward_head(self.forward_features(x))
+
 
 # ---------------------------------------------------------------------------
 # EfficientNet-B0 + 6 Conv Layers + External Attention (SiLU activation)
@@ -112,7 +134,8 @@ class EfficientNetB0WithExternalAttention(nn.Module):
         self.external_attention = ExternalAttention(dim=256, num_heads=8, dim_head=32, dropout=0.1)
         self.classifier = nn.Sequential(nn.Linear(256, 512), nn.SiLU(inplace=True), nn.Dropout(0.5), nn.Linear(512, num_classes))
 
-    def forward(self, x):
+    def forward_features(self, x):
+        """Mapa de activaciones de la ultima capa convolucional: [B, 256, 7, 7]."""
         x = self.features(x)
         x = self.extra_conv1(x)
         x = self.extra_conv2(x)
@@ -120,12 +143,18 @@ class EfficientNetB0WithExternalAttention(nn.Module):
         x = self.extra_conv4(x)
         x = self.extra_conv5(x)
         x = self.extra_conv6(x)
+        return x
+
+    def forward_head(self, x):
         x = self.gap(x).flatten(1)
         x = x.unsqueeze(1)
         x = self.external_attention(x)
         x = x.squeeze(1)
         return self.classifier(x)
 
+    def forward(self, x):
+        return self.forward_head(self.forward_features(x))
+
 
 # ---------------------------------------------------------------------------
 # ResNet50 + 5 Conv Layers + External Attention
@@ -146,19 +175,26 @@ class ResNet50WithExternalAttention(nn.Module):
         self.external_attention = ExternalAttention(dim=256, num_heads=8, dim_head=32, dropout=0.1)
         self.classifier = nn.Sequential(nn.Linear(256, 512), nn.ReLU(inplace=True), nn.Dropout(0.5), nn.Linear(512, num_classes))
 
-    def forward(self, x):
+    def forward_features(self, x):
+        """Mapa de activaciones de la ultima capa convolucional: [B, 256, 7, 7]."""
         x = self.features(x)
         x = self.extra_conv1(x)
         x = self.extra_conv2(x)
         x = self.extra_conv3(x)
         x = self.extra_conv4(x)
         x = self.extra_conv5(x)
+        return x
+
+    def forward_head(self, x):
         x = self.gap(x).flatten(1)
         x = x.unsqueeze(1)
         x = self.external_attention(x)
         x = x.squeeze(1)
         return self.classifier(x)
 
+    def forward(self, x):
+        return self.forward_head(self.forward_features(x))
+
 
 # ---------------------------------------------------------------------------
 # Preprocessing
@@ -173,9 +209,179 @@ _inference_transform = transforms.Compose([
 ])
 
 
-def preprocess_image(image_bytes: bytes) -> torch.Tensor:
-    img = Image.open(io.BytesIO(image_bytes)).convert('RGB')
-    return _inference_transform(img).unsqueeze(0)  # [1, 3, 224, 224]
+def decode_image(image_bytes) -> Image.Image:
+    """Acepta bytes o la ruta de una subida grande que se paso a disco."""
+    if isinstance(image_bytes, (bytes, bytearray)):
+        image_bytes = io.BytesIO(image_bytes)
+    return Image.open(image_bytes).convert('RGB')
+
+
+INPUT_SIZE = (224, 224)
+
+
+def load_inference_image(image_bytes, image_digest: str = None, mode: str = None) -> Image.Image:
+    """Imagen de entrada segun ROI_CROP_MODE. En "fundus" se recorta el disco de retina y se
+    entrega ya a 224x224; si no se detecta un borde que recortar, se usa el cuadro completo."""
+    mode = mode or settings.ROI_CROP_MODE
+    if mode == "fundus":
+        box = fundus_roi_cache.box_for(image_bytes, image_digest)
+        if box is not None:
+            return load_cropped(image_bytes, box, INPUT_SIZE)
+    return decode_image(image_bytes)
+
+
+def preprocess_image(image_bytes: bytes, image_digest: str = None, mode: str = None) -> torch.Tensor:
+    pil_image = load_inference_image(image_bytes, image_digest, mode)
+    return _inference_transform(pil_image).unsqueeze(0)  # [1, 3, 224, 224]
+
+
+# ---------------------------------------------------------------------------
+# Test-time augmentation: vistas generadas de una sola decodificacion
+# ---------------------------------------------------------------------------
+TTA_ROTATIONS = (-10.0, 10.0)
+# Negro en el espacio normalizado, para que las esquinas rotadas sigan el borde del fondo de ojo
+_NORMALIZED_BLACK = [-m / s for m, s in zip(_IMAGENET_MEAN, _IMAGENET_STD)]
+
+
+def build_tta_batch(input_tensor: torch.Tensor) -> torch.Tensor:
+    """[1, 3, H, W] -> [V, 3, H, W]: original, flip horizontal, flip vertical y rotaciones."""
+    x = input_tensor[0]
+    views = [x, x.flip(-1), x.flip(-2)]
+    for angle in TTA_ROTATIONS:
+        views.append(TF.rotate(x, angle, interpolation=transforms.InterpolationMode.BILINEAR,
+                               fill=_NORMALIZED_BLACK))
+    return torch.stack(views)
+
+
+def build_tta_images(pil_image: Image.Image) -> list[Image.Image]:
+    """Mismas vistas que build_tta_batch para YOLO, que recibe imagenes PIL."""
+    views = [pil_image, ImageOps.mirror(pil_image), ImageOps.flip(pil_image)]
+    for angle in TTA_ROTATIONS:
+        # PIL rota en sentido antihorario con angulo positivo, igual que torchvision
+        views.append(pil_image.rotate(angle, resample=Image.BILINEAR))
+    return views
+
+
+def get_model_configs(models_dir: str) -> list[dict]:
+    """Configuracion de los 5 modelos del ensamble (nombre, clave corta, clase y checkpoint)."""
+    return [
+        {
+            'name': 'DenseNet121 + EA',
+            'key': 'densenet121_ea',
+            'class': DenseNet121WithExternalAttention,
+            'path': os.path.join(models_dir, 'densenet121_ea', 'best_model.pth'),
+            'checkpoint_key': 'model_state_dict',
+        },
+        {
+            'name': 'EfficientNet-B0 + EA',
+            'key': 'efficientnet_b0_ea',
+            'class': EfficientNetB0WithExternalAttention,
+            'path': os.path.join(models_dir, 'efficientnet_b0_ea', 'best_model.pth'),
+            'checkpoint_key': 'model_state_dict',
+        },
+        {
+            'name': 'ResNet50 + EA',
+            'key': 'resnet50_ea',
+            'class': ResNet50WithExternalAttention,
+            'path': os.path.join(models_dir, 'resnet50_ea', 'best_model.pth'),
+            'checkpoint_key': 'model_state_dict',
+        },
+        {
+            'name': 'ViT-B/16',
+            'key': 'vit_b16',
+            'path': os.path.join(models_dir, 'vit_b16', 'vit_b16_best.pt'),
+            'checkpoint_key': None,  # state_dict directo
+        },
+        {
+            'name': 'YOLOv8x-cls',
+            'key': 'yolov8x_cls',
+            'path': os.path.join(models_dir, 'yolov8x_cls', 'best.pt'),
+            'checkpoint_key': 'yolo',
+        },
+    ]
+
+
+def build_vit_b16(num_classes=NUM_CLASSES) -> nn.Module:
+    from torchvision.models import vit_b_16
+    model = vit_b_16(weights=None)
+    model.heads.head = nn.Linear(model.heads.head.in_features, num_classes)
+    return model
+
+
+def _forward_with_gradcam(model: nn.Module, input_tensor: torch.Tensor):
+    """Forward unico que ademas produce Grad-CAM de la clase predicha.
+
+    El backbone corre sin grafo de autograd; solo la cabeza (GAP + attention + clasificador)
+    se ejecuta con gradientes a partir del mapa de activaciones, asi que el costo extra es
+    un backward sobre unas pocas capas lineales. El mapa corresponde a la vista original
+    (indice 0) cuando hay TTA. Devuelve (logits, cam [7, 7] normalizado a [0, 1], fmap)."""
+    with torch.no_grad():
+        fmap = model.forward_features(input_tensor)
+
+    fmap = fmap.detach().requires_grad_(True)
+    with torch.enable_grad():
+        logits = model.forward_head(fmap)
+        class_idx = F.softmax(logits.float(), dim=1).mean(dim=0).argmax()
+        (grads,) = torch.autograd.grad(logits[0, class_idx], fmap)
+
+    activations = fmap[0].detach().float()
+    weights = grads[0].float().mean(dim=(1, 2))
+    cam = F.relu((weights[:, None, None] * activations).sum(dim=0))
+    peak = cam.max()
+    if peak > 0:
+        cam = cam / peak
+    return logits.detach(), cam.numpy().astype('float32'), fmap.detach()
+
+
+def pooled_embedding(model: nn.Module, fmap: torch.Tensor):
+    """Feature de 256-d (GAP del mapa) que entra a external_attention, de la vista original."""
+    return model.gap(fmap[:1]).flatten(1)[0].float().numpy()
+
+
+def bf16_supported() -> bool:
+    """True si oneDNN tiene kernels bf16 nativos (AVX512-BF16/AMX) en esta CPU."""
+    try:
+        return bool(torch.ops.mkldnn._is_mkldnn_bf16_supported())
+    except (AttributeError, RuntimeError):
+        return False
+
+
+def resolve_precision(model_key: str) -> str:
+    """Precision configurada para un modelo (clave corta o nombre), con fallback a fp32."""
+    precision = settings.MODEL_PRECISION_OVERRIDES.get(model_key, settings.MODEL_PRECISION)
+    if precision not in PRECISIONS:
+        logger.warning("Precision desconocida '%s' para %s, usando fp32", precision, model_key)
+        return 'fp32'
+    if precision != 'fp32' and not bf16_supported() and not settings.FORCE_BF16:
+        logger.warning("La CPU no soporta bf16 nativo, %s usara fp32", model_key)
+        return 'fp32'
+    return precision
+
+
+def precision_context(precision: str):
+    if precision in ('bf16_autocast', 'bf16_weights'):
+        return torch.autocast(device_type='cpu', dtype=torch.bfloat16)
+    return contextlib.nullcontext()
+
+
+def checkpoint_fingerprint(path: str, chunk: int = 1 << 20) -> str:
+    """Version corta de un checkpoint: sha256 del tamano y del primer y ultimo MB."""
+    size = os.path.getsize(path)
+    digest = hashlib.sha256(str(size).encode())
+    with open(path, 'rb') as f:
+        digest.update(f.read(chunk))
+        if size > 2 * chunk:
+            f.seek(-chunk, os.SEEK_END)
+            digest.update(f.read(chunk))
+    return digest.hexdigest()[:16]
+
+
+def _warmup_image_bytes(size: int = 512) -> bytes:
+    """JPEG con ruido para el warm-up (ejercita el mismo decode y resize que una peticion)."""
+    noise = torch.randint(0, 256, (size, size, 3), dtype=torch.uint8).numpy()
+    buf = io.BytesIO()
+    Image.fromarray(noise, 'RGB').save(buf, format='JPEG', quality=90)
+    return buf.getvalue()
 
 
 # ---------------------------------------------------------------------------
@@ -188,72 +394,115 @@ class ModelService:
         self.loading = False
         self.models_loaded_count = 0
         self.device = torch.device('cpu')
+        # Estado por modelo: pending -> loading -> warming -> ready | failed
+        self.model_status: dict = {}
 
-    def load_all_models(self, models_dir: str):
-        """Carga modelos en un thread de fondo para no bloquear el startup del servidor."""
+    def load_all_models(self, models_dir: str, background: bool = True):
+        """Carga modelos en un thread de fondo para no bloquear el startup del servidor.
+        Con `background=False` (herramientas offline) la carga es sincronica."""
         self.loading = True
+        for cfg in get_model_configs(models_dir):
+            self._set_status(cfg['name'], 'pending')
+        if not background:
+            self._load_models_sync(models_dir)
+            return
         thread = threading.Thread(target=self._load_models_sync, args=(models_dir,), daemon=True)
         thread.start()
 
     def _load_models_sync(self, models_dir: str):
-        print(f"[ModelService] Cargando modelos en background desde {models_dir} ...")
-
-        model_configs = [
-            {
-                'name': 'DenseNet121 + EA',
-                'class': DenseNet121WithExternalAttention,
-                'path': os.path.join(models_dir, 'densenet121_ea', 'best_model.pth'),
-                'checkpoint_key': 'model_state_dict',
-            },
-            {
-                'name': 'EfficientNet-B0 + EA',
-                'class': EfficientNetB0WithExternalAttention,
-                'path': os.path.join(models_dir, 'efficientnet_b0_ea', 'best_model.pth'),
-                'checkpoint_key': 'model_state_dict',
-            },
-            {
-                'name': 'ResNet50 + EA',
-                'class': ResNet50WithExternalAttention,
-                'path': os.path.join(models_dir, 'resnet50_ea', 'best_model.pth'),
-                'checkpoint_key': 'model_state_dict',
-            },
-            {
-                'name': 'ViT-B/16',
-                'path': os.path.join(models_dir, 'vit_b16', 'vit_b16_best.pt'),
-                'checkpoint_key': None,  # state_dict directo
-            },
-            {
-                'name': 'YOLOv8x-cls',
-                'path': os.path.join(models_dir, 'yolov8x_cls', 'best.pt'),
-                'checkpoint_key': 'yolo',
-            },
-        ]
+        logger.info("Cargando modelos en background desde %s ...", models_dir)
+
+        model_configs = get_model_configs(models_dir)
 
         for cfg in model_configs:
+            name = cfg['name']
             try:
                 if not os.path.exists(cfg['path']):
-                    print(f"  [WARN] No se encontro {cfg['path']}, saltando {cfg['name']}")
+                    logger.warning("No se encontro %s, saltando %s", cfg['path'], name)
+                    self._set_status(name, 'failed', error='Checkpoint no encontrado')
                     continue
 
+                self._set_status(name, 'loading')
+                start = time.perf_counter()
                 if cfg['checkpoint_key'] == 'yolo':
                     self._load_yolo(cfg)
                 elif cfg['name'] == 'ViT-B/16':
                     self._load_vit(cfg)
                 else:
                     self._load_pytorch(cfg)
+                load_time = time.perf_counter() - start
 
                 self.models_loaded_count = len(self.models)
-                print(f"  [OK] {cfg['name']} cargado ({self.models_loaded_count}/5)")
+                logger.info("%s cargado (%d/5) en %.1fs", name, self.models_loaded_count, load_time,
+                            extra={"model": name, "load_time_s": round(load_time, 3)})
+                self._set_status(name, 'warming', load_time_s=round(load_time, 3),
+                                 version=checkpoint_fingerprint(cfg['path']))
+
+                warmup_ms = self._warmup(name)
+                self._set_status(name, 'ready', warmup_latency_ms=warmup_ms)
+                logger.info("%s listo (warm-up %sms)", name, warmup_ms,
+                            extra={"model": name, "warmup_latency_ms": warmup_ms})
                 # Liberar memoria entre cargas
                 gc.collect()
-            except Exception:
-                print(f"  [ERROR] Fallo al cargar {cfg['name']}:")
-                traceback.print_exc()
+            except Exception as e:
+                logger.exception("Fallo al cargar %s", name, extra={"model": name})
+                self.models.pop(name, None)
+                self.models_loaded_count = len(self.models)
+                self._set_status(name, 'failed', error=str(e))
                 gc.collect()
 
         self.loaded = len(self.models) > 0
         self.loading = False
-        print(f"[ModelService] {len(self.models)} modelos cargados correctamente")
+        logger.info("%d modelos cargados correctamente", len(self.models))
+
+    def _set_status(self, name: str, state: str, **fields):
+        status = self.model_status.setdefault(name, {
+            'state': 'pending', 'load_time_s': None, 'warmup_latency_ms': None, 'error': None,
+            'version': None,
+        })
+        status['state'] = state
+        status.update(fields)
+
+    def _warmup(self, name: str) -> float:
+        """Ejecuta inferencias de prueba para que la primera peticion real no pague la
+        seleccion de kernels de oneDNN, el crecimiento del allocator ni el setup de ultralytics.
+        Devuelve la latencia (ms) de la ultima iteracion."""
+        info = self.models[name]
+        image_bytes = _warmup_image_bytes()
+        latency_ms = 0.0
+        for _ in range(max(1, settings.WARMUP_ITERATIONS)):
+            start = time.perf_counter()
+            if info['type'] == 'pytorch':
+                self._predict_pytorch(info, preprocess_image(image_bytes))
+            else:
+                self._predict_yolo(info, decode_image(image_bytes))
+            latency_ms = round((time.perf_counter() - start) * 1000.0, 1)
+
+        # La forma del batch de TTA tambien necesita su propia seleccion de kernels
+        if info['type'] == 'pytorch':
+            self._predict_pytorch(info, build_tta_batch(preprocess_image(image_bytes)))
+        else:
+            self._predict_yolo(info, build_tta_images(decode_image(image_bytes)))
+        return latency_ms
+
+    def model_versions(self) -> dict:
+        """Version (huella del checkpoint) de cada modelo cargado, para auditoria."""
+        return {name: (self.model_status.get(name) or {}).get('version') or 'unversioned'
+                for name in self.models}
+
+    def is_ready(self) -> bool:
+        """Listo cuando termino la carga y cada modelo cargado paso su warm-up."""
+        if self.loading or not self.loaded:
+            return False
+        return all(s['state'] in ('ready', 'failed') for s in self.model_status.values())
+
+    def readiness(self) -> dict:
+        return {
+            'ready': self.is_ready(),
+            'loading': self.loading,
+            'models_loaded': self.models_loaded_count,
+            'models': {name: dict(status) for name, status in self.model_status.items()},
+        }
 
     def _load_pytorch(self, cfg: dict):
         model = cfg['class'](num_classes=NUM_CLASSES, pretrained=False)
@@ -263,15 +512,15 @@ class ModelService:
         try:
             model.load_state_dict(state_dict)
         except RuntimeError as e:
-            print(f"  [WARN] load_state_dict fallo para {cfg['name']}, intentando remap de keys...")
+            logger.warning("load_state_dict fallo para %s, intentando remap de keys...", cfg['name'])
             model_keys = set(model.state_dict().keys())
             ckpt_keys = set(state_dict.keys())
             missing = model_keys - ckpt_keys
             unexpected = ckpt_keys - model_keys
 
             if missing or unexpected:
-                print(f"    Keys faltantes ({len(missing)}): {list(missing)[:5]}...")
-                print(f"    Keys inesperadas ({len(unexpected)}): {list(unexpected)[:5]}...")
+                logger.warning("Keys faltantes (%d): %s... | inesperadas (%d): %s...",
+                               len(missing), list(missing)[:5], len(unexpected), list(unexpected)[:5])
 
             # Intentar remap: resnet. <-> features.
             remapped = {}
@@ -285,95 +534,209 @@ class ModelService:
 
             try:
                 model.load_state_dict(remapped)
-                print(f"  [OK] Remap exitoso para {cfg['name']}")
+                logger.info("Remap exitoso para %s", cfg['name'])
             except RuntimeError:
                 # Ultimo intento: strict=False
-                print(f"  [WARN] Remap fallo, cargando con strict=False para {cfg['name']}")
+                logger.warning("Remap fallo, cargando con strict=False para %s", cfg['name'])
                 result = model.load_state_dict(state_dict, strict=False)
                 if result.missing_keys:
-                    print(f"    Missing keys: {result.missing_keys[:5]}...")
+                    logger.warning("Missing keys: %s...", result.missing_keys[:5])
                 if result.unexpected_keys:
-                    print(f"    Unexpected keys: {result.unexpected_keys[:5]}...")
+                    logger.warning("Unexpected keys: %s...", result.unexpected_keys[:5])
 
         del checkpoint, state_dict
         gc.collect()
-        model.to(self.device)
-        model.eval()
-        self.models[cfg['name']] = {'model': model, 'type': 'pytorch'}
+        self.add_model(cfg['name'], model, 'pytorch', key=cfg['key'])
 
     def _load_vit(self, cfg: dict):
-        from torchvision.models import vit_b_16
-        model = vit_b_16(weights=None)
-        model.heads.head = nn.Linear(model.heads.head.in_features, NUM_CLASSES)
+        model = build_vit_b16(NUM_CLASSES)
         state_dict = torch.load(cfg['path'], map_location=self.device, weights_only=False)
         model.load_state_dict(state_dict)
         del state_dict
         gc.collect()
-        model.to(self.device)
-        model.eval()
-        self.models[cfg['name']] = {'model': model, 'type': 'pytorch'}
+        self.add_model(cfg['name'], model, 'pytorch', key=cfg['key'])
 
     def _load_yolo(self, cfg: dict):
         from ultralytics import YOLO
         model = YOLO(cfg['path'])
-        self.models[cfg['name']] = {'model': model, 'type': 'yolo'}
-
-    def predict_all(self, image_bytes: bytes) -> list[dict]:
+        self.add_model(cfg['name'], model, 'yolo', key=cfg['key'])
+
+    def add_model(self, name: str, model, model_type: str, key: str = None, precision: str = None):
+        """Registra un modelo ya construido ('pytorch' o 'yolo') en el ensamble."""
+        precision = precision or resolve_precision(key or name)
+        if model_type == 'pytorch':
+            model.to(self.device)
+            model.eval()
+            if precision == 'bf16_weights':
+                model.to(torch.bfloat16)
+        elif precision == 'bf16_weights':
+            # El predictor de ultralytics reconvierte el modelo a fp32 al crearse:
+            # se inicializa primero y luego se castea el modelo que usa internamente
+            model.predict(Image.new('RGB', (224, 224)), imgsz=224, verbose=False)
+            model.predictor.model.to(torch.bfloat16)
+        self.models[name] = {'model': model, 'type': model_type, 'key': key, 'precision': precision}
+
+    def predict_all(self, image_bytes: bytes, tta: bool = False, heatmap_models: set = None,
+                    image_digest: str = None, embedding_models: set = None) -> list[dict]:
+        """Predice con todos los modelos. Con `tta`, cada modelo procesa todas las vistas
+        aumentadas en un solo batch y se promedia el softmax. Para los modelos en
+        `heatmap_models` (claves cortas) se agrega un mapa Grad-CAM en 'heatmap', y para
+        los de `embedding_models` el feature de 256-d en 'embedding'."""
+        with profiler_service.capture() as capture:
+            return self._predict_all(image_bytes, capture, tta, heatmap_models or set(), image_digest,
+                                     embedding_models or set())
+
+    def _predict_all(self, image_bytes: bytes, capture, tta: bool = False, heatmap_models: set = frozenset(),
+                     image_digest: str = None, embedding_models: set = frozenset()) -> list[dict]:
         results = []
-        input_tensor = preprocess_image(image_bytes)
-        pil_image = Image.open(io.BytesIO(image_bytes)).convert('RGB')
+        pil_image = load_inference_image(image_bytes, image_digest)
+        input_tensor = _inference_transform(pil_image).unsqueeze(0)
+        yolo_input = pil_image
+        if tta:
+            input_tensor = build_tta_batch(input_tensor)
+            yolo_input = build_tta_images(pil_image)
 
         for name, info in self.models.items():
+            start = time.perf_counter()
             try:
-                if info['type'] == 'pytorch':
-                    result = self._predict_pytorch(info['model'], input_tensor)
-                else:
-                    result = self._predict_yolo(info['model'], pil_image)
+                with profiler_service.model_scope(capture, name):
+                    if info['type'] == 'pytorch':
+                        result = self._predict_pytorch_extras(info, input_tensor, heatmap_models,
+                                                              embedding_models, image_digest, pil_image, tta)
+                    else:
+                        result = self._predict_yolo(info, yolo_input)
 
                 result['model_name'] = name
+                result['model_key'] = info.get('key')
+                result['latency_ms'] = round((time.perf_counter() - start) * 1000.0, 2)
                 results.append(result)
             except Exception:
-                print(f"  [ERROR] Prediccion fallo para {name}:")
-                traceback.print_exc()
+                logger.exception("Prediccion fallo para %s", name, extra={"model": name})
                 results.append({
                     'model_name': name,
+                    'model_key': info.get('key'),
                     'prediction': 'Error',
                     'confidence': 0.0,
                     'severity': 'none',
                     'probabilities': [0.0] * NUM_CLASSES,
+                    'latency_ms': round((time.perf_counter() - start) * 1000.0, 2),
                 })
 
         return results
 
-    def _predict_pytorch(self, model: nn.Module, input_tensor: torch.Tensor) -> dict:
-        with torch.no_grad():
-            logits = model(input_tensor.to(self.device))
-            probs = F.softmax(logits, dim=1).squeeze(0)
+    def supports_heatmap(self, model_key: str) -> bool:
+        return any(info.get('key') == model_key and hasattr(info['model'], 'forward_features')
+                   for info in self.models.values())
+
+    # Los embeddings salen del mismo mapa de activaciones que Grad-CAM
+    supports_embedding = supports_heatmap
+
+    def _predict_pytorch_extras(self, info: dict, input_tensor: torch.Tensor, heatmap_models: set,
+                                embedding_models: set, image_digest: str, pil_image: Image.Image,
+                                tta: bool = False) -> dict:
+        key = info.get('key')
+        if not hasattr(info['model'], 'forward_features'):
+            return self._predict_pytorch(info, input_tensor)
+
+        with_embedding = key in embedding_models
+        with_heatmap = key in heatmap_models
+        cached = heatmap_cache.get(image_digest, key, tta) if with_heatmap and image_digest else None
+        if cached is not None:
+            with_heatmap = False
+
+        result = self._predict_pytorch(info, input_tensor, with_heatmap=with_heatmap,
+                                       with_embedding=with_embedding)
+        if cached is not None:
+            result['heatmap'] = cached
+        elif with_heatmap and image_digest:
+            heatmap_cache.put(image_digest, key, result['heatmap'], pil_image, tta=tta)
+        return result
+
+    def _predict_pytorch(self, info: dict, input_tensor: torch.Tensor, with_heatmap: bool = False,
+                         with_embedding: bool = False) -> dict:
+        model = info['model']
+        input_tensor = input_tensor.to(self.device)
+        if info['precision'] == 'bf16_weights':
+            input_tensor = input_tensor.to(torch.bfloat16)
+
+        cam = None
+        embedding = None
+        with precision_context(info['precision']):
+            if with_heatmap:
+                logits, cam, fmap = _forward_with_gradcam(model, input_tensor)
+                if with_embedding:
+                    embedding = pooled_embedding(model, fmap)
+            elif with_embedding:
+                with torch.no_grad():
+                    fmap = model.forward_features(input_tensor)
+                    logits = model.forward_head(fmap)
+                    embedding = pooled_embedding(model, fmap)
+            else:
+                with torch.no_grad():
+                    logits = model(input_tensor)
+            # Promedio sobre el batch: con una sola vista equivale a squeeze(0)
+            probs = F.softmax(logits.float(), dim=1).mean(dim=0)
             confidence, class_idx = probs.max(0)
 
         idx = class_idx.item()
-        return {
+        result = {
             'prediction': CLASS_LABELS[idx],
             'confidence': round(confidence.item(), 4),
             'severity': SEVERITY_LEVELS[idx],
             'probabilities': [round(p.item(), 4) for p in probs],
         }
+        if cam is not None:
+            result['heatmap'] = cam
+        if embedding is not None:
+            result['embedding'] = embedding
+        return result
+
+    def _predict_yolo(self, info: dict, images) -> dict:
+        """`images` es una imagen PIL o una lista de vistas (se infieren en un solo batch)."""
+        with precision_context(info['precision']):
+            results = info['model'].predict(images, imgsz=224, verbose=False)
+        probs = torch.stack([r.probs.data.float() for r in results]).mean(dim=0)
+        confidence, class_idx = probs.max(0)
 
-    def _predict_yolo(self, model, pil_image: Image.Image) -> dict:
-        results = model.predict(pil_image, imgsz=224, verbose=False)
-        probs = results[0].probs
-
-        idx = probs.top1
-        confidence = probs.top1conf.item()
-        all_probs = probs.data.tolist()
-
+        idx = class_idx.item()
         return {
             'prediction': CLASS_LABELS[idx],
-            'confidence': round(confidence, 4),
+            'confidence': round(confidence.item(), 4),
             'severity': SEVERITY_LEVELS[idx],
-            'probabilities': [round(p, 4) for p in all_probs],
+            'probabilities': [round(p.item(), 4) for p in probs],
         }
 
+    def predict_batch(self, input_tensor: torch.Tensor = None, images: list = None) -> dict:
+        """Softmax por imagen de cada modelo, para scoring offline:
+        {nombre: {'probabilities': ndarray [B, 5] o None si fallo, 'latency_ms': float}}.
+
+        A diferencia de predict_all no se promedia sobre el batch: cada fila es una imagen
+        distinta. `input_tensor` ([B, 3, 224, 224] ya normalizado) alimenta los modelos
+        PyTorch e `images` (lista de PIL) a YOLO."""
+        outputs = {}
+        for name, info in self.models.items():
+            start = time.perf_counter()
+            probabilities = None
+            try:
+                if info['type'] == 'pytorch':
+                    batch = input_tensor.to(self.device)
+                    if info['precision'] == 'bf16_weights':
+                        batch = batch.to(torch.bfloat16)
+                    with precision_context(info['precision']), torch.no_grad():
+                        probs = F.softmax(info['model'](batch).float(), dim=1)
+                else:
+                    with precision_context(info['precision']):
+                        results = info['model'].predict(images, imgsz=224, verbose=False)
+                    probs = torch.stack([r.probs.data.float() for r in results])
+                probabilities = probs.numpy()
+            except Exception:
+                logger.exception("Prediccion por batch fallo para %s", name, extra={"model": name})
+            outputs[name] = {
+                'probabilities': probabilities,
+                'latency_ms': round((time.perf_counter() - start) * 1000.0, 2),
+            }
+        return outputs
+
 
 # Singleton
 model_service = ModelService()
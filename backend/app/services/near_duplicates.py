@@ -0,0 +1,138 @@
+import io
+import logging
+import threading
+from typing import Optional
+
+from PIL import Image
+
+from app.core.database import get_database
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------------
+# Deteccion de casi-duplicados con hash perceptual (dHash de 64 bits) + BK-tree
+# ---------------------------------------------------------------------------
+HASH_SIZE = 8
+
+
+def compute_dhash(image_bytes: bytes) -> int:
+    """dHash de 64 bits a partir de una decodificacion reducida.
+
+    Para JPEG, draft() decodifica directamente a 1/2..1/8 de escala via DCT, por lo
+    que el costo no depende de la resolucion original. Es robusto a re-codificacion,
+    cambios de tamano y ajustes leves de brillo."""
+    if isinstance(image_bytes, (bytes, bytearray)):
+        image_bytes = io.BytesIO(image_bytes)
+    img = Image.open(image_bytes)
+    img.draft('L', (HASH_SIZE * 8, HASH_SIZE * 8))
+    small = img.convert('L').resize((HASH_SIZE + 1, HASH_SIZE), Image.BILINEAR)
+    pixels = list(small.getdata())
+
+    value = 0
+    for row in range(HASH_SIZE):
+        offset = row * (HASH_SIZE + 1)
+        for col in range(HASH_SIZE):
+            value = (value << 1) | (pixels[offset + col] < pixels[offset + col + 1])
+    return value
+
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+class BKTree:
+    """BK-tree sobre distancia de Hamming: busqueda por radio sin recorrer todo el conjunto."""
+
+    def __init__(self):
+        # Nodo: [hash, [items], {distancia: hijo}]
+        self.root = None
+        self.size = 0
+
+    def add(self, value: int, item):
+        self.size += 1
+        if self.root is None:
+            self.root = [value, [item], {}]
+            return
+        node = self.root
+        while True:
+            d = hamming(value, node[0])
+            if d == 0:
+                node[1].append(item)
+                return
+            child = node[2].get(d)
+            if child is None:
+                node[2][d] = [value, [item], {}]
+                return
+            node = child
+
+    def search(self, value: int, radius: int) -> list[tuple]:
+        if self.root is None:
+            return []
+        matches = []
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            d = hamming(value, node[0])
+            if d <= radius:
+                matches.extend((item, d) for item in node[1])
+            # Desigualdad triangular: solo los hijos en [d - r, d + r] pueden contener coincidencias
+            for dist, child in node[2].items():
+                if d - radius <= dist <= d + radius:
+                    stack.append(child)
+        return matches
+
+
+class NearDuplicateIndex:
+    def __init__(self):
+        self._tree = BKTree()
+        self._known: set = set()
+        self._lock = threading.Lock()
+
+    def add(self, image_digest: str, phash: int):
+        with self._lock:
+            if image_digest in self._known:
+                return
+            self._known.add(image_digest)
+            self._tree.add(phash, image_digest)
+
+    def contains(self, image_digest: str) -> bool:
+        return image_digest in self._known
+
+    def lookup(self, phash: int, max_distance: int) -> Optional[tuple[str, int]]:
+        """Digest mas cercano dentro de `max_distance` bits, o None."""
+        with self._lock:
+            matches = self._tree.search(phash, max_distance)
+        if not matches:
+            return None
+        return min(matches, key=lambda m: m[1])
+
+    async def load_from_db(self):
+        """Reconstruir el arbol con los hashes de los analisis ya almacenados."""
+        try:
+            cursor = get_database().predictions.find(
+                {"phash": {"$type": "string"}}, {"image_digest": 1, "phash": 1, "_id": 0}
+            )
+            count = skipped = 0
+            async for doc in cursor:
+                # Un documento malformado no debe dejar el arbol a medio cargar
+                try:
+                    self.add(doc["image_digest"], int(doc["phash"], 16))
+                except (KeyError, TypeError, ValueError):
+                    skipped += 1
+                    continue
+                count += 1
+            logger.info("Indice de casi-duplicados cargado (%d imagenes, %d omitidas)", count, skipped)
+        except Exception:
+            logger.exception("No se pudo cargar el indice de casi-duplicados")
+
+    @property
+    def size(self) -> int:
+        return self._tree.size
+
+
+def format_phash(phash: int) -> str:
+    return f"{phash:016x}"
+
+
+# Singleton
+near_duplicate_index = NearDuplicateIndex()
@@ -0,0 +1,118 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from app.core.config import settings
+from app.core.serialization import dumps
+
+# ---------------------------------------------------------------------------
+# Cache de respuestas serializadas de /api/pages con ETag fuerte
+# ---------------------------------------------------------------------------
+LIST_KEY = ("list",)
+
+
+def page_key(slug: str) -> tuple:
+    return ("page", slug)
+
+
+def summary_key(fields: tuple, cursor, limit: int) -> tuple:
+    return ("summary", fields, cursor, limit)
+
+
+def _stamp(doc: dict) -> str:
+    updated = doc.get("updatedAt")
+    return f"{doc.get('_id')}:{updated.isoformat() if hasattr(updated, 'isoformat') else updated}"
+
+
+def compute_etag(docs: list) -> str:
+    """ETag fuerte a partir de (_id, updatedAt) de cada pagina incluida en la respuesta."""
+    digest = hashlib.sha256("|".join(_stamp(d) for d in docs).encode()).hexdigest()[:32]
+    return f'"{digest}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Comparacion debil de If-None-Match (RFC 9110): ignora el prefijo W/."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [c.strip() for c in if_none_match.split(",")]
+    return any(c[2:] == etag if c.startswith("W/") else c == etag for c in candidates)
+
+
+class CachedResponse:
+    __slots__ = ("body", "etag", "stored_at")
+
+    def __init__(self, body: bytes, etag: str):
+        self.body = body
+        self.etag = etag
+        self.stored_at = time.monotonic()
+
+
+class PageCache:
+    """Respuestas ya serializadas por slug y para el listado.
+
+    Las rutas de escritura invalidan la pagina y el listado. El TTL acota lo que puede
+    quedar obsoleto si otra herramienta (init_db.py, migrate_db.py) escribe en Mongo.
+    Es un LRU de `max_entries`: las claves incluyen parametros del cliente (cursor, slug)
+    y sin tope cualquiera podria hacer crecer la memoria con valores al azar."""
+
+    def __init__(self, ttl_seconds: float, max_entries: int = 512):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: OrderedDict = OrderedDict()
+        self._generation = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def get(self, key: tuple) -> Optional[CachedResponse]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry.stored_at > self.ttl_seconds:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+            else:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            return entry
+
+    def put(self, key: tuple, payload, docs: list, generation: int) -> CachedResponse:
+        """Serializa y guarda. Si hubo una invalidacion mientras se leia de Mongo
+        (`generation` cambio), la respuesta se devuelve pero no se cachea."""
+        body = dumps(payload)
+        entry = CachedResponse(body, compute_etag(docs))
+        with self._lock:
+            if generation == self._generation:
+                self._entries[key] = entry
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return entry
+
+    def invalidate(self, slug: Optional[str] = None):
+        with self._lock:
+            self._generation += 1
+            if slug is None:
+                self._entries.clear()
+                return
+            # Los listados (completo y resumenes paginados) dependen de todas las paginas
+            for key in [k for k in self._entries if k[0] in ("list", "summary")]:
+                del self._entries[key]
+            self._entries.pop(page_key(slug), None)
+
+    def status(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses,
+                    "generation": self._generation}
+
+
+page_cache = PageCache(settings.PAGES_CACHE_TTL, settings.PAGES_CACHE_MAX_ENTRIES)
@@ -0,0 +1,265 @@
+import bisect
+import html
+import math
+import re
+import time
+import logging
+import unicodedata
+from collections import defaultdict
+from typing import Optional
+
+from app.core.database import get_database
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------------
+# Busqueda de texto completo sobre las paginas del CMS (indice invertido en memoria)
+# ---------------------------------------------------------------------------
+# Peso de cada campo en la frecuencia de terminos (BM25F simplificado)
+FIELD_WEIGHTS = {
+    "title": 3.0,
+    "subtitle": 2.0,
+    "metaDescription": 1.5,
+    "section_title": 2.0,
+    "section_content": 1.0,
+}
+BM25_K1 = 1.2
+BM25_B = 0.75
+SNIPPET_RADIUS = 70
+MIN_PREFIX_LENGTH = 3
+
+STOPWORDS = frozenset("""
+a al algo ante antes como con contra cual cuando de del desde donde durante e el ella ellas
+ellos en entre era es esa esas ese eso esos esta estan estas este esto estos fue ha hay la las
+le les lo los mas me mi muy no nos o para pero por que se sea segun ser si sin sobre son su sus
+tambien te tiene tu un una unas uno unos y ya
+""".split())
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_FOLD_CACHE: dict = {}
+
+
+def _fold_char(ch: str) -> str:
+    """Un caracter sin acentos y en minusculas, siempre de longitud 1 (conserva offsets)."""
+    folded = _FOLD_CACHE.get(ch)
+    if folded is None:
+        base = unicodedata.normalize("NFKD", ch)[:1].lower()
+        folded = base if len(base) == 1 else ch.lower()[:1] or " "
+        _FOLD_CACHE[ch] = folded
+    return folded
+
+
+def fold_text(text: str) -> str:
+    """Texto sin acentos ni mayusculas, con la misma longitud que el original."""
+    return "".join(_fold_char(ch) for ch in text)
+
+
+def _stem(token: str) -> str:
+    """Normalizacion minima de plurales: 'imagenes' -> 'imagen', 'modelos' -> 'modelo'."""
+    if len(token) > 4 and token.endswith("es") and token[-3] not in "aeiou":
+        return token[:-2]
+    if len(token) > 3 and token.endswith("s"):
+        return token[:-1]
+    return token
+
+
+def tokenize(text: str) -> list[str]:
+    return [_stem(t) for t in _TOKEN_RE.findall(fold_text(text or "")) if t not in STOPWORDS]
+
+
+def _page_fields(page: dict) -> list[tuple[str, str]]:
+    fields = [
+        ("title", page.get("title", "")),
+        ("subtitle", page.get("subtitle", "")),
+        ("metaDescription", page.get("metaDescription", "")),
+    ]
+    for section in page.get("sections", []) or []:
+        fields.append(("section_title", section.get("title", "")))
+        fields.append(("section_content", section.get("content", "")))
+    return [(name, text) for name, text in fields if text]
+
+
+def build_snippet(text: str, terms: set, radius: int = SNIPPET_RADIUS) -> Optional[str]:
+    """Fragmento alrededor de la primera coincidencia, escapado y con <mark> en los terminos."""
+    folded = fold_text(text)
+    spans = []
+    for match in _TOKEN_RE.finditer(folded):
+        token = match.group()
+        if _stem(token) in terms or any(token.startswith(t) for t in terms if len(t) >= MIN_PREFIX_LENGTH):
+            spans.append(match.span())
+    if not spans:
+        return None
+
+    start = max(0, spans[0][0] - radius)
+    end = min(len(text), spans[0][1] + radius)
+    # No cortar palabras en los bordes
+    while start > 0 and not text[start - 1].isspace():
+        start -= 1
+    while end < len(text) and not text[end].isspace():
+        end += 1
+
+    parts = ["…" if start > 0 else ""]
+    cursor = start
+    for s, e in spans:
+        if s < start or e > end:
+            continue
+        parts.append(html.escape(text[cursor:s]))
+        parts.append(f"<mark>{html.escape(text[s:e])}</mark>")
+        cursor = e
+    parts.append(html.escape(text[cursor:end]))
+    parts.append("…" if end < len(text) else "")
+    return "".join(parts).strip()
+
+
+class PageSearchIndex:
+    """Indice invertido termino -> {slug: frecuencia ponderada} con ranking BM25.
+
+    Solo indexa paginas publicadas. Las rutas de escritura llaman a upsert()/remove(), por
+    lo que el indice se mantiene incrementalmente sin reconstruirlo completo."""
+
+    def __init__(self):
+        self._postings: dict = defaultdict(dict)
+        self._doc_terms: dict = {}
+        self._doc_length: dict = {}
+        self._docs: dict = {}
+        self._vocabulary: list = []
+        self._vocabulary_dirty = False
+        # Escrituras recibidas durante load_from_db; se reaplican tras el intercambio
+        self._pending: Optional[list] = None
+        self.loaded = False
+
+    @property
+    def size(self) -> int:
+        return len(self._docs)
+
+    def upsert(self, page: dict):
+        if self._pending is not None:
+            self._pending.append(("upsert", page))
+        self._upsert(page)
+
+    def remove(self, slug: str):
+        if self._pending is not None:
+            self._pending.append(("remove", slug))
+        self._remove(slug)
+
+    def _upsert(self, page: dict):
+        slug = page["slug"]
+        self._remove(slug)
+        if not page.get("isPublished", True):
+            return
+
+        fields = _page_fields(page)
+        weighted = defaultdict(float)
+        for name, text in fields:
+            weight = FIELD_WEIGHTS[name]
+            for term in tokenize(text):
+                weighted[term] += weight
+
+        for term, tf in weighted.items():
+            self._postings[term][slug] = tf
+        self._doc_terms[slug] = list(weighted)
+        self._doc_length[slug] = sum(weighted.values())
+        self._docs[slug] = {"title": page.get("title", ""), "fields": fields}
+        self._vocabulary_dirty = True
+
+    def _remove(self, slug: str):
+        terms = self._doc_terms.pop(slug, None)
+        if terms is None:
+            return
+        for term in terms:
+            postings = self._postings.get(term)
+            if postings is not None:
+                postings.pop(slug, None)
+                if not postings:
+                    del self._postings[term]
+        self._doc_length.pop(slug, None)
+        self._docs.pop(slug, None)
+        self._vocabulary_dirty = True
+
+    def _expand_prefix(self, prefix: str) -> list[str]:
+        if self._vocabulary_dirty:
+            self._vocabulary = sorted(self._postings)
+            self._vocabulary_dirty = False
+        start = bisect.bisect_left(self._vocabulary, prefix)
+        terms = []
+        for term in self._vocabulary[start:]:
+            if not term.startswith(prefix):
+                break
+            terms.append(term)
+        return terms
+
+    def search(self, query: str, limit: int = 10) -> list[dict]:
+        """Slugs ordenados por BM25. El ultimo termino tambien coincide como prefijo, para
+        resultados mientras se escribe."""
+        query_terms = tokenize(query)
+        if not query_terms or not self._docs:
+            return []
+
+        raw_last = _TOKEN_RE.findall(fold_text(query))[-1]
+        expanded = {t: 1.0 for t in query_terms}
+        if len(raw_last) >= MIN_PREFIX_LENGTH and raw_last not in STOPWORDS:
+            for term in self._expand_prefix(raw_last):
+                expanded.setdefault(term, 0.5)  # coincidencias por prefijo pesan menos
+
+        n_docs = len(self._docs)
+        avg_length = sum(self._doc_length.values()) / n_docs
+        scores = defaultdict(float)
+        for term, boost in expanded.items():
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1.0 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+            for slug, tf in postings.items():
+                norm = BM25_K1 * (1.0 - BM25_B + BM25_B * self._doc_length[slug] / avg_length)
+                scores[slug] += boost * idf * tf * (BM25_K1 + 1.0) / (tf + norm)
+
+        ranked = sorted(scores.items(), key=lambda kv: (-kv[1], kv[0]))[:limit]
+        highlight_terms = set(query_terms) | ({raw_last} if len(raw_last) >= MIN_PREFIX_LENGTH else set())
+        results = []
+        for slug, score in ranked:
+            doc = self._docs[slug]
+            snippet = None
+            for _, text in doc["fields"]:
+                snippet = build_snippet(text, highlight_terms)
+                if snippet:
+                    break
+            results.append({"slug": slug, "title": doc["title"], "score": round(score, 4), "snippet": snippet})
+        return results
+
+    async def load_from_db(self):
+        """Construir el indice con todas las paginas publicadas.
+
+        Las escrituras que llegan mientras se recorre el cursor se aplican al indice vigente
+        y ademas se encolan; tras el intercambio se reaplican en orden sobre el nuevo (upsert
+        y remove son idempotentes), asi ninguna se pierde aunque el cursor ya las haya leido."""
+        self._pending = []
+        try:
+            start = time.perf_counter()
+            fresh = PageSearchIndex()
+            cursor = get_database().pages.find(
+                {"isPublished": True},
+                {"slug": 1, "title": 1, "subtitle": 1, "metaDescription": 1, "sections": 1, "isPublished": 1},
+            )
+            async for page in cursor:
+                fresh.upsert(page)
+            self._postings, self._doc_terms = fresh._postings, fresh._doc_terms
+            self._doc_length, self._docs = fresh._doc_length, fresh._docs
+            # Sin awaits entre el intercambio y la reaplicacion: nada puede intercalarse
+            pending, self._pending = self._pending, None
+            for op, arg in pending:
+                if op == "upsert":
+                    self._upsert(arg)
+                else:
+                    self._remove(arg)
+            self._vocabulary_dirty = True
+            self.loaded = True
+            logger.info("Indice de busqueda de paginas cargado (%d paginas, %d terminos, %.1f ms)",
+                        self.size, len(self._postings), (time.perf_counter() - start) * 1000)
+        except Exception:
+            logger.exception("No se pudo cargar el indice de busqueda de paginas")
+        finally:
+            self._pending = None
+
+
+# Singleton
+page_search_index = PageSearchIndex()
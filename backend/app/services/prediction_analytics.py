@@ -0,0 +1,125 @@
+from collections import defaultdict
+from datetime import datetime, date, timedelta
+from typing import Optional
+
+from pymongo import UpdateOne
+
+from app.core.database import get_database
+
+# ---------------------------------------------------------------------------
+# Rollups diarios de predicciones mantenidos con $inc
+# ---------------------------------------------------------------------------
+# Un documento por dia (_id = "YYYY-MM-DD"): leer un rango cuesta O(dias), no O(predicciones)
+ROLLUP_COLLECTION = "prediction_stats_daily"
+MAX_RANGE_DAYS = 366
+
+
+def _field(name: str) -> str:
+    """Los nombres de campo de Mongo no admiten '.' ni '$' iniciales."""
+    return name.replace('.', '_').lstrip('$')
+
+
+def build_increments(records: list[dict]) -> dict:
+    """Agrupa un lote de registros en incrementos por dia."""
+    increments = defaultdict(lambda: defaultdict(int))
+    for record in records:
+        day = record['createdAt'].strftime('%Y-%m-%d')
+        inc = increments[day]
+        consensus = record['consensus']
+        severity = consensus['severity']
+
+        inc['total'] += 1
+        if consensus['prediction'] == 'Error':
+            inc['errors'] += 1
+            continue
+        inc[f'severity.{severity}'] += 1
+        inc[f"agreement.{consensus['agreement_count']}"] += 1
+        if consensus['agreement_count'] == consensus['total_models']:
+            inc['unanimous'] += 1
+        if record.get('options', {}).get('tta'):
+            inc['tta'] += 1
+
+        for result in record['results']:
+            model = _field(result.get('model_key') or result['model_name'])
+            if result['prediction'] == 'Error':
+                inc[f'models.{model}.errors'] += 1
+                continue
+            inc[f'models.{model}.total'] += 1
+            inc[f"models.{model}.severity.{result['severity']}"] += 1
+            if result['severity'] != severity:
+                inc[f'models.{model}.disagree'] += 1
+    return increments
+
+
+async def apply_records(records: list[dict]):
+    """Aplica un lote con un bulk_write de upserts atomicos ($inc)."""
+    increments = build_increments(records)
+    if not increments:
+        return
+    operations = [
+        UpdateOne(
+            {'_id': day},
+            {'$inc': dict(inc), '$setOnInsert': {'day': datetime.strptime(day, '%Y-%m-%d')}},
+            upsert=True,
+        )
+        for day, inc in increments.items()
+    ]
+    await get_database()[ROLLUP_COLLECTION].bulk_write(operations, ordered=False)
+
+
+def _merge(target: dict, source: dict):
+    for key, value in source.items():
+        if key in ('_id', 'day'):
+            continue
+        if isinstance(value, dict):
+            _merge(target.setdefault(key, {}), value)
+        else:
+            target[key] = target.get(key, 0) + value
+
+
+def _rates(totals: dict) -> dict:
+    valid = totals.get('total', 0) - totals.get('errors', 0)
+    models = {}
+    for model, stats in totals.get('models', {}).items():
+        n = stats.get('total', 0)
+        models[model] = {
+            'predictions': n,
+            'disagreement_rate': round(stats.get('disagree', 0) / n, 4) if n else None,
+            'severity': stats.get('severity', {}),
+            'errors': stats.get('errors', 0),
+        }
+    return {
+        'predictions': totals.get('total', 0),
+        'errors': totals.get('errors', 0),
+        'severity': totals.get('severity', {}),
+        'agreement_histogram': totals.get('agreement', {}),
+        'unanimous_rate': round(totals.get('unanimous', 0) / valid, 4) if valid else None,
+        'models': models,
+    }
+
+
+async def query_range(start: Optional[date], end: Optional[date]) -> dict:
+    """Serie diaria y totales del rango [start, end] leyendo solo los rollups."""
+    end = end or datetime.utcnow().date()
+    start = start or end - timedelta(days=29)
+    if start > end:
+        raise ValueError("La fecha inicial es posterior a la final")
+    if (end - start).days >= MAX_RANGE_DAYS:
+        raise ValueError(f"El rango maximo es de {MAX_RANGE_DAYS} dias")
+
+    cursor = get_database()[ROLLUP_COLLECTION].find(
+        {'_id': {'$gte': start.isoformat(), '$lte': end.isoformat()}}
+    ).sort('_id', 1)
+
+    daily = []
+    totals: dict = {}
+    async for doc in cursor:
+        daily.append({'day': doc['_id'], **_rates(doc)})
+        _merge(totals, doc)
+
+    return {
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'totals': _rates(totals),
+        'daily': daily,
+    }
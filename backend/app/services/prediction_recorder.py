@@ -0,0 +1,132 @@
+import asyncio
+import logging
+from typing import Optional
+
+from pymongo.errors import BulkWriteError
+
+from app.core.config import settings
+from app.core.database import get_database
+from app.services import prediction_analytics
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------------
+# Persistencia write-behind de predicciones (auditoria)
+# ---------------------------------------------------------------------------
+MAX_FLUSH_RETRIES = 3
+DUPLICATE_KEY_ERROR = 11000
+
+
+class PredictionRecorder:
+    """Acumula registros de prediccion en memoria y los escribe por lotes con insert_many.
+
+    La cola es acotada: si Mongo no da abasto, `record` espera (backpressure) hasta
+    RECORDER_ENQUEUE_TIMEOUT segundos antes de descartar el registro.
+    """
+
+    def __init__(self):
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self.stats = {'enqueued': 0, 'written': 0, 'dropped': 0, 'failed': 0, 'batches': 0}
+
+    async def start(self):
+        self._queue = asyncio.Queue(maxsize=settings.RECORDER_MAX_BUFFER)
+        self._stopping = False
+        self._task = asyncio.create_task(self._run(), name="prediction-recorder")
+        logger.info("Write-behind iniciado (lote=%d, buffer=%d)",
+                    settings.RECORDER_BATCH_SIZE, settings.RECORDER_MAX_BUFFER)
+
+    async def record(self, document: dict) -> bool:
+        if self._queue is None or self._stopping:
+            self.stats['dropped'] += 1
+            return False
+        try:
+            await asyncio.wait_for(self._queue.put(document), timeout=settings.RECORDER_ENQUEUE_TIMEOUT)
+        except asyncio.TimeoutError:
+            self.stats['dropped'] += 1
+            logger.warning("Buffer lleno (%d), registro descartado", self._queue.qsize())
+            return False
+        self.stats['enqueued'] += 1
+        return True
+
+    async def _run(self):
+        while True:
+            if self._stopping and self._queue.empty():
+                return
+            try:
+                first = await asyncio.wait_for(self._queue.get(), timeout=settings.RECORDER_FLUSH_INTERVAL)
+            except asyncio.TimeoutError:
+                continue
+
+            batch = [first]
+            while len(batch) < settings.RECORDER_BATCH_SIZE:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except asyncio.QueueEmpty:
+                    break
+            await self._flush(batch)
+
+    async def _flush(self, batch: list[dict]):
+        """insert_many con reintentos solo de los documentos que no se escribieron.
+
+        insert_many asigna `_id` en el lugar, asi que un reintento reenvia los mismos ids: un
+        duplicate key (11000) significa que ese documento ya habia quedado escrito."""
+        pending = batch
+        for attempt in range(1, MAX_FLUSH_RETRIES + 1):
+            written = []
+            try:
+                await get_database().predictions.insert_many(pending, ordered=False)
+                written, pending = pending, []
+            except BulkWriteError as e:
+                retry = {err['index'] for err in e.details.get('writeErrors', [])
+                         if err.get('code') != DUPLICATE_KEY_ERROR}
+                written = [doc for i, doc in enumerate(pending) if i not in retry]
+                pending = [pending[i] for i in sorted(retry)]
+                if pending:
+                    logger.warning("insert_many parcial (intento %d/%d): %d escritos, %d pendientes",
+                                   attempt, MAX_FLUSH_RETRIES, e.details.get('nInserted', 0), len(pending))
+            except Exception:
+                logger.exception("insert_many fallo (intento %d/%d)", attempt, MAX_FLUSH_RETRIES)
+
+            if written:
+                self.stats['written'] += len(written)
+                await self._after_flush(written)
+            if not pending:
+                self.stats['batches'] += 1
+                return
+            await asyncio.sleep(0.5 * attempt)
+        self.stats['failed'] += len(pending)
+
+    async def _after_flush(self, batch: list[dict]):
+        """Actualiza los rollups de analitica con el lote recien escrito."""
+        try:
+            await prediction_analytics.apply_records(batch)
+        except Exception:
+            logger.exception("No se pudieron actualizar los rollups de analitica")
+
+    async def stop(self):
+        """Deja de aceptar registros y escribe lo pendiente antes de cerrar Mongo."""
+        if self._task is None:
+            return
+        self._stopping = True
+        pending = self._queue.qsize()
+        try:
+            await asyncio.wait_for(self._task, timeout=settings.RECORDER_DRAIN_TIMEOUT)
+            logger.info("Drenado al cerrar: %d registros pendientes escritos", pending)
+        except asyncio.TimeoutError:
+            lost = self._queue.qsize()
+            self.stats['dropped'] += lost
+            logger.warning("Drenado incompleto, %d registros sin escribir", lost)
+        self._task = None
+
+    def status(self) -> dict:
+        return {
+            **self.stats,
+            'buffered': self._queue.qsize() if self._queue is not None else 0,
+            'capacity': settings.RECORDER_MAX_BUFFER,
+        }
+
+
+# Singleton
+prediction_recorder = PredictionRecorder()
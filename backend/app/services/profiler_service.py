@@ -0,0 +1,265 @@
+import cProfile
+import pstats
+import contextlib
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+import zipfile
+from typing import Optional
+
+from torch.profiler import profile, ProfilerActivity
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------------
+# Profiling bajo demanda del hot path de inferencia
+# ---------------------------------------------------------------------------
+# Numero maximo de predicciones que exportan traza chrome (el resto solo agrega)
+MAX_TRACED_PREDICTIONS = 5
+MAX_PREDICTIONS_LIMIT = 200
+MAX_DURATION_LIMIT = 600.0
+
+
+class ProfilerService:
+    """Activa cProfile + torch.profiler para las siguientes N predicciones o T segundos."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Solo una prediccion se perfila a la vez: cProfile y torch.profiler no son reentrantes
+        self._capture_lock = threading.Lock()
+        self.session: Optional[dict] = None
+
+    # -- Control de sesion ---------------------------------------------------
+    def start(self, max_predictions: Optional[int] = None, duration_seconds: Optional[float] = None,
+              record_shapes: bool = False) -> dict:
+        if max_predictions is None and duration_seconds is None:
+            max_predictions = 10
+        if max_predictions is not None:
+            max_predictions = max(1, min(int(max_predictions), MAX_PREDICTIONS_LIMIT))
+        if duration_seconds is not None:
+            duration_seconds = max(1.0, min(float(duration_seconds), MAX_DURATION_LIMIT))
+
+        with self._lock:
+            # Una sesion por tiempo puede haber vencido sin trafico que la cierre
+            self._expire_locked()
+            if self.session is not None and self.session['active']:
+                raise RuntimeError("Ya hay una sesion de profiling activa")
+
+            session_id = uuid.uuid4().hex[:12]
+            trace_dir = os.path.join(settings.PROFILER_DIR, session_id)
+            os.makedirs(trace_dir, exist_ok=True)
+            self._cleanup_old_sessions(keep=session_id)
+
+            now = time.time()
+            self.session = {
+                'id': session_id,
+                'active': True,
+                'started_at': now,
+                'finished_at': None,
+                'deadline': now + duration_seconds if duration_seconds else None,
+                'max_predictions': max_predictions,
+                'remaining': max_predictions,
+                'record_shapes': record_shapes,
+                'predictions': 0,
+                'trace_dir': trace_dir,
+                'python_stats': None,
+                'operators': {},
+                'model_totals': {},
+            }
+            logger.info("Sesion %s iniciada (predicciones=%s, segundos=%s)",
+                        session_id, max_predictions, duration_seconds)
+            return self.status()
+
+    def stop(self) -> dict:
+        with self._lock:
+            if self.session is not None and self.session['active']:
+                self._finish_locked()
+            return self.status()
+
+    def status(self) -> dict:
+        session = self.session
+        if session is None:
+            return {'active': False, 'session_id': None}
+        return {
+            'active': session['active'],
+            'session_id': session['id'],
+            'started_at': session['started_at'],
+            'finished_at': session['finished_at'],
+            'predictions_profiled': session['predictions'],
+            'remaining_predictions': session['remaining'],
+            'deadline': session['deadline'],
+        }
+
+    def _finish_locked(self):
+        session = self.session
+        session['active'] = False
+        session['finished_at'] = time.time()
+        if session['python_stats'] is not None:
+            session['python_stats'].dump_stats(os.path.join(session['trace_dir'], 'python.prof'))
+        logger.info("Sesion %s finalizada (%d predicciones)", session['id'], session['predictions'])
+
+    def _expire_locked(self):
+        session = self.session
+        if session is None or not session['active']:
+            return
+        if session['deadline'] is not None and time.time() >= session['deadline']:
+            self._finish_locked()
+        elif session['remaining'] is not None and session['remaining'] <= 0:
+            self._finish_locked()
+
+    def _cleanup_old_sessions(self, keep: str):
+        if not os.path.isdir(settings.PROFILER_DIR):
+            return
+        for entry in os.listdir(settings.PROFILER_DIR):
+            path = os.path.join(settings.PROFILER_DIR, entry)
+            if entry != keep and os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+
+    # -- Hooks del hot path ----------------------------------------------------
+    @contextlib.contextmanager
+    def capture(self):
+        """Envuelve una llamada a predict_all. Devuelve un handle o None si no se perfila."""
+        session = self.session
+        if session is None or not session['active']:
+            yield None
+            return
+
+        with self._lock:
+            self._expire_locked()
+            if not session['active'] or not self._capture_lock.acquire(blocking=False):
+                handle = None
+            else:
+                if session['remaining'] is not None:
+                    session['remaining'] -= 1
+                session['predictions'] += 1
+                handle = {
+                    'session': session,
+                    'index': session['predictions'],
+                    'python': cProfile.Profile(),
+                }
+
+        if handle is None:
+            yield None
+            return
+
+        try:
+            handle['python'].enable()
+            yield handle
+        finally:
+            handle['python'].disable()
+            with self._lock:
+                if session['python_stats'] is None:
+                    session['python_stats'] = pstats.Stats(handle['python'])
+                else:
+                    session['python_stats'].add(handle['python'])
+                if self.session is session:
+                    self._expire_locked()
+            self._capture_lock.release()
+
+    @contextlib.contextmanager
+    def model_scope(self, handle: Optional[dict], model_name: str):
+        """Perfila a nivel de operador la inferencia de un modelo dentro de una captura."""
+        if handle is None:
+            yield
+            return
+
+        session = handle['session']
+        with profile(activities=[ProfilerActivity.CPU], record_shapes=session['record_shapes'],
+                     profile_memory=True) as prof:
+            yield
+
+        self._aggregate(session, model_name, prof)
+        if handle['index'] <= MAX_TRACED_PREDICTIONS:
+            safe_name = ''.join(c if c.isalnum() else '_' for c in model_name)
+            prof.export_chrome_trace(
+                os.path.join(session['trace_dir'], f"pred{handle['index']:03d}_{safe_name}.json")
+            )
+
+    def _aggregate(self, session: dict, model_name: str, prof):
+        ops = session['operators'].setdefault(model_name, {})
+        totals = session['model_totals'].setdefault(
+            model_name, {'calls': 0, 'allocations': 0, 'allocated_bytes': 0}
+        )
+        totals['calls'] += 1
+
+        for evt in prof.key_averages():
+            if evt.key == '[memory]':
+                continue
+            op = ops.setdefault(evt.key, {
+                'count': 0, 'self_cpu_us': 0.0, 'cpu_total_us': 0.0, 'self_cpu_memory_bytes': 0,
+            })
+            op['count'] += evt.count
+            op['self_cpu_us'] += evt.self_cpu_time_total
+            op['cpu_total_us'] += evt.cpu_time_total
+            op['self_cpu_memory_bytes'] += evt.self_cpu_memory_usage
+
+        for evt in prof.events():
+            if evt.cpu_memory_usage > 0:
+                totals['allocations'] += 1
+                totals['allocated_bytes'] += evt.cpu_memory_usage
+
+    # -- Reportes --------------------------------------------------------------
+    def report(self, top: int = 20) -> dict:
+        with self._lock:
+            self._expire_locked()
+            session = self.session
+            if session is None:
+                return {'status': self.status(), 'models': {}, 'python_top': []}
+
+            models = {}
+            for model_name, ops in session['operators'].items():
+                ranked = sorted(ops.items(), key=lambda kv: kv[1]['self_cpu_us'], reverse=True)[:top]
+                totals = session['model_totals'][model_name]
+                calls = max(totals['calls'], 1)
+                models[model_name] = {
+                    'calls': totals['calls'],
+                    'allocations_per_call': round(totals['allocations'] / calls, 1),
+                    'allocated_bytes_per_call': int(totals['allocated_bytes'] / calls),
+                    'top_operators': [
+                        {
+                            'name': name,
+                            'count': op['count'],
+                            'self_cpu_ms': round(op['self_cpu_us'] / 1000.0, 3),
+                            'cpu_total_ms': round(op['cpu_total_us'] / 1000.0, 3),
+                            'self_cpu_memory_bytes': op['self_cpu_memory_bytes'],
+                        }
+                        for name, op in ranked
+                    ],
+                }
+
+            python_top = []
+            if session['python_stats'] is not None:
+                entries = session['python_stats'].stats.items()
+                ranked = sorted(entries, key=lambda kv: kv[1][3], reverse=True)[:top]
+                for (filename, line, func), (cc, nc, tt, ct, _callers) in ranked:
+                    python_top.append({
+                        'function': f"{os.path.basename(filename)}:{line}({func})",
+                        'calls': nc,
+                        'tottime_ms': round(tt * 1000.0, 3),
+                        'cumtime_ms': round(ct * 1000.0, 3),
+                    })
+
+            return {'status': self.status(), 'models': models, 'python_top': python_top}
+
+    def build_trace_archive(self) -> Optional[str]:
+        """Empaqueta las trazas chrome y el .prof de la ultima sesion en un zip."""
+        with self._lock:
+            session = self.session
+            if session is None or session['active']:
+                return None
+            trace_dir = session['trace_dir']
+            archive_path = os.path.join(tempfile.gettempdir(), f"profile_{session['id']}.zip")
+            with zipfile.ZipFile(archive_path, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+                for entry in sorted(os.listdir(trace_dir)):
+                    zf.write(os.path.join(trace_dir, entry), arcname=entry)
+            return archive_path
+
+
+# Singleton
+profiler_service = ProfilerService()
@@ -0,0 +1,208 @@
+import json
+import os
+import threading
+import time
+from typing import Optional
+
+import numpy as np
+
+from app.core.config import settings
+
+# ---------------------------------------------------------------------------
+# Indice vectorial en disco para busqueda de casos similares
+# ---------------------------------------------------------------------------
+SEARCH_BLOCK_ROWS = 65536
+
+
+class VectorIndex:
+    """Matriz float32 memory-mapped (capacidad x dim) con ids en un archivo de lineas.
+
+    Los vectores se guardan normalizados (L2), asi el producto punto es la similitud coseno.
+    Agregar un vector escribe una fila y una linea; la matriz crece duplicando el archivo.
+    El flush del memmap y meta.json se agrupan cada `flush_every` altas o `flush_interval`
+    segundos: ante un corte solo se pierden (no se corrompen) las altas no sincronizadas,
+    porque al abrir se descartan las ids mas alla del count de meta.json.
+    """
+
+    def __init__(self, directory: str, dim: int, initial_capacity: int = 4096,
+                 flush_every: int = 64, flush_interval: float = 30.0):
+        self.directory = directory
+        self.dim = dim
+        self.flush_every = max(1, flush_every)
+        self.flush_interval = flush_interval
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self._lock = threading.Lock()
+        self._vectors_path = os.path.join(directory, 'vectors.f32')
+        self._ids_path = os.path.join(directory, 'ids.txt')
+        self._meta_path = os.path.join(directory, 'meta.json')
+        os.makedirs(directory, exist_ok=True)
+
+        self.ids: list[str] = []
+        self._rows: dict[str, int] = {}
+        capacity = initial_capacity
+        count = 0
+        if os.path.exists(self._meta_path):
+            with open(self._meta_path, 'r') as f:
+                meta = json.load(f)
+            if meta.get('dim') != dim:
+                raise ValueError(f"Indice en {directory} tiene dim {meta.get('dim')}, se esperaba {dim}")
+            capacity = meta['capacity']
+            count = meta['count']
+            with open(self._ids_path, 'r') as f:
+                self.ids = [line.rstrip('\n') for line in f][:count]
+            count = len(self.ids)
+
+        self.count = count
+        self.capacity = capacity
+        self._open_matrix(capacity)
+        self._rows = {id_: row for row, id_ in enumerate(self.ids)}
+        # Reescribir ids por si quedaron lineas de una escritura interrumpida
+        self._rewrite_ids()
+        self._write_meta()
+
+    def _open_matrix(self, capacity: int):
+        needed = capacity * self.dim * 4
+        if not os.path.exists(self._vectors_path) or os.path.getsize(self._vectors_path) < needed:
+            with open(self._vectors_path, 'ab') as f:
+                f.truncate(needed)
+        self._matrix = np.memmap(self._vectors_path, dtype=np.float32, mode='r+', shape=(capacity, self.dim))
+
+    def _grow(self):
+        self._matrix.flush()
+        del self._matrix
+        self.capacity *= 2
+        self._open_matrix(self.capacity)
+
+    def _rewrite_ids(self):
+        with open(self._ids_path, 'w') as f:
+            f.writelines(f"{id_}\n" for id_ in self.ids)
+
+    def _sync(self):
+        self._matrix.flush()
+        self._write_meta()
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def _write_meta(self):
+        tmp = self._meta_path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump({'dim': self.dim, 'count': self.count, 'capacity': self.capacity}, f)
+        os.replace(tmp, self._meta_path)
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+    def add(self, id_: str, vector: np.ndarray):
+        vector = self._normalize(vector.reshape(-1))
+        with self._lock:
+            row = self._rows.get(id_)
+            if row is None:
+                if self.count == self.capacity:
+                    self._grow()
+                row = self.count
+                self._matrix[row] = vector
+                self.ids.append(id_)
+                self._rows[id_] = row
+                with open(self._ids_path, 'a') as f:
+                    f.write(f"{id_}\n")
+                self.count += 1
+            else:
+                self._matrix[row] = vector
+            self._unsynced += 1
+            if (self._unsynced >= self.flush_every
+                    or time.monotonic() - self._last_sync >= self.flush_interval):
+                self._sync()
+
+    def get(self, id_: str) -> Optional[np.ndarray]:
+        row = self._rows.get(id_)
+        if row is None:
+            return None
+        return np.array(self._matrix[row])
+
+    def search(self, queries: np.ndarray, k: int = 10, exclude: Optional[set] = None) -> list[list[tuple[str, float]]]:
+        """Top-k por similitud coseno para un batch de consultas [Q, dim] (o un vector)."""
+        queries = self._normalize(np.atleast_2d(queries))
+        count = self.count
+        if count == 0:
+            return [[] for _ in range(len(queries))]
+
+        exclude = exclude or set()
+        want = min(k + len(exclude), count)
+        best_scores = np.full((len(queries), 0), -np.inf, dtype=np.float32)
+        best_rows = np.zeros((len(queries), 0), dtype=np.int64)
+
+        for start in range(0, count, SEARCH_BLOCK_ROWS):
+            block = self._matrix[start:min(start + SEARCH_BLOCK_ROWS, count)]
+            scores = queries @ block.T  # [Q, B]
+            take = min(want, scores.shape[1])
+            top = np.argpartition(-scores, take - 1, axis=1)[:, :take]
+            best_scores = np.concatenate([best_scores, np.take_along_axis(scores, top, axis=1)], axis=1)
+            best_rows = np.concatenate([best_rows, top + start], axis=1)
+            if best_scores.shape[1] > want:
+                keep = np.argpartition(-best_scores, want - 1, axis=1)[:, :want]
+                best_scores = np.take_along_axis(best_scores, keep, axis=1)
+                best_rows = np.take_along_axis(best_rows, keep, axis=1)
+
+        results = []
+        for scores, rows in zip(best_scores, best_rows):
+            order = np.argsort(-scores)
+            hits = []
+            for i in order:
+                id_ = self.ids[rows[i]]
+                if id_ in exclude:
+                    continue
+                hits.append((id_, round(float(scores[i]), 5)))
+                if len(hits) == k:
+                    break
+            results.append(hits)
+        return results
+
+    def close(self):
+        with self._lock:
+            self._sync()
+
+
+class EmbeddingStore:
+    """Un VectorIndex por modelo (los espacios de embedding no son comparables entre modelos)."""
+
+    def __init__(self, directory: str, dim: int):
+        self.directory = directory
+        self.dim = dim
+        self._indexes: dict[str, VectorIndex] = {}
+        self._lock = threading.Lock()
+
+    def index(self, model_key: str) -> VectorIndex:
+        with self._lock:
+            if model_key not in self._indexes:
+                self._indexes[model_key] = VectorIndex(
+                    os.path.join(self.directory, model_key), self.dim,
+                    flush_every=settings.EMBEDDINGS_FLUSH_EVERY,
+                    flush_interval=settings.EMBEDDINGS_FLUSH_INTERVAL_SECONDS,
+                )
+            return self._indexes[model_key]
+
+    def has_index(self, model_key: str) -> bool:
+        return model_key in self._indexes or os.path.exists(os.path.join(self.directory, model_key, 'meta.json'))
+
+    def add(self, model_key: str, id_: str, vector: np.ndarray):
+        self.index(model_key).add(id_, vector)
+
+    def similar(self, model_key: str, id_: str, k: int = 10) -> Optional[list[tuple[str, float]]]:
+        """Casos mas parecidos a uno ya indexado, o None si el caso no esta en el indice."""
+        index = self.index(model_key)
+        vector = index.get(id_)
+        if vector is None:
+            return None
+        return index.search(vector, k=k, exclude={id_})[0]
+
+    def close(self):
+        for index in self._indexes.values():
+            index.close()
+
+
+# Singleton
+embedding_store = EmbeddingStore(settings.EMBEDDINGS_DIR, dim=256)
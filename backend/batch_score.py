@@ -0,0 +1,462 @@
+"""
+Scoring offline del ensamble sobre archivos de imagenes de fondo de ojo (estudios retrospectivos).
+
+Lee las imagenes de un directorio (recursivo) o de un manifiesto, las decodifica en un pool
+de procesos con prefetch acotado, ejecuta cada modelo en batch y escribe por imagen las
+probabilidades de cada modelo y el consenso en CSV o Parquet. Al volver a ejecutar con la
+misma salida se saltan las imagenes ya escritas, asi que un corte no obliga a empezar de cero.
+
+Uso (desde backend/):
+    python batch_score.py /datos/fondos --output scores.csv
+    python batch_score.py /datos --manifest lista.csv --output scores/ --format parquet
+    python batch_score.py /datos/fondos --output prueba.csv --synthetic --limit 200 --report reporte.json
+"""
+import argparse
+import csv
+import hashlib
+import multiprocessing
+import os
+import sys
+import time
+from collections import deque
+from itertools import islice
+
+import numpy as np
+import torch
+from PIL import Image
+
+from app.core.runtime import detect_cpu_budget
+from app.services.consensus import compute_consensus
+from app.services.model_service import (
+    CLASS_LABELS,
+    SEVERITY_LEVELS,
+    _inference_transform,
+    load_inference_image,
+    model_service,
+)
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.tif', '.tiff', '.webp')
+
+# YOLO redimensiona internamente a 224: basta con enviarle un lado corto de 448 px en vez del
+# original de varios megapixeles, que seria caro de copiar entre procesos
+YOLO_MIN_SIDE = 448
+
+BASE_COLUMNS = ['image_id', 'image_digest', 'status', 'error']
+CONSENSUS_COLUMNS = ['consensus_prediction', 'consensus_severity', 'consensus_confidence',
+                     'agreement_count', 'total_models']
+
+
+# ---------------------------------------------------------------------------
+# Fuentes de imagenes
+# ---------------------------------------------------------------------------
+def iter_directory(root: str):
+    """(image_id, ruta) en orden estable; image_id es la ruta relativa a `root`."""
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for name in sorted(filenames):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                path = os.path.join(dirpath, name)
+                yield os.path.relpath(path, root).replace(os.sep, '/'), path
+
+
+def iter_manifest(manifest: str, root: str = None):
+    """Una ruta por linea, o un CSV con columna 'path' (y opcionalmente 'image_id').
+    Las rutas relativas se resuelven contra `root` o la carpeta del manifiesto."""
+    base = root or os.path.dirname(os.path.abspath(manifest))
+    with open(manifest, 'r', encoding='utf-8', newline='') as f:
+        first = f.readline()
+        f.seek(0)
+        if 'path' in [c.strip() for c in first.split(',')]:
+            rows = ((row.get('image_id') or row['path'], row['path']) for row in csv.DictReader(f))
+        else:
+            rows = ((line.strip(), line.strip()) for line in f)
+        for image_id, path in rows:
+            if not path or path.startswith('#'):
+                continue
+            yield image_id, path if os.path.isabs(path) else os.path.join(base, path)
+
+
+# ---------------------------------------------------------------------------
+# Decodificacion en procesos worker
+# ---------------------------------------------------------------------------
+_worker_options: dict = {}
+
+
+def _init_decoder(options: dict):
+    # El paralelismo viene de los procesos; un thread de torch por worker evita sobre-suscripcion
+    torch.set_num_threads(1)
+    _worker_options.update(options)
+
+
+def _reduce_for_yolo(pil_image: Image.Image) -> Image.Image:
+    scale = YOLO_MIN_SIDE / min(pil_image.size)
+    if scale >= 1.0:
+        return pil_image
+    size = (max(1, round(pil_image.width * scale)), max(1, round(pil_image.height * scale)))
+    return pil_image.resize(size, Image.BILINEAR, reducing_gap=3.0)
+
+
+def decode_item(item: tuple) -> dict:
+    """Lee, decodifica y preprocesa una imagen con el mismo pipeline que /api/predict."""
+    image_id, path = item
+    start = time.perf_counter()
+    decoded = {'image_id': image_id, 'image_digest': None, 'tensor': None, 'yolo_image': None,
+               'error': None}
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+        decoded['image_digest'] = hashlib.sha256(data).hexdigest()
+        pil_image = load_inference_image(data, decoded['image_digest'], _worker_options['roi_mode'])
+        if _worker_options['pytorch']:
+            decoded['tensor'] = _inference_transform(pil_image).numpy()
+        if _worker_options['yolo']:
+            decoded['yolo_image'] = _reduce_for_yolo(pil_image)
+    except Exception as e:
+        decoded['error'] = f"{type(e).__name__}: {e}"
+    decoded['decode_ms'] = (time.perf_counter() - start) * 1000.0
+    return decoded
+
+
+def decoded_stream(pool, items, window: int):
+    """Decodifica en el pool manteniendo a lo sumo `window` imagenes en vuelo (prefetch
+    acotado: la memoria no crece si la inferencia es mas lenta que la decodificacion).
+    Conserva el orden de entrada."""
+    pending = deque()
+    for item in items:
+        pending.append(pool.apply_async(decode_item, (item,)))
+        if len(pending) >= window:
+            yield pending.popleft().get()
+    while pending:
+        yield pending.popleft().get()
+
+
+# ---------------------------------------------------------------------------
+# Salida con checkpoint
+# ---------------------------------------------------------------------------
+class CsvScoreWriter:
+    """CSV en modo append, con flush + fsync por batch: lo escrito es el checkpoint."""
+
+    def __init__(self, path: str, columns: list[str]):
+        self.path = path
+        self.columns = columns
+        self._file = None
+        self._writer = None
+
+    def completed_ids(self) -> set:
+        if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+            return set()
+        self._truncate_partial_line()
+        if os.path.getsize(self.path) == 0:
+            return set()
+        with open(self.path, 'r', encoding='utf-8', newline='') as f:
+            reader = csv.DictReader(f)
+            if reader.fieldnames != self.columns:
+                raise SystemExit(f"[Batch] Las columnas de {self.path} no coinciden con los modelos "
+                                 f"cargados; use otra salida o los mismos modelos")
+            return {row['image_id'] for row in reader}
+
+    def _truncate_partial_line(self):
+        """Un corte a mitad de escritura deja una fila incompleta al final: se descarta."""
+        with open(self.path, 'rb+') as f:
+            data = f.read()
+            if data.endswith(b'\n'):
+                return
+            f.truncate(data.rfind(b'\n') + 1)
+
+    def write(self, rows: list[dict]):
+        if self._file is None:
+            is_new = not os.path.exists(self.path) or os.path.getsize(self.path) == 0
+            self._file = open(self.path, 'a', encoding='utf-8', newline='')
+            self._writer = csv.DictWriter(self._file, fieldnames=self.columns)
+            if is_new:
+                self._writer.writeheader()
+        self._writer.writerows(rows)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class ParquetScoreWriter:
+    """Directorio de archivos part-NNNNN.parquet; cada parte se escribe de forma atomica
+    cuando se acumulan `flush_rows` filas. Requiere pyarrow (o fastparquet) para pandas."""
+
+    def __init__(self, directory: str, columns: list[str], flush_rows: int):
+        import pandas as pd
+        self._pd = pd
+        self.directory = directory
+        self.columns = columns
+        self.flush_rows = flush_rows
+        self._buffer: list[dict] = []
+        os.makedirs(directory, exist_ok=True)
+        self._next_part = len(self._parts())
+
+    def _parts(self) -> list[str]:
+        return sorted(name for name in os.listdir(self.directory)
+                      if name.startswith('part-') and name.endswith('.parquet'))
+
+    def completed_ids(self) -> set:
+        done = set()
+        for name in self._parts():
+            frame = self._pd.read_parquet(os.path.join(self.directory, name), columns=['image_id'])
+            done.update(frame['image_id'])
+        return done
+
+    def write(self, rows: list[dict]):
+        self._buffer.extend(rows)
+        if len(self._buffer) >= self.flush_rows:
+            self._flush()
+
+    def _flush(self):
+        if not self._buffer:
+            return
+        path = os.path.join(self.directory, f"part-{self._next_part:05d}.parquet")
+        frame = self._pd.DataFrame(self._buffer, columns=self.columns)
+        frame.to_parquet(f"{path}.tmp", index=False)
+        os.replace(f"{path}.tmp", path)
+        self._next_part += 1
+        self._buffer = []
+
+    def close(self):
+        self._flush()
+
+
+# ---------------------------------------------------------------------------
+# Scoring
+# ---------------------------------------------------------------------------
+def model_columns(model_keys: list[str]) -> list[str]:
+    columns = []
+    for key in model_keys:
+        columns.extend(f"{key}_{severity}" for severity in SEVERITY_LEVELS)
+        columns.append(f"{key}_severity")
+    return columns
+
+
+def build_rows(batch: list[dict], outputs: dict, model_keys: dict) -> list[dict]:
+    """Una fila por imagen con las probabilidades de cada modelo y el consenso por mayoria
+    (la misma regla que la API)."""
+    rows = []
+    ok_index = 0
+    for decoded in batch:
+        row = {'image_id': decoded['image_id'], 'image_digest': decoded['image_digest'],
+               'status': 'ok', 'error': decoded['error']}
+        if decoded['error'] is not None:
+            row['status'] = 'error'
+            rows.append(row)
+            continue
+
+        results = []
+        for name, key in model_keys.items():
+            probs = outputs[name]['probabilities']
+            if probs is None:
+                row['status'] = 'partial'
+                results.append({'prediction': 'Error', 'severity': 'none', 'confidence': 0.0})
+                continue
+            p = probs[ok_index]
+            idx = int(p.argmax())
+            for severity, value in zip(SEVERITY_LEVELS, p):
+                row[f"{key}_{severity}"] = round(float(value), 6)
+            row[f"{key}_severity"] = SEVERITY_LEVELS[idx]
+            results.append({'prediction': CLASS_LABELS[idx], 'severity': SEVERITY_LEVELS[idx],
+                            'confidence': round(float(p[idx]), 4)})
+        ok_index += 1
+
+        consensus = compute_consensus(results)
+        row.update({
+            'consensus_prediction': consensus['prediction'],
+            'consensus_severity': consensus['severity'],
+            'consensus_confidence': consensus['confidence'],
+            'agreement_count': consensus['agreement_count'],
+            'total_models': consensus['total_models'],
+        })
+        rows.append(row)
+    return rows
+
+
+def load_service(args):
+    if args.synthetic:
+        from benchmarks.synthetic import build_synthetic_service
+        return build_synthetic_service(args.models or None, seed=args.seed)
+
+    model_service.load_all_models(args.models_dir, background=False)
+    if args.models:
+        for name in [n for n, info in model_service.models.items() if info['key'] not in args.models]:
+            del model_service.models[name]
+    return model_service
+
+
+def run(args) -> dict:
+    budget = detect_cpu_budget()
+    workers = args.workers or max(1, budget['effective_cpus'] // 2)
+    threads = args.threads or max(1, budget['effective_cpus'] - workers)
+
+    if args.manifest:
+        source = iter_manifest(args.manifest, args.root)
+    else:
+        source = iter_directory(args.root)
+
+    # spawn: los workers no heredan el estado de OpenMP ni los modelos cargados en este proceso
+    context = multiprocessing.get_context('spawn')
+    print(f"[Batch] Cargando modelos ({'sinteticos' if args.synthetic else args.models_dir}) ...")
+    service = load_service(args)
+    if not service.models:
+        raise SystemExit("[Batch] No hay modelos cargados")
+    torch.set_num_threads(threads)
+
+    model_keys = {name: info.get('key') or name for name, info in service.models.items()}
+    has_pytorch = any(info['type'] == 'pytorch' for info in service.models.values())
+    has_yolo = any(info['type'] == 'yolo' for info in service.models.values())
+    columns = BASE_COLUMNS + model_columns(list(model_keys.values())) + CONSENSUS_COLUMNS
+
+    if args.format == 'parquet':
+        writer = ParquetScoreWriter(args.output, columns, args.flush_rows)
+    else:
+        writer = CsvScoreWriter(args.output, columns)
+    done = writer.completed_ids()
+    if done:
+        print(f"[Batch] Reanudando: {len(done)} imagenes ya estaban en {args.output}")
+
+    skipped = 0
+
+    def pending_items():
+        nonlocal skipped
+        for item in source:
+            if item[0] in done:
+                skipped += 1
+                continue
+            yield item
+
+    items = pending_items()
+    if args.limit:
+        items = islice(items, args.limit)
+
+    stats = {'scored': 0, 'errors': 0, 'partial': 0, 'batches': 0, 'decode_wait_s': 0.0,
+             'inference_s': 0.0, 'write_s': 0.0, 'decode_ms_total': 0.0}
+    model_latency = {name: 0.0 for name in model_keys}
+    options = {'roi_mode': args.roi_mode, 'pytorch': has_pytorch, 'yolo': has_yolo}
+    started = time.perf_counter()
+    last_progress = started
+
+    with context.Pool(workers, initializer=_init_decoder, initargs=(options,)) as pool:
+        stream = decoded_stream(pool, items, window=args.batch_size * args.prefetch)
+        try:
+            while True:
+                wait_start = time.perf_counter()
+                batch = list(islice(stream, args.batch_size))
+                stats['decode_wait_s'] += time.perf_counter() - wait_start
+                if not batch:
+                    break
+
+                ok = [d for d in batch if d['error'] is None]
+                outputs = {}
+                if ok:
+                    infer_start = time.perf_counter()
+                    input_tensor = torch.from_numpy(np.stack([d['tensor'] for d in ok])) if has_pytorch else None
+                    images = [d['yolo_image'] for d in ok] if has_yolo else None
+                    outputs = service.predict_batch(input_tensor, images)
+                    stats['inference_s'] += time.perf_counter() - infer_start
+                    for name, output in outputs.items():
+                        model_latency[name] += output['latency_ms']
+
+                rows = build_rows(batch, outputs, model_keys)
+                write_start = time.perf_counter()
+                writer.write(rows)
+                stats['write_s'] += time.perf_counter() - write_start
+
+                stats['batches'] += 1
+                stats['scored'] += len(ok)
+                stats['errors'] += len(batch) - len(ok)
+                stats['partial'] += sum(1 for r in rows if r['status'] == 'partial')
+                stats['decode_ms_total'] += sum(d['decode_ms'] for d in batch)
+
+                now = time.perf_counter()
+                if now - last_progress >= args.progress_every:
+                    processed = stats['scored'] + stats['errors']
+                    print(f"[Batch] {processed} imagenes ({processed / (now - started):.1f} img/s), "
+                          f"{stats['errors']} errores")
+                    last_progress = now
+        finally:
+            writer.close()
+
+    wall = time.perf_counter() - started
+    processed = stats['scored'] + stats['errors']
+    scored = max(1, stats['scored'])
+    return {
+        'images_processed': processed,
+        'images_scored': stats['scored'],
+        'images_failed': stats['errors'],
+        'images_partial': stats['partial'],
+        'images_skipped_resume': skipped,
+        'batches': stats['batches'],
+        'wall_s': round(wall, 3),
+        'throughput_per_s': round(processed / wall, 3) if wall > 0 else 0.0,
+        'decode_ms_per_image': round(stats['decode_ms_total'] / max(1, processed), 2),
+        'decode_wait_s': round(stats['decode_wait_s'], 3),
+        'inference_s': round(stats['inference_s'], 3),
+        'write_s': round(stats['write_s'], 3),
+        'model_ms_per_image': {name: round(total / scored, 2) for name, total in model_latency.items()},
+        'config': {'batch_size': args.batch_size, 'workers': workers, 'torch_threads': threads,
+                   'prefetch_batches': args.prefetch, 'roi_mode': args.roi_mode,
+                   'format': args.format, **budget},
+    }
+
+
+def print_report(report: dict):
+    print("[Batch] Resumen")
+    print(f"  procesadas: {report['images_processed']} (ok={report['images_scored']}, "
+          f"errores={report['images_failed']}, parciales={report['images_partial']}, "
+          f"reanudadas={report['images_skipped_resume']})")
+    print(f"  tiempo: {report['wall_s']}s -> {report['throughput_per_s']} img/s")
+    print(f"  decodificacion: {report['decode_ms_per_image']} ms/img en workers, "
+          f"espera del consumidor {report['decode_wait_s']}s")
+    print(f"  inferencia: {report['inference_s']}s, escritura: {report['write_s']}s")
+    for name, ms in report['model_ms_per_image'].items():
+        print(f"    {name}: {ms} ms/img")
+    if report['wall_s'] > 0 and report['decode_wait_s'] / report['wall_s'] > 0.2:
+        print("  [!] La inferencia espera a la decodificacion: pruebe con mas --workers")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Scoring offline del ensamble sobre un directorio o manifiesto")
+    parser.add_argument('root', nargs='?', default=None, help="Directorio de imagenes (o base de las rutas del manifiesto)")
+    parser.add_argument('--manifest', default=None, help="Archivo con una ruta por linea o CSV con columna 'path'")
+    parser.add_argument('--output', required=True, help="Archivo CSV, o directorio con --format parquet")
+    parser.add_argument('--format', choices=('csv', 'parquet'), default='csv')
+    parser.add_argument('--models-dir', default=os.environ.get("MODELS_DIR", "models_weights"))
+    parser.add_argument('--models', default='', help="Claves separadas por coma (por defecto todos)")
+    parser.add_argument('--batch-size', type=int, default=16)
+    parser.add_argument('--workers', type=int, default=0, help="Procesos de decodificacion (por defecto la mitad de las CPUs)")
+    parser.add_argument('--threads', type=int, default=0, help="Threads intra-op de torch (por defecto el resto de las CPUs)")
+    parser.add_argument('--prefetch', type=int, default=4, help="Batches decodificados por adelantado")
+    parser.add_argument('--roi-mode', choices=('off', 'fundus'), default=None, help="Por defecto ROI_CROP_MODE")
+    parser.add_argument('--flush-rows', type=int, default=2048, help="Filas por archivo Parquet")
+    parser.add_argument('--limit', type=int, default=0, help="Maximo de imagenes nuevas a procesar")
+    parser.add_argument('--progress-every', type=float, default=10.0, help="Segundos entre lineas de progreso")
+    parser.add_argument('--report', default=None, help="Escribir el reporte de throughput en JSON")
+    parser.add_argument('--synthetic', action='store_true', help="Pesos aleatorios (prueba del pipeline sin checkpoints)")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    if not args.root and not args.manifest:
+        parser.error("indique un directorio o --manifest")
+    if args.root and not args.manifest and not os.path.isdir(args.root):
+        parser.error(f"{args.root} no es un directorio")
+    args.models = [m.strip() for m in args.models.split(',') if m.strip()]
+    args.batch_size = max(1, args.batch_size)
+    args.prefetch = max(1, args.prefetch)
+
+    report = run(args)
+    print_report(report)
+    if args.report:
+        from benchmarks.stats import environment_info, write_json
+        write_json(args.report, {'meta': environment_info(), 'report': report})
+        print(f"[Batch] Reporte escrito en {args.report}")
+    all_failed = report['images_processed'] > 0 and report['images_failed'] == report['images_processed']
+    return 1 if all_failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
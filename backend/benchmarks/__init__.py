@@ -0,0 +1 @@
+# Benchmarks offline de inferencia y carga (no requieren checkpoints ni MongoDB)
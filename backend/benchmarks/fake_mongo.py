@@ -0,0 +1,224 @@
+"""
+Sustituto en memoria de la base Motor para pruebas de carga locales.
+
+Implementa solo el subconjunto de la API de colecciones que usa la aplicacion.
+"""
+import asyncio
+import copy
+
+from bson import ObjectId
+
+
+def _get_path(doc: dict, path: str):
+    value = doc
+    for part in path.split('.'):
+        if not isinstance(value, dict) or part not in value:
+            return None
+        value = value[part]
+    return value
+
+
+def _set_path(doc: dict, path: str, value):
+    parts = path.split('.')
+    target = doc
+    for part in parts[:-1]:
+        target = target.setdefault(part, {})
+    target[parts[-1]] = value
+
+
+def _match_value(value, condition) -> bool:
+    if isinstance(condition, dict) and condition and all(k.startswith('$') for k in condition):
+        for op, arg in condition.items():
+            if op == '$gt' and not (value is not None and value > arg):
+                return False
+            if op == '$gte' and not (value is not None and value >= arg):
+                return False
+            if op == '$lt' and not (value is not None and value < arg):
+                return False
+            if op == '$lte' and not (value is not None and value <= arg):
+                return False
+            if op == '$in' and value not in arg:
+                return False
+            if op == '$ne' and value == arg:
+                return False
+            if op == '$exists' and (value is not None) != bool(arg):
+                return False
+        return True
+    return value == condition
+
+
+def matches(doc: dict, query: dict | None) -> bool:
+    if not query:
+        return True
+    for key, condition in query.items():
+        if key == '$or':
+            if not any(matches(doc, sub) for sub in condition):
+                return False
+        elif key == '$and':
+            if not all(matches(doc, sub) for sub in condition):
+                return False
+        elif not _match_value(_get_path(doc, key), condition):
+            return False
+    return True
+
+
+def project(doc: dict, projection: dict | None) -> dict:
+    if not projection:
+        return copy.deepcopy(doc)
+    include = {k for k, v in projection.items() if v and k != '_id'}
+    if include:
+        out = {}
+        for key in include:
+            value = _get_path(doc, key)
+            if value is not None:
+                _set_path(out, key, copy.deepcopy(value))
+        if projection.get('_id', 1):
+            out['_id'] = doc.get('_id')
+        return out
+    out = copy.deepcopy(doc)
+    for key, value in projection.items():
+        if not value:
+            parts = key.split('.')
+            target = out
+            for part in parts[:-1]:
+                target = target.get(part, {}) if isinstance(target, dict) else {}
+            if isinstance(target, dict):
+                target.pop(parts[-1], None)
+    return out
+
+
+class FakeCursor:
+    def __init__(self, docs: list[dict], projection: dict | None = None):
+        self._docs = docs
+        self._projection = projection
+        self._limit = 0
+
+    def sort(self, key_or_list, direction=None):
+        keys = [(key_or_list, direction or 1)] if isinstance(key_or_list, str) else list(key_or_list)
+        for key, order in reversed(keys):
+            self._docs.sort(key=lambda d: (_get_path(d, key) is not None, _get_path(d, key)),
+                            reverse=order < 0)
+        return self
+
+    def limit(self, n: int):
+        self._limit = n
+        return self
+
+    def _results(self) -> list[dict]:
+        docs = self._docs[:self._limit] if self._limit else self._docs
+        return [project(d, self._projection) for d in docs]
+
+    async def to_list(self, length=None):
+        results = self._results()
+        return results[:length] if length else results
+
+    def __aiter__(self):
+        self._iter = iter(self._results())
+        return self
+
+    async def __anext__(self):
+        await asyncio.sleep(0)
+        try:
+            return next(self._iter)
+        except StopIteration:
+            raise StopAsyncIteration
+
+
+class _Result:
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+class FakeCollection:
+    def __init__(self, name: str):
+        self.name = name
+        self.docs: list[dict] = []
+        self.indexes: dict = {}
+
+    def find(self, query=None, projection=None, **kwargs):
+        return FakeCursor([d for d in self.docs if matches(d, query)], projection)
+
+    async def find_one(self, query=None, projection=None, **kwargs):
+        for doc in self.docs:
+            if matches(doc, query):
+                return project(doc, projection)
+        return None
+
+    async def count_documents(self, query=None, **kwargs):
+        return sum(1 for d in self.docs if matches(d, query))
+
+    async def insert_one(self, doc: dict, **kwargs):
+        doc.setdefault('_id', ObjectId())
+        self.docs.append(copy.deepcopy(doc))
+        return _Result(inserted_id=doc['_id'])
+
+    async def insert_many(self, docs: list[dict], ordered=True, **kwargs):
+        ids = []
+        for doc in docs:
+            result = await self.insert_one(doc)
+            ids.append(result.inserted_id)
+        return _Result(inserted_ids=ids)
+
+    def _apply_update(self, doc: dict, update: dict):
+        for key, value in update.get('$set', {}).items():
+            _set_path(doc, key, value)
+        for key, value in update.get('$setOnInsert', {}).items():
+            if _get_path(doc, key) is None:
+                _set_path(doc, key, value)
+        for key, value in update.get('$inc', {}).items():
+            _set_path(doc, key, (_get_path(doc, key) or 0) + value)
+
+    async def update_one(self, query: dict, update: dict, upsert=False, **kwargs):
+        for doc in self.docs:
+            if matches(doc, query):
+                self._apply_update(doc, update)
+                return _Result(matched_count=1, modified_count=1, upserted_id=None)
+        if upsert:
+            doc = {k: v for k, v in query.items() if not k.startswith('$') and not isinstance(v, dict)}
+            doc.setdefault('_id', ObjectId())
+            self._apply_update(doc, update)
+            self.docs.append(doc)
+            return _Result(matched_count=0, modified_count=0, upserted_id=doc['_id'])
+        return _Result(matched_count=0, modified_count=0, upserted_id=None)
+
+    async def delete_one(self, query: dict, **kwargs):
+        for i, doc in enumerate(self.docs):
+            if matches(doc, query):
+                del self.docs[i]
+                return _Result(deleted_count=1)
+        return _Result(deleted_count=0)
+
+    async def bulk_write(self, requests: list, ordered=True, **kwargs):
+        # Atributos internos de pymongo.UpdateOne / InsertOne
+        for req in requests:
+            if hasattr(req, '_filter'):
+                await self.update_one(req._filter, req._doc, upsert=getattr(req, '_upsert', False))
+            else:
+                await self.insert_one(req._doc)
+        return _Result(acknowledged=True)
+
+    async def create_index(self, keys, **kwargs):
+        name = kwargs.get('name') or '_'.join(f"{k}_{v}" for k, v in
+                                              ([(keys, 1)] if isinstance(keys, str) else keys))
+        self.indexes[name] = {'key': keys, **kwargs}
+        return name
+
+    async def index_information(self):
+        return dict(self.indexes)
+
+
+class FakeDatabase:
+    """Base de datos en memoria con colecciones creadas bajo demanda."""
+
+    def __init__(self):
+        self._collections: dict[str, FakeCollection] = {}
+
+    def __getitem__(self, name: str) -> FakeCollection:
+        if name not in self._collections:
+            self._collections[name] = FakeCollection(name)
+        return self._collections[name]
+
+    def __getattr__(self, name: str) -> FakeCollection:
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return self[name]
@@ -0,0 +1,161 @@
+"""
+Benchmark offline de inferencia con pesos sinteticos.
+
+Mide percentiles de latencia y throughput de predict_all y de cada modelo por separado,
+variando batch size, numero de threads y modo de ejecucion. No necesita checkpoints.
+
+Uso (desde backend/):
+    python -m benchmarks.inference --output bench.json
+    python -m benchmarks.inference --baseline bench_baseline.json --tolerance 0.15
+"""
+import argparse
+import contextlib
+import io
+import sys
+import time
+
+import torch
+from PIL import Image
+
+from app.services.model_service import precision_context
+from benchmarks.stats import summarize, environment_info, compare_to_baseline, write_json
+from benchmarks.synthetic import build_synthetic_service, make_fundus_image
+
+PYTORCH_MODES = ['no_grad', 'inference_mode', 'channels_last']
+
+
+def _parse_int_list(value: str) -> list[int]:
+    return [int(v) for v in value.split(',') if v.strip()]
+
+
+def _parse_str_list(value: str) -> list[str]:
+    return [v.strip() for v in value.split(',') if v.strip()]
+
+
+def _time_calls(fn, iterations: int, warmup: int) -> list[float]:
+    for _ in range(warmup):
+        fn()
+    latencies = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+@contextlib.contextmanager
+def _execution_mode(model: torch.nn.Module, mode: str):
+    if mode == 'channels_last':
+        model.to(memory_format=torch.channels_last)
+        try:
+            with torch.no_grad():
+                yield
+        finally:
+            model.to(memory_format=torch.contiguous_format)
+    elif mode == 'inference_mode':
+        with torch.inference_mode():
+            yield
+    else:
+        with torch.no_grad():
+            yield
+
+
+def bench_model(name: str, info: dict, pil_image: Image.Image, batch_size: int, mode: str,
+                iterations: int, warmup: int) -> dict:
+    model = info['model']
+    if info['type'] == 'yolo':
+        images = [pil_image] * batch_size
+        latencies = _time_calls(lambda: model.predict(images, imgsz=224, verbose=False),
+                                iterations, warmup)
+    else:
+        x = torch.randn(batch_size, 3, 224, 224)
+        if info['precision'] == 'bf16_weights':
+            x = x.to(torch.bfloat16)
+        if mode == 'channels_last':
+            x = x.contiguous(memory_format=torch.channels_last)
+        with _execution_mode(model, mode), precision_context(info['precision']):
+            latencies = _time_calls(lambda: model(x), iterations, warmup)
+    return summarize(latencies, items_per_call=batch_size)
+
+
+def run(args) -> dict:
+    model_keys = _parse_str_list(args.models) if args.models else None
+    batch_sizes = _parse_int_list(args.batch_sizes)
+    thread_counts = _parse_int_list(args.threads) if args.threads else [torch.get_num_threads()]
+    modes = _parse_str_list(args.modes)
+
+    print(f"[Bench] Construyendo modelos sinteticos ({args.models or 'todos'}) ...")
+    service = build_synthetic_service(model_keys, seed=args.seed, precision=args.precision)
+    image_bytes = make_fundus_image(size=args.image_size, seed=args.seed)
+    pil_image = Image.open(io.BytesIO(image_bytes)).convert('RGB')
+
+    results = []
+    for threads in thread_counts:
+        torch.set_num_threads(threads)
+
+        if not args.skip_predict_all:
+            for tta in ([False, True] if args.tta else [False]):
+                stats = summarize(_time_calls(lambda: service.predict_all(image_bytes, tta=tta),
+                                              args.iterations, args.warmup))
+                mode = 'tta' if tta else 'default'
+                entry = {'scenario': 'predict_all', 'model': 'ensemble', 'batch_size': 1,
+                         'threads': threads, 'mode': mode, 'precision': args.precision or 'settings',
+                         **stats}
+                results.append(entry)
+                print(f"  predict_all mode={mode} threads={threads}: "
+                      f"p50={stats['p50_ms']}ms p99={stats['p99_ms']}ms")
+
+        if args.skip_models:
+            continue
+
+        for name, info in service.models.items():
+            model_modes = modes if info['type'] == 'pytorch' else ['default']
+            for mode in model_modes:
+                for batch_size in batch_sizes:
+                    stats = bench_model(name, info, pil_image, batch_size, mode,
+                                        args.iterations, args.warmup)
+                    entry = {'scenario': 'model', 'model': name, 'batch_size': batch_size,
+                             'threads': threads, 'mode': mode, 'precision': info['precision'], **stats}
+                    results.append(entry)
+                    print(f"  {name} mode={mode} bs={batch_size} threads={threads}: "
+                          f"p50={stats['p50_ms']}ms thr={stats['throughput_per_s']}/s")
+
+    return {'meta': {**environment_info(), 'args': vars(args)}, 'results': results}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark offline de inferencia (pesos sinteticos)")
+    parser.add_argument('--models', default='', help="Claves separadas por coma (ej. densenet121_ea,vit_b16)")
+    parser.add_argument('--batch-sizes', default='1,4,8')
+    parser.add_argument('--threads', default='', help="Lista de threads intra-op (ej. 1,2,4)")
+    parser.add_argument('--modes', default=','.join(PYTORCH_MODES))
+    parser.add_argument('--precision', default=None, help="fp32, bf16_autocast o bf16_weights (por defecto Settings)")
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--warmup', type=int, default=3)
+    parser.add_argument('--image-size', type=int, default=1024)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--tta', action='store_true', help="Medir tambien predict_all con test-time augmentation")
+    parser.add_argument('--skip-predict-all', action='store_true')
+    parser.add_argument('--skip-models', action='store_true')
+    parser.add_argument('--output', default='bench_results.json')
+    parser.add_argument('--baseline', default=None, help="JSON de una corrida anterior para comparar")
+    parser.add_argument('--tolerance', type=float, default=0.15, help="Regresion permitida en p50 (0.15 = 15%%)")
+    args = parser.parse_args(argv)
+
+    report = run(args)
+    write_json(args.output, report)
+    print(f"[Bench] Resultados escritos en {args.output}")
+
+    if args.baseline:
+        regressions = compare_to_baseline(report['results'], args.baseline, args.tolerance)
+        if regressions:
+            print(f"[Bench] {len(regressions)} regresiones respecto a {args.baseline}:")
+            for r in regressions:
+                print(f"  {r['key']}: {r['baseline']}ms -> {r['current']}ms (x{r['ratio']})")
+            return 1
+        print("[Bench] Sin regresiones respecto al baseline")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,333 @@
+"""
+Harness de carga HTTP end-to-end contra la aplicacion FastAPI.
+
+Ejecuta app.main:app en el mismo proceso (httpx + ASGITransport) con una base Mongo en
+memoria y un ModelService intercambiable (fake, sintetico o real), o bien contra un
+uvicorn local con --url. Reporta latencias p50/p95/p99, throughput, errores y el lag del
+event loop.
+
+Uso (desde backend/):
+    python -m benchmarks.load --duration 30 --concurrency 16 --model-service fake
+    python -m benchmarks.load --rate 50 --mix predict=1,pages=4,page=4,static=2
+    python -m benchmarks.load --url http://127.0.0.1:8000 --concurrency 8
+"""
+import argparse
+import asyncio
+import random
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime
+
+import httpx
+
+from benchmarks.stats import summarize, write_json
+from benchmarks.synthetic import make_fundus_image
+
+SAMPLE_SLUGS = ['inicio', 'modelo', 'proceso']
+DEFAULT_MIX = 'predict=1,pages=3,page=3,static=2'
+
+
+# ---------------------------------------------------------------------------
+# ModelService falso: latencia configurable y bloqueo de CPU como el real
+# ---------------------------------------------------------------------------
+class FakeModelService:
+    def __init__(self, latency_ms: float = 250.0, num_models: int = 5):
+        from app.services.model_service import CLASS_LABELS, SEVERITY_LEVELS
+        self.latency_s = latency_ms / 1000.0
+        self.loaded = True
+        self.loading = False
+        self.models_loaded_count = num_models
+        self.models = {f'Fake-{i}': {'model': None, 'type': 'fake'} for i in range(num_models)}
+        self._labels = CLASS_LABELS
+        self._severities = SEVERITY_LEVELS
+
+    def is_ready(self) -> bool:
+        return True
+
+    def readiness(self) -> dict:
+        return {'ready': True, 'loading': False, 'models_loaded': len(self.models), 'models': {}}
+
+    def model_versions(self) -> dict:
+        return {name: 'fake' for name in self.models}
+
+    def supports_heatmap(self, model_key: str) -> bool:
+        return False
+
+    supports_embedding = supports_heatmap
+
+    def predict_all(self, image_bytes: bytes, *args, **kwargs) -> list[dict]:
+        time.sleep(self.latency_s)
+        return [
+            {
+                'model_name': name,
+                'prediction': self._labels[0],
+                'confidence': 0.9,
+                'severity': self._severities[0],
+                'probabilities': [0.9, 0.04, 0.03, 0.02, 0.01],
+            }
+            for name in self.models
+        ]
+
+
+def install_model_service(service):
+    """Reemplaza el singleton model_service en todos los modulos app.* que lo importaron."""
+    import app.services.model_service as ms_module
+    original = ms_module.model_service
+    for name, module in list(sys.modules.items()):
+        if name.startswith('app.') and getattr(module, 'model_service', None) is original:
+            setattr(module, 'model_service', service)
+
+
+def build_model_service(kind: str, latency_ms: float, models_dir: str):
+    if kind == 'fake':
+        return FakeModelService(latency_ms=latency_ms)
+    if kind == 'synthetic':
+        from benchmarks.synthetic import build_synthetic_service
+        return build_synthetic_service()
+    if kind == 'real':
+        from app.services.model_service import ModelService
+        service = ModelService()
+        service._load_models_sync(models_dir)
+        return service
+    raise ValueError(f"model-service desconocido: {kind}")
+
+
+async def seed_pages(db):
+    now = datetime.utcnow()
+    for i, slug in enumerate(SAMPLE_SLUGS):
+        await db.pages.insert_one({
+            'slug': slug,
+            'title': f'Pagina {slug}',
+            'subtitle': 'Contenido de prueba',
+            'heroImage': '/uploads/img-detallada.jpeg',
+            'sections': [
+                {'title': f'Seccion {j}', 'content': 'Lorem ipsum ' * 80, 'order': j}
+                for j in range(6)
+            ],
+            'metaDescription': '',
+            'isPublished': True,
+            'createdAt': now,
+            'updatedAt': now,
+        })
+
+
+async def build_inprocess_client(args) -> httpx.AsyncClient:
+    from app.core.database import db_instance
+    from app.main import app
+    from benchmarks.fake_mongo import FakeDatabase
+
+    db_instance.db = FakeDatabase()
+    # En modo "reuse" los casi-duplicados (misma imagen base) tambien se responderian sin
+    # inferir; "flag" conserva el costo del dHash y la busqueda en el BK-tree
+    from app.core.config import settings
+    if settings.NEAR_DUPLICATE_MODE == "reuse":
+        settings.NEAR_DUPLICATE_MODE = "flag"
+    await seed_pages(db_instance.db)
+    install_model_service(build_model_service(args.model_service, args.fake_latency_ms, args.models_dir))
+
+    # Los eventos de startup no corren con ASGITransport: iniciar los servicios de fondo a mano
+    from app.services.prediction_recorder import prediction_recorder
+    await prediction_recorder.start()
+
+    transport = httpx.ASGITransport(app=app)
+    return httpx.AsyncClient(transport=transport, base_url='http://loadtest', timeout=args.timeout)
+
+
+# ---------------------------------------------------------------------------
+# Generador de carga
+# ---------------------------------------------------------------------------
+def parse_mix(value: str) -> list[tuple[str, float]]:
+    mix = []
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        mix.append((name.strip(), float(weight or 1)))
+    return mix
+
+
+def make_request_factory(image_bytes: bytes):
+    counter = 0
+
+    def predict(client):
+        # Bytes distintos en cada peticion (contador despues del marcador EOI, que los
+        # decodificadores ignoran): si no, desde el primer flush del recorder todo predict
+        # seria un duplicado exacto respondido desde Mongo, sin inferencia
+        nonlocal counter
+        counter += 1
+        payload = image_bytes + counter.to_bytes(8, 'big')
+        files = {'image': ('fondo.jpg', payload, 'image/jpeg')}
+        return client.post('/api/predict/', files=files)
+
+    def pages(client):
+        return client.get('/api/pages/')
+
+    def page(client):
+        return client.get(f'/api/pages/{random.choice(SAMPLE_SLUGS)}')
+
+    def static(client):
+        return client.get(random.choice(['/', '/health', '/ready', '/modelo']))
+
+    return {'predict': predict, 'pages': pages, 'page': page, 'static': static}
+
+
+class LoadRecorder:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.status_codes = defaultdict(lambda: defaultdict(int))
+
+    def record(self, kind: str, latency_s: float, status_code: int | None):
+        self.latencies[kind].append(latency_s)
+        self.status_codes[kind][str(status_code)] += 1
+        if status_code is None or status_code >= 500:
+            self.errors[kind] += 1
+
+
+async def _issue(kind, factory, client, recorder):
+    start = time.perf_counter()
+    try:
+        response = await factory(client)
+        status_code = response.status_code
+    except Exception:
+        status_code = None
+    recorder.record(kind, time.perf_counter() - start, status_code)
+
+
+async def monitor_event_loop(stop: asyncio.Event, interval_s: float = 0.01) -> list[float]:
+    """Mide el retraso con que el loop despierta una corrutina que duerme `interval_s`."""
+    lags = []
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + interval_s
+        await asyncio.sleep(interval_s)
+        lags.append(max(0.0, loop.time() - expected))
+    return lags
+
+
+async def closed_loop(client, factories, mix, concurrency, deadline, recorder):
+    names = [m[0] for m in mix]
+    weights = [m[1] for m in mix]
+
+    async def worker():
+        while time.perf_counter() < deadline:
+            kind = random.choices(names, weights)[0]
+            await _issue(kind, factories[kind], client, recorder)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+
+async def open_loop(client, factories, mix, rate, concurrency, deadline, recorder):
+    """Llegadas Poisson a `rate` req/s; `concurrency` acota las peticiones en vuelo."""
+    names = [m[0] for m in mix]
+    weights = [m[1] for m in mix]
+    in_flight = asyncio.Semaphore(concurrency)
+    tasks = set()
+
+    async def fire(kind):
+        async with in_flight:
+            await _issue(kind, factories[kind], client, recorder)
+
+    while time.perf_counter() < deadline:
+        kind = random.choices(names, weights)[0]
+        task = asyncio.create_task(fire(kind))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+        await asyncio.sleep(random.expovariate(rate))
+
+    if tasks:
+        await asyncio.gather(*tasks)
+
+
+async def run(args) -> dict:
+    random.seed(args.seed)
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=args.timeout)
+    else:
+        client = await build_inprocess_client(args)
+
+    mix = parse_mix(args.mix)
+    factories = make_request_factory(make_fundus_image(size=args.image_size, seed=args.seed))
+    recorder = LoadRecorder()
+
+    stop = asyncio.Event()
+    lag_task = asyncio.create_task(monitor_event_loop(stop))
+    started = time.perf_counter()
+    deadline = started + args.duration
+
+    async with client:
+        if args.rate:
+            await open_loop(client, factories, mix, args.rate, args.concurrency, deadline, recorder)
+        else:
+            await closed_loop(client, factories, mix, args.concurrency, deadline, recorder)
+
+    elapsed = time.perf_counter() - started
+    stop.set()
+    lags = await lag_task
+
+    if not args.url:
+        from app.services.prediction_recorder import prediction_recorder
+        await prediction_recorder.stop()
+
+    endpoints = {}
+    all_latencies = []
+    for kind, latencies in recorder.latencies.items():
+        all_latencies.extend(latencies)
+        stats = summarize(latencies)
+        stats['throughput_per_s'] = round(len(latencies) / elapsed, 3)
+        endpoints[kind] = {
+            **stats,
+            'errors': recorder.errors[kind],
+            'error_rate': round(recorder.errors[kind] / len(latencies), 4),
+            'status_codes': dict(recorder.status_codes[kind]),
+        }
+
+    overall = summarize(all_latencies) if all_latencies else {}
+    if overall:
+        overall['throughput_per_s'] = round(len(all_latencies) / elapsed, 3)
+        overall['errors'] = sum(recorder.errors.values())
+
+    return {
+        'config': vars(args),
+        'elapsed_s': round(elapsed, 3),
+        'overall': overall,
+        'endpoints': endpoints,
+        'event_loop_lag': summarize(lags) if lags else {},
+    }
+
+
+def _print_report(report: dict):
+    print(f"[Load] Duracion {report['elapsed_s']}s")
+    for kind, s in sorted(report['endpoints'].items()):
+        print(f"  {kind:8s} n={s['iterations']:6d} p50={s['p50_ms']:8.1f}ms p95={s['p95_ms']:8.1f}ms "
+              f"p99={s['p99_ms']:8.1f}ms thr={s['throughput_per_s']:7.1f}/s err={s['error_rate']:.2%}")
+    lag = report['event_loop_lag']
+    if lag:
+        print(f"  event loop lag: p50={lag['p50_ms']}ms p99={lag['p99_ms']}ms max={lag['max_ms']}ms")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Prueba de carga HTTP de la API")
+    parser.add_argument('--url', default=None, help="URL de un uvicorn local (por defecto: en proceso)")
+    parser.add_argument('--model-service', choices=['fake', 'synthetic', 'real'], default='fake')
+    parser.add_argument('--fake-latency-ms', type=float, default=250.0)
+    parser.add_argument('--models-dir', default='models_weights')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help="Pesos por endpoint: predict,pages,page,static")
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--rate', type=float, default=0.0, help="Llegadas por segundo (0 = lazo cerrado)")
+    parser.add_argument('--duration', type=float, default=20.0)
+    parser.add_argument('--timeout', type=float, default=60.0)
+    parser.add_argument('--image-size', type=int, default=1024)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default=None)
+    args = parser.parse_args(argv)
+
+    report = asyncio.run(run(args))
+    _print_report(report)
+    if args.output:
+        write_json(args.output, report)
+        print(f"[Load] Resultados escritos en {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,133 @@
+"""
+Paridad y rendimiento de las precisiones de inferencia (fp32 vs bf16).
+
+Para cada modelo compara las probabilidades de bf16_autocast y bf16_weights contra fp32
+(diferencia absoluta maxima/media y acuerdo top-1), y mide latencia p50 y memoria de pesos.
+Por defecto usa pesos sinteticos; con --models-dir usa los checkpoints reales y con
+--images un directorio de imagenes reales.
+
+Uso (desde backend/):
+    python -m benchmarks.precision --samples 16
+    python -m benchmarks.precision --models-dir models_weights --images /data/fondos --output prec.json
+"""
+import argparse
+import gc
+import io
+import os
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+from app.core.config import settings
+from app.services.model_service import ModelService, PRECISIONS, bf16_supported, preprocess_image
+from benchmarks.stats import summarize, write_json
+from benchmarks.synthetic import build_synthetic_service, make_fundus_image
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.tif', '.tiff')
+
+
+def load_images(images_dir: str | None, samples: int) -> list[bytes]:
+    if not images_dir:
+        return [make_fundus_image(size=768, seed=i) for i in range(samples)]
+    paths = sorted(p for p in os.listdir(images_dir) if p.lower().endswith(IMAGE_EXTENSIONS))[:samples]
+    images = []
+    for path in paths:
+        with open(os.path.join(images_dir, path), 'rb') as f:
+            images.append(f.read())
+    return images
+
+
+def build_service(precision: str, models_dir: str | None, model_keys: list[str] | None) -> ModelService:
+    if models_dir is None:
+        return build_synthetic_service(model_keys, seed=0, precision=precision)
+    settings.MODEL_PRECISION = precision
+    settings.MODEL_PRECISION_OVERRIDES = {}
+    settings.FORCE_BF16 = True
+    service = ModelService()
+    service._load_models_sync(models_dir)
+    return service
+
+
+def weight_bytes(info: dict) -> int:
+    model = info['model']
+    if info['type'] == 'yolo':
+        module = model.predictor.model if getattr(model, 'predictor', None) else model.model
+    else:
+        module = model
+    return sum(p.numel() * p.element_size() for p in module.parameters())
+
+
+def measure(service: ModelService, images: list[bytes]) -> dict:
+    """Probabilidades [N, 5] y latencias por modelo sobre todas las imagenes."""
+    per_model = {name: {'probs': [], 'latencies': []} for name in service.models}
+    for image_bytes in images:
+        for result in service.predict_all(image_bytes):
+            per_model[result['model_name']]['probs'].append(result['probabilities'])
+    # Latencia por modelo aislada del resto del ensamble
+    for name, info in service.models.items():
+        for image_bytes in images:
+            start = time.perf_counter()
+            if info['type'] == 'pytorch':
+                service._predict_pytorch(info, preprocess_image(image_bytes))
+            else:
+                service._predict_yolo(info, Image.open(io.BytesIO(image_bytes)).convert('RGB'))
+            per_model[name]['latencies'].append(time.perf_counter() - start)
+        per_model[name]['weight_bytes'] = weight_bytes(info)
+    return per_model
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Paridad y velocidad fp32 vs bf16")
+    parser.add_argument('--models', default='', help="Claves separadas por coma (solo sinteticos)")
+    parser.add_argument('--models-dir', default=None, help="Usar checkpoints reales")
+    parser.add_argument('--images', default=None, help="Directorio de imagenes (por defecto sinteticas)")
+    parser.add_argument('--samples', type=int, default=8)
+    parser.add_argument('--output', default=None)
+    args = parser.parse_args(argv)
+
+    if not bf16_supported():
+        print("[Precision] AVISO: la CPU no tiene bf16 nativo; las cifras de velocidad no son representativas")
+
+    model_keys = [k for k in args.models.split(',') if k] or None
+    images = load_images(args.images, args.samples)
+
+    measurements = {}
+    for precision in PRECISIONS:
+        print(f"[Precision] Midiendo {precision} ...")
+        service = build_service(precision, args.models_dir, model_keys)
+        measurements[precision] = measure(service, images)
+        del service
+        gc.collect()
+
+    reference = measurements['fp32']
+    report = []
+    for precision in PRECISIONS:
+        for name, data in measurements[precision].items():
+            ref = np.asarray(reference[name]['probs'], dtype=np.float64)
+            cur = np.asarray(data['probs'], dtype=np.float64)
+            diff = np.abs(ref - cur)
+            latency = summarize(data['latencies'])
+            entry = {
+                'model': name,
+                'precision': precision,
+                'max_abs_prob_diff': round(float(diff.max()), 5) if diff.size else 0.0,
+                'mean_abs_prob_diff': round(float(diff.mean()), 5) if diff.size else 0.0,
+                'top1_agreement': round(float(np.mean(ref.argmax(1) == cur.argmax(1))), 4) if ref.size else 1.0,
+                'p50_ms': latency['p50_ms'],
+                'speedup_vs_fp32': round(summarize(reference[name]['latencies'])['p50_ms'] / latency['p50_ms'], 3),
+                'weight_mb': round(data['weight_bytes'] / 2 ** 20, 1),
+            }
+            report.append(entry)
+            print(f"  {name:22s} {precision:14s} top1={entry['top1_agreement']:.3f} "
+                  f"maxdiff={entry['max_abs_prob_diff']:.4f} p50={entry['p50_ms']}ms "
+                  f"x{entry['speedup_vs_fp32']} pesos={entry['weight_mb']}MB")
+
+    if args.output:
+        write_json(args.output, {'bf16_native': bf16_supported(), 'samples': len(images), 'results': report})
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,122 @@
+"""
+Paridad y costo del recorte del disco de retina (ROI_CROP_MODE "off" vs "fundus").
+
+Mide la latencia de preprocesamiento (deteccion en frio, con la caja cacheada y sin
+recorte) y compara las probabilidades de cada modelo entre ambos modos (acuerdo top-1 y
+diferencia absoluta). Por defecto usa pesos e imagenes sinteticas con borde negro; con
+--models-dir usa los checkpoints reales y con --images un directorio de fotos reales.
+
+Uso (desde backend/):
+    python -m benchmarks.roi_parity --samples 16
+    python -m benchmarks.roi_parity --models-dir models_weights --images /data/fondos --output roi.json
+"""
+import argparse
+import hashlib
+import sys
+import time
+
+import numpy as np
+
+from app.services.fundus_roi import FundusRoiCache, detect_fundus_box
+from app.services import model_service as model_module
+from app.services.model_service import preprocess_image
+from benchmarks.precision import build_service, load_images as load_image_dir
+from benchmarks.stats import summarize, write_json
+from benchmarks.synthetic import make_fundus_image
+
+ROI_MODES = ("off", "fundus")
+
+
+def load_images(images_dir: str | None, samples: int, size: int) -> list[bytes]:
+    if images_dir:
+        return load_image_dir(images_dir, samples)
+    # Cuadro 3:2 como el de las camaras de fondo de ojo
+    return [make_fundus_image(size=size, seed=i, aspect=1.5) for i in range(samples)]
+
+
+def time_preprocess(images: list[bytes], digests: list[str], mode: str, repeats: int) -> list[float]:
+    latencies = []
+    for _ in range(repeats):
+        for image_bytes, digest in zip(images, digests):
+            start = time.perf_counter()
+            preprocess_image(image_bytes, digest, mode=mode)
+            latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Paridad y velocidad del recorte ROI del fondo de ojo")
+    parser.add_argument('--models', default='', help="Claves separadas por coma (solo sinteticos)")
+    parser.add_argument('--models-dir', default=None, help="Usar checkpoints reales")
+    parser.add_argument('--images', default=None, help="Directorio de imagenes (por defecto sinteticas)")
+    parser.add_argument('--samples', type=int, default=8)
+    parser.add_argument('--size', type=int, default=2048, help="Alto de las imagenes sinteticas")
+    parser.add_argument('--repeats', type=int, default=3)
+    parser.add_argument('--output', default=None)
+    args = parser.parse_args(argv)
+
+    images = load_images(args.images, args.samples, args.size)
+    digests = [hashlib.sha256(b).hexdigest() for b in images]
+
+    # Deteccion sola
+    detect_latencies, cropped = [], 0
+    for image_bytes in images:
+        start = time.perf_counter()
+        box = detect_fundus_box(image_bytes)
+        detect_latencies.append(time.perf_counter() - start)
+        if box is not None:
+            cropped += 1
+
+    # Preprocesamiento: sin recorte, deteccion en frio (cache vacia) y con la caja cacheada
+    model_module.fundus_roi_cache = FundusRoiCache(len(images) + 1)
+    preprocess = {
+        'off': summarize(time_preprocess(images, digests, 'off', args.repeats)),
+        'fundus_cold': summarize(time_preprocess(images, digests, 'fundus', 1)),
+        'fundus_cached': summarize(time_preprocess(images, digests, 'fundus', args.repeats)),
+    }
+    print(f"[ROI] {cropped}/{len(images)} imagenes recortadas; deteccion p50="
+          f"{summarize(detect_latencies)['p50_ms']}ms")
+    for name, stats in preprocess.items():
+        print(f"  preprocess {name:14s} p50={stats['p50_ms']}ms p95={stats['p95_ms']}ms")
+
+    model_keys = [k for k in args.models.split(',') if k] or None
+    service = build_service('fp32', args.models_dir, model_keys)
+    probs = {mode: {name: [] for name in service.models} for mode in ROI_MODES}
+    original_mode = model_module.settings.ROI_CROP_MODE
+    try:
+        for mode in ROI_MODES:
+            model_module.settings.ROI_CROP_MODE = mode
+            for image_bytes, digest in zip(images, digests):
+                for result in service.predict_all(image_bytes, image_digest=digest):
+                    probs[mode][result['model_name']].append(result['probabilities'])
+    finally:
+        model_module.settings.ROI_CROP_MODE = original_mode
+
+    report = []
+    for name in service.models:
+        ref = np.asarray(probs['off'][name], dtype=np.float64)
+        cur = np.asarray(probs['fundus'][name], dtype=np.float64)
+        diff = np.abs(ref - cur)
+        entry = {
+            'model': name,
+            'max_abs_prob_diff': round(float(diff.max()), 5) if diff.size else 0.0,
+            'mean_abs_prob_diff': round(float(diff.mean()), 5) if diff.size else 0.0,
+            'top1_agreement': round(float(np.mean(ref.argmax(1) == cur.argmax(1))), 4) if ref.size else 1.0,
+        }
+        report.append(entry)
+        print(f"  {name:22s} top1={entry['top1_agreement']:.3f} maxdiff={entry['max_abs_prob_diff']:.4f} "
+              f"meandiff={entry['mean_abs_prob_diff']:.4f}")
+
+    if args.output:
+        write_json(args.output, {
+            'samples': len(images),
+            'cropped': cropped,
+            'detect': summarize(detect_latencies),
+            'preprocess': preprocess,
+            'parity': report,
+        })
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
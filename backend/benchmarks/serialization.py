@@ -0,0 +1,139 @@
+"""
+Costo de serializar la respuesta de /api/predict: ruta anterior vs ruta directa.
+
+- pydantic: SingleModelResult/ConsensusResult/HeatmapResult + MultiModelPredictionResponse,
+  jsonable_encoder (lo que hace FastAPI con response_model) y JSONResponse (json.dumps).
+- direct:   build_prediction_payload + FastJSONResponse (orjson, numpy sin convertir).
+
+Se mide por respuesta en tres tamanos: solo resultados, con mapas Grad-CAM de los modelos
+EA y con mapas + embeddings. Tambien reporta el tamano del cuerpo plano y con gzip.
+
+Uso (desde backend/):
+    python -m benchmarks.serialization --iterations 2000
+    python -m benchmarks.serialization --output serializacion.json
+"""
+import argparse
+import gzip
+import sys
+import time
+
+import numpy as np
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from app.core.serialization import FastJSONResponse
+from app.models.prediction import (
+    ConsensusResult,
+    HeatmapResult,
+    MultiModelPredictionResponse,
+    SingleModelResult,
+)
+from app.routes.prediction import build_prediction_payload
+from app.services.consensus import compute_consensus
+from app.services.model_service import CLASS_LABELS, NUM_CLASSES
+from benchmarks.stats import summarize, write_json
+
+MODEL_KEYS = ['densenet121_ea', 'efficientnet_b0_ea', 'resnet50_ea', 'vit_b16', 'yolov8x_cls']
+EA_KEYS = MODEL_KEYS[:3]
+SEVERITIES = ['none', 'mild', 'moderate', 'severe', 'proliferative']
+DIGEST = 'ab' * 32
+
+
+def make_raw_results(rng: np.random.Generator) -> list[dict]:
+    results = []
+    for key in MODEL_KEYS:
+        probs = rng.dirichlet(np.ones(NUM_CLASSES))
+        idx = int(probs.argmax())
+        results.append({
+            'model_name': key, 'model_key': key, 'latency_ms': 12.3,
+            'prediction': CLASS_LABELS[idx], 'severity': SEVERITIES[idx],
+            'confidence': round(float(probs[idx]), 4),
+            'probabilities': [round(float(p), 4) for p in probs],
+        })
+    return results
+
+
+def make_extras(rng: np.random.Generator, with_heatmaps: bool, with_embeddings: bool):
+    heatmaps = {k: (k, rng.random((7, 7), dtype=np.float32)) for k in EA_KEYS} if with_heatmaps else {}
+    embeddings = {k: rng.standard_normal(256).astype(np.float32) for k in EA_KEYS} if with_embeddings else {}
+    return heatmaps, embeddings
+
+
+def render_pydantic(raw_results, heatmaps, embeddings) -> bytes:
+    """Reproduce la ruta anterior: modelos Pydantic + jsonable_encoder + json.dumps."""
+    results = [SingleModelResult(**{k: v for k, v in r.items() if k in SingleModelResult.model_fields})
+               for r in raw_results]
+    consensus = ConsensusResult(**compute_consensus(raw_results))
+    heatmap_models = {
+        key: HeatmapResult(
+            model_name=name, width=cam.shape[1], height=cam.shape[0],
+            values=[[round(float(v), 3) for v in row] for row in cam],
+            overlay_url=f"/api/predict/heatmaps/{DIGEST}/{key}.png",
+        )
+        for key, (name, cam) in heatmaps.items()
+    }
+    response = MultiModelPredictionResponse(
+        results=results, consensus=consensus, image_filename='fondo.jpg', image_digest=DIGEST,
+        heatmaps=heatmap_models or None,
+        embeddings={k: [round(float(x), 5) for x in v] for k, v in embeddings.items()} or None,
+    )
+    return JSONResponse(jsonable_encoder(response)).body
+
+
+def render_direct(raw_results, heatmaps, embeddings) -> bytes:
+    payload = build_prediction_payload(raw_results, compute_consensus(raw_results), 'fondo.jpg', DIGEST,
+                                       heatmaps, embeddings, None)
+    return FastJSONResponse(payload).body
+
+
+def measure(render, raw_results, heatmaps, embeddings, iterations: int) -> tuple[list[float], bytes]:
+    body = render(raw_results, heatmaps, embeddings)
+    latencies = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        render(raw_results, heatmaps, embeddings)
+        latencies.append(time.perf_counter() - start)
+    return latencies, body
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Microbenchmark de serializacion de /api/predict")
+    parser.add_argument('--iterations', type=int, default=1000)
+    parser.add_argument('--output', default=None)
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(0)
+    raw_results = make_raw_results(rng)
+    scenarios = {
+        'results_only': make_extras(rng, False, False),
+        'heatmaps': make_extras(rng, True, False),
+        'heatmaps_embeddings': make_extras(rng, True, True),
+    }
+
+    report = []
+    for scenario, (heatmaps, embeddings) in scenarios.items():
+        baseline = None
+        for path, render in (('pydantic', render_pydantic), ('direct', render_direct)):
+            latencies, body = measure(render, raw_results, heatmaps, embeddings, args.iterations)
+            stats = summarize(latencies)
+            baseline = baseline or stats['p50_ms']
+            entry = {
+                'scenario': scenario,
+                'path': path,
+                'p50_us': round(stats['p50_ms'] * 1000.0, 1),
+                'p95_us': round(stats['p95_ms'] * 1000.0, 1),
+                'speedup': round(baseline / stats['p50_ms'], 2),
+                'body_bytes': len(body),
+                'gzip_bytes': len(gzip.compress(body, compresslevel=6)),
+            }
+            report.append(entry)
+            print(f"  {scenario:20s} {path:9s} p50={entry['p50_us']:8.1f}us p95={entry['p95_us']:8.1f}us "
+                  f"x{entry['speedup']:<5} cuerpo={entry['body_bytes']}B gzip={entry['gzip_bytes']}B")
+
+    if args.output:
+        write_json(args.output, {'iterations': args.iterations, 'results': report})
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
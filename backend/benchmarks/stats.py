@@ -0,0 +1,69 @@
+"""Utilidades de estadistica y comparacion contra baseline para los benchmarks."""
+import json
+import platform
+import time
+
+import numpy as np
+
+
+def summarize(latencies_s: list[float], items_per_call: int = 1) -> dict:
+    """Percentiles de latencia (ms) y throughput (items/s) de una serie de mediciones."""
+    arr = np.asarray(latencies_s, dtype=np.float64) * 1000.0
+    total_s = float(np.sum(arr)) / 1000.0
+    return {
+        'iterations': int(arr.size),
+        'mean_ms': round(float(arr.mean()), 3),
+        'p50_ms': round(float(np.percentile(arr, 50)), 3),
+        'p90_ms': round(float(np.percentile(arr, 90)), 3),
+        'p95_ms': round(float(np.percentile(arr, 95)), 3),
+        'p99_ms': round(float(np.percentile(arr, 99)), 3),
+        'min_ms': round(float(arr.min()), 3),
+        'max_ms': round(float(arr.max()), 3),
+        'throughput_per_s': round(arr.size * items_per_call / total_s, 3) if total_s > 0 else 0.0,
+    }
+
+
+def environment_info() -> dict:
+    import torch
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+        'torch': torch.__version__,
+        'torch_threads': torch.get_num_threads(),
+        'torch_interop_threads': torch.get_num_interop_threads(),
+    }
+
+
+def result_key(entry: dict) -> tuple:
+    return tuple((k, str(entry.get(k))) for k in ('scenario', 'model', 'batch_size', 'threads', 'mode', 'precision'))
+
+
+def compare_to_baseline(results: list[dict], baseline_path: str, tolerance: float,
+                        metric: str = 'p50_ms') -> list[dict]:
+    """Devuelve las entradas cuyo metric empeoro mas de `tolerance` respecto al baseline."""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)
+
+    previous = {result_key(e): e for e in baseline.get('results', [])}
+    regressions = []
+    for entry in results:
+        old = previous.get(result_key(entry))
+        if old is None or not old.get(metric):
+            continue
+        ratio = entry[metric] / old[metric]
+        if ratio > 1.0 + tolerance:
+            regressions.append({
+                'key': dict(result_key(entry)),
+                'metric': metric,
+                'baseline': old[metric],
+                'current': entry[metric],
+                'ratio': round(ratio, 3),
+            })
+    return regressions
+
+
+def write_json(path: str, payload: dict):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(payload, f, indent=2, ensure_ascii=False)
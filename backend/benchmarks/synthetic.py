@@ -0,0 +1,74 @@
+"""
+Construccion de un ModelService con pesos aleatorios e imagenes sinteticas.
+
+Permite medir rendimiento sin los checkpoints reales (solo importa la arquitectura).
+"""
+import io
+
+import numpy as np
+import torch
+from PIL import Image
+
+from app.services.model_service import (
+    ModelService,
+    NUM_CLASSES,
+    build_vit_b16,
+    get_model_configs,
+)
+
+
+def build_synthetic_yolo(num_classes: int = NUM_CLASSES):
+    """YOLOv8x-cls construido desde el yaml de la arquitectura (sin descargar pesos)."""
+    from ultralytics import YOLO
+    from ultralytics.nn.tasks import ClassificationModel
+
+    yolo = YOLO('yolov8x-cls.yaml', task='classify')
+    ClassificationModel.reshape_outputs(yolo.model, num_classes)
+    yolo.model.names = {i: str(i) for i in range(num_classes)}
+    yolo.model.eval()
+    return yolo
+
+
+def build_synthetic_model(cfg: dict):
+    """Devuelve (modelo, tipo) con pesos aleatorios para una entrada de get_model_configs."""
+    if cfg['checkpoint_key'] == 'yolo':
+        return build_synthetic_yolo(), 'yolo'
+    if cfg['key'] == 'vit_b16':
+        return build_vit_b16(NUM_CLASSES), 'pytorch'
+    return cfg['class'](num_classes=NUM_CLASSES, pretrained=False), 'pytorch'
+
+
+def build_synthetic_service(model_keys: list[str] | None = None, seed: int = 0,
+                            precision: str | None = None) -> ModelService:
+    """ModelService listo para predecir, con los modelos seleccionados (todos por defecto).
+
+    Con la misma semilla los pesos son identicos, lo que permite comparar precisiones."""
+    torch.manual_seed(seed)
+    service = ModelService()
+    for cfg in get_model_configs(models_dir=''):
+        if model_keys and cfg['key'] not in model_keys:
+            continue
+        model, model_type = build_synthetic_model(cfg)
+        service.add_model(cfg['name'], model, model_type, key=cfg['key'], precision=precision)
+    service.models_loaded_count = len(service.models)
+    service.loaded = len(service.models) > 0
+    return service
+
+
+def make_fundus_image(size: int = 1024, seed: int = 0, fmt: str = 'JPEG', aspect: float = 1.0) -> bytes:
+    """Imagen tipo fondo de ojo: disco rojizo con textura sobre un borde negro.
+    Con `aspect` > 1 el cuadro es mas ancho que alto, como en las camaras de fondo de ojo."""
+    rng = np.random.default_rng(seed)
+    width = int(round(size * aspect))
+    yy, xx = np.mgrid[0:size, 0:width]
+    cy, cx = (size - 1) / 2.0, (width - 1) / 2.0
+    mask = (xx - cx) ** 2 + (yy - cy) ** 2 <= (0.45 * size) ** 2
+
+    pixels = np.zeros((size, width, 3), dtype=np.uint8)
+    noise = rng.normal(0, 18, size=(size, width, 3))
+    base = np.array([170, 70, 30], dtype=np.float64)
+    pixels[mask] = np.clip(base + noise[mask], 0, 255).astype(np.uint8)
+
+    buf = io.BytesIO()
+    Image.fromarray(pixels, 'RGB').save(buf, format=fmt, quality=90)
+    return buf.getvalue()
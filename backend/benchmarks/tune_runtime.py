@@ -0,0 +1,108 @@
+"""
+Auto-tuning del reparto de CPU entre workers de inferencia y threads intra-op.
+
+Prueba cada combinacion workers x threads que cabe en las CPUs efectivas del contenedor
+(cuota de cgroup y afinidad), ejecutando predict_all concurrente con pesos sinteticos, y
+recomienda los valores de INFERENCE_WORKERS y TORCH_INTRA_OP_THREADS.
+
+Uso (desde backend/):
+    python -m benchmarks.tune_runtime --duration 20 --objective throughput
+    python -m benchmarks.tune_runtime --models densenet121_ea,resnet50_ea --objective latency
+"""
+import argparse
+import sys
+import threading
+import time
+
+import torch
+
+from app.core.runtime import detect_cpu_budget
+from benchmarks.stats import summarize, write_json
+from benchmarks.synthetic import build_synthetic_service, make_fundus_image
+
+
+def candidate_splits(effective_cpus: int) -> list[tuple[int, int]]:
+    splits = []
+    for workers in range(1, effective_cpus + 1):
+        intra = effective_cpus // workers
+        if intra >= 1 and (workers, intra) not in splits:
+            splits.append((workers, intra))
+    return splits
+
+
+def run_split(service, image_bytes: bytes, workers: int, intra: int, duration: float,
+              warmup: int) -> dict:
+    torch.set_num_threads(intra)
+    latencies = []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def worker():
+        torch.set_num_threads(intra)
+        for _ in range(warmup):
+            service.predict_all(image_bytes)
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            service.predict_all(image_bytes)
+            elapsed = time.perf_counter() - start
+            with lock:
+                latencies.append(elapsed)
+
+    threads = [threading.Thread(target=worker) for _ in range(workers)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - started
+
+    stats = summarize(latencies) if latencies else {'iterations': 0, 'p50_ms': None, 'p95_ms': None}
+    stats['throughput_per_s'] = round(len(latencies) / wall, 3) if wall > 0 else 0.0
+    return {'inference_workers': workers, 'intra_op_threads': intra, **stats}
+
+
+def pick_best(results: list[dict], objective: str) -> dict:
+    measured = [r for r in results if r['iterations']]
+    if objective == 'latency':
+        return min(measured, key=lambda r: r['p95_ms'])
+    return max(measured, key=lambda r: r['throughput_per_s'])
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Auto-tuning de workers/threads de inferencia")
+    parser.add_argument('--models', default='', help="Claves separadas por coma (por defecto todas)")
+    parser.add_argument('--duration', type=float, default=15.0, help="Segundos por combinacion")
+    parser.add_argument('--warmup', type=int, default=1)
+    parser.add_argument('--objective', choices=['throughput', 'latency'], default='throughput')
+    parser.add_argument('--max-workers', type=int, default=4)
+    parser.add_argument('--output', default=None)
+    args = parser.parse_args(argv)
+
+    budget = detect_cpu_budget()
+    print(f"[Tune] Presupuesto de CPU: {budget}")
+    model_keys = [k for k in args.models.split(',') if k] or None
+    service = build_synthetic_service(model_keys)
+    image_bytes = make_fundus_image()
+
+    results = []
+    for workers, intra in candidate_splits(budget['effective_cpus']):
+        if workers > args.max_workers:
+            continue
+        result = run_split(service, image_bytes, workers, intra, args.duration, args.warmup)
+        results.append(result)
+        print(f"  workers={workers} intra={intra}: thr={result['throughput_per_s']}/s "
+              f"p50={result['p50_ms']}ms p95={result['p95_ms']}ms")
+
+    best = pick_best(results, args.objective)
+    print(f"[Tune] Mejor reparto ({args.objective}):")
+    print(f"  INFERENCE_WORKERS={best['inference_workers']}")
+    print(f"  TORCH_INTRA_OP_THREADS={best['intra_op_threads']}")
+
+    if args.output:
+        write_json(args.output, {'budget': budget, 'objective': args.objective,
+                                 'best': best, 'results': results})
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,68 @@
+"""
+Genera variantes .gz y .br de los assets del frontend para PrecompressedStaticFiles.
+
+Se ejecuta en el build de la imagen (ver Dockerfile), una sola vez y con el nivel de
+compresion maximo, para no comprimir en cada peticion. brotli es opcional: si el paquete
+no esta instalado solo se generan los .gz.
+
+Uso:
+    python precompress_static.py /app/public/static
+"""
+import gzip
+import os
+import sys
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_EXTENSIONS = ('.js', '.css', '.html', '.json', '.map', '.svg', '.txt', '.ico')
+# Por debajo de este tamano la compresion no compensa los headers extra
+MIN_SIZE = 1024
+
+
+def precompress(root: str) -> tuple[int, int, int]:
+    files = original_total = compressed_total = 0
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            if not name.endswith(COMPRESSIBLE_EXTENSIONS):
+                continue
+            path = os.path.join(dirpath, name)
+            with open(path, 'rb') as f:
+                data = f.read()
+            if len(data) < MIN_SIZE:
+                continue
+
+            variants = {'.gz': gzip.compress(data, compresslevel=9, mtime=0)}
+            if brotli is not None:
+                variants['.br'] = brotli.compress(data, quality=11)
+
+            for suffix, payload in variants.items():
+                # Solo se guarda si realmente ahorra bytes
+                if len(payload) < len(data):
+                    with open(path + suffix, 'wb') as f:
+                        f.write(payload)
+            files += 1
+            original_total += len(data)
+            compressed_total += min(len(p) for p in variants.values())
+    return files, original_total, compressed_total
+
+
+def main(argv=None) -> int:
+    argv = argv if argv is not None else sys.argv[1:]
+    roots = argv or ['/app/public/static']
+    for root in roots:
+        if not os.path.isdir(root):
+            print(f"[WARN] {root} no existe, se omite")
+            continue
+        files, original, compressed = precompress(root)
+        ratio = compressed / original if original else 1.0
+        print(f"[OK] {root}: {files} archivos precomprimidos "
+              f"({original / 1024:.0f} KB -> {compressed / 1024:.0f} KB, {ratio:.0%})"
+              f"{'' if brotli is not None else ' [solo gzip: brotli no instalado]'}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
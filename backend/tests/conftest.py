@@ -0,0 +1,21 @@
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+
+def _render(size: int = 256, seed: int = 0, fmt: str = "JPEG", **save_kwargs) -> bytes:
+    """Imagen con gradiente y ruido: suficiente estructura para que el dHash sea estable."""
+    rng = np.random.default_rng(seed)
+    ramp = np.linspace(0, 255, size, dtype=np.float32)
+    pixels = (ramp[None, :, None] * 0.6 + ramp[:, None, None] * 0.4
+              + rng.normal(0, 20, (size, size, 3))).clip(0, 255).astype(np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, format=fmt, **save_kwargs)
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def make_image():
+    return _render
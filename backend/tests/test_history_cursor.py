@@ -0,0 +1,22 @@
+from datetime import datetime
+
+import pytest
+from bson import ObjectId
+from fastapi import HTTPException
+
+from app.routes.history import decode_cursor, encode_cursor
+
+
+def test_cursor_round_trip():
+    created_at = datetime(2024, 5, 17, 8, 30, 15, 123456)
+    doc_id = ObjectId()
+    cursor = encode_cursor(created_at, doc_id)
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == (created_at, doc_id)
+
+
+@pytest.mark.parametrize("cursor", ["no-es-un-cursor", encode_cursor(datetime(2024, 1, 1), ObjectId())[:-6], ""])
+def test_invalid_cursor_is_400(cursor):
+    with pytest.raises(HTTPException) as exc:
+        decode_cursor(cursor)
+    assert exc.value.status_code == 400
@@ -0,0 +1,72 @@
+import io
+import os
+
+import pytest
+from fastapi import HTTPException
+from PIL import Image
+
+from app.core.config import settings
+from app.services.ingestion import _ingest_file, sniff_format
+
+
+def _ingest(data: bytes, max_bytes: int = 10 * 1024 * 1024):
+    return _ingest_file(io.BytesIO(data), max_bytes)
+
+
+def test_jpeg_and_png_are_accepted(make_image):
+    ingested = _ingest(make_image(size=128))
+    assert (ingested.format, ingested.width, ingested.height) == ("JPEG", 128, 128)
+    assert _ingest(make_image(size=96, fmt="PNG")).format == "PNG"
+
+
+def test_mpo_jpeg_is_accepted(make_image):
+    """Los JPEG multi-imagen (MPO) de camaras y celulares tienen firma JPEG pero PIL los abre como MPO."""
+    first = Image.open(io.BytesIO(make_image(size=128, seed=1)))
+    second = Image.open(io.BytesIO(make_image(size=128, seed=2)))
+    buffer = io.BytesIO()
+    first.save(buffer, format="MPO", save_all=True, append_images=[second])
+    data = buffer.getvalue()
+    with Image.open(io.BytesIO(data)) as img:
+        assert img.format == "MPO"
+
+    ingested = _ingest(data)
+    assert ingested.format == "JPEG"
+    assert ingested.size == len(data)
+
+
+@pytest.mark.parametrize("data, status_code", [
+    (b"GIF89a" + b"\x00" * 64, 415),
+    (b"\xff\xd8\xff" + b"\x00" * 64, 400),
+    (b"", 400),
+])
+def test_invalid_uploads_are_rejected(data, status_code):
+    with pytest.raises(HTTPException) as exc:
+        _ingest(data)
+    assert exc.value.status_code == status_code
+
+
+def test_size_and_dimension_limits(make_image):
+    with pytest.raises(HTTPException) as exc:
+        _ingest(make_image(size=128), max_bytes=100)
+    assert exc.value.status_code == 413
+
+    with pytest.raises(HTTPException) as exc:
+        _ingest(make_image(size=settings.UPLOAD_MIN_DIMENSION - 1))
+    assert exc.value.status_code == 400
+
+
+def test_large_uploads_are_spooled_to_disk(make_image, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "UPLOAD_SPOOL_BYTES", 1024)
+    monkeypatch.setattr(settings, "UPLOAD_SPOOL_DIR", str(tmp_path))
+    data = make_image(size=256)
+    ingested = _ingest(data)
+    assert isinstance(ingested.source, str) and os.path.exists(ingested.source)
+    assert ingested.read_bytes() == data
+    ingested.cleanup()
+    assert os.listdir(tmp_path) == []
+
+
+def test_sniff_format():
+    assert sniff_format(b"RIFF\x00\x00\x00\x00WEBPVP8 ") == "WEBP"
+    assert sniff_format(b"II*\x00") == "TIFF"
+    assert sniff_format(b"hola") is None
@@ -0,0 +1,63 @@
+import asyncio
+import json
+
+from app.core.limits import BodySizeLimitMiddleware
+
+
+async def _echo_app(scope, receive, send):
+    """App que consume todo el cuerpo antes de responder (como el parseo multipart)."""
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if not message.get("more_body"):
+            break
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": str(len(body)).encode()})
+
+
+def _run(chunks, method="POST", path="/api/predict/", content_length=None, limit=100):
+    calls = {"app": 0}
+
+    async def app(scope, receive, send):
+        calls["app"] += 1
+        await _echo_app(scope, receive, send)
+
+    middleware = BodySizeLimitMiddleware(app, limits={"/api/predict": limit, "/api/predict/big": 10 * limit})
+    headers = [] if content_length is None else [(b"content-length", str(content_length).encode())]
+    scope = {"type": "http", "method": method, "path": path, "headers": headers}
+    pending = [{"type": "http.request", "body": chunk, "more_body": i < len(chunks) - 1}
+               for i, chunk in enumerate(chunks)]
+    received = {"chunks": 0}
+    sent = []
+
+    async def receive():
+        received["chunks"] += 1
+        return pending.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(middleware(scope, receive, send))
+    return sent[0]["status"], b"".join(m.get("body", b"") for m in sent[1:]), calls["app"], received["chunks"]
+
+
+def test_content_length_over_limit_is_rejected_before_the_app():
+    status, body, app_calls, chunks_read = _run([b"x" * 200], content_length=200)
+    assert status == 413
+    assert "tamano maximo" in json.loads(body)["detail"]
+    assert app_calls == 0 and chunks_read == 0
+
+
+def test_chunked_body_is_cut_as_soon_as_it_exceeds_the_limit():
+    status, _, app_calls, chunks_read = _run([b"x" * 60, b"x" * 60, b"x" * 60, b"x" * 60])
+    assert status == 413
+    assert app_calls == 1
+    assert chunks_read == 2  # no espera al resto de la subida
+
+
+def test_bodies_within_limit_and_other_routes_pass_through():
+    assert _run([b"x" * 50, b"x" * 50], content_length=100)[:2] == (200, b"100")
+    assert _run([b"x" * 500], path="/api/predict/big")[:2] == (200, b"500")  # prefijo mas largo
+    assert _run([b"x" * 500], path="/api/pages/")[:2] == (200, b"500")
+    assert _run([b"x" * 500], method="GET")[:2] == (200, b"500")
@@ -0,0 +1,52 @@
+import io
+import random
+
+from PIL import Image
+
+from app.services.near_duplicates import BKTree, NearDuplicateIndex, compute_dhash, format_phash, hamming
+
+
+def test_bktree_search_matches_linear_scan():
+    rng = random.Random(7)
+    values = [rng.getrandbits(64) for _ in range(500)]
+    tree = BKTree()
+    for i, value in enumerate(values):
+        tree.add(value, i)
+
+    query = values[0] ^ 0b1011  # 3 bits de diferencia
+    for radius in (0, 3, 10, 32):
+        expected = sorted((i, hamming(query, v)) for i, v in enumerate(values) if hamming(query, v) <= radius)
+        assert sorted(tree.search(query, radius)) == expected
+    assert tree.size == len(values)
+
+
+def test_bktree_keeps_items_with_identical_hash():
+    tree = BKTree()
+    tree.add(0xFF, "a")
+    tree.add(0xFF, "b")
+    assert sorted(tree.search(0xFF, 0)) == [("a", 0), ("b", 0)]
+    assert BKTree().search(0xFF, 64) == []
+
+
+def test_dhash_is_robust_to_recompression_and_resize(make_image):
+    original = make_image(size=512, seed=1)
+    with Image.open(io.BytesIO(original)) as img:
+        buffer = io.BytesIO()
+        img.resize((384, 384)).save(buffer, format="JPEG", quality=60)
+    assert hamming(compute_dhash(original), compute_dhash(buffer.getvalue())) <= 6
+
+    flipped = io.BytesIO()
+    with Image.open(io.BytesIO(original)) as img:
+        img.transpose(Image.FLIP_LEFT_RIGHT).save(flipped, format="JPEG")
+    assert hamming(compute_dhash(original), compute_dhash(flipped.getvalue())) > 16
+
+
+def test_near_duplicate_index_returns_closest_digest():
+    index = NearDuplicateIndex()
+    index.add("lejos", 0x0F)
+    index.add("cerca", 0x01)
+    index.add("cerca", 0xFFFF)  # digest repetido: se ignora
+    assert index.size == 2
+    assert index.lookup(0x00, max_distance=4) == ("cerca", 1)
+    assert index.lookup(0xFFFF_0000, max_distance=4) is None
+    assert format_phash(0xAB) == "00000000000000ab"
@@ -0,0 +1,58 @@
+from app.services.page_cache import LIST_KEY, PageCache, compute_etag, etag_matches, page_key, summary_key
+
+
+def test_etag_matches_strong_weak_lists_and_wildcard():
+    etag = '"abc"'
+    assert etag_matches('"abc"', etag)
+    assert etag_matches('W/"abc"', etag)
+    assert etag_matches('"x", W/"abc"', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches('"abcd"', etag)
+    assert not etag_matches(None, etag)
+    assert not etag_matches("", etag)
+
+
+def test_etag_changes_with_updated_at():
+    assert compute_etag([{"_id": 1, "updatedAt": "a"}]) != compute_etag([{"_id": 1, "updatedAt": "b"}])
+
+
+def test_invalidate_slug_drops_page_and_listings_only():
+    cache = PageCache(ttl_seconds=60)
+    generation = cache.generation
+    cache.put(page_key("inicio"), {"slug": "inicio"}, [], generation)
+    cache.put(page_key("modelo"), {"slug": "modelo"}, [], generation)
+    cache.put(LIST_KEY, [], [], generation)
+    cache.put(summary_key(("slug",), None, 10), [], [], generation)
+
+    cache.invalidate("inicio")
+    assert cache.get(page_key("inicio")) is None
+    assert cache.get(LIST_KEY) is None
+    assert cache.get(summary_key(("slug",), None, 10)) is None
+    assert cache.get(page_key("modelo")) is not None
+
+    cache.invalidate()
+    assert cache.get(page_key("modelo")) is None
+
+
+def test_put_after_concurrent_invalidation_is_not_cached():
+    cache = PageCache(ttl_seconds=60)
+    generation = cache.generation
+    cache.invalidate("inicio")  # escritura mientras se leia de Mongo
+    entry = cache.put(page_key("inicio"), {"slug": "inicio"}, [], generation)
+    assert entry.body
+    assert cache.get(page_key("inicio")) is None
+
+
+def test_ttl_and_lru_bound(monkeypatch):
+    cache = PageCache(ttl_seconds=0.0, max_entries=2)
+    cache.put(page_key("a"), {}, [], cache.generation)
+    assert cache.get(page_key("a")) is None  # vencida
+
+    cache = PageCache(ttl_seconds=60, max_entries=2)
+    for slug in ("a", "b"):
+        cache.put(page_key(slug), {}, [], cache.generation)
+    cache.get(page_key("a"))  # "b" pasa a ser la menos usada
+    cache.put(page_key("c"), {}, [], cache.generation)
+    assert cache.get(page_key("b")) is None
+    assert cache.get(page_key("a")) is not None
+    assert cache.status()["entries"] == 2
@@ -0,0 +1,89 @@
+import asyncio
+
+from app.services import page_search
+from app.services.page_search import PageSearchIndex, build_snippet, tokenize
+
+
+def _page(slug, title, content="", published=True):
+    return {"slug": slug, "title": title, "sections": [{"title": "", "content": content}],
+            "isPublished": published}
+
+
+def test_tokenize_folds_accents_stopwords_and_plurals():
+    assert tokenize("Las Imágenes de los Modelos") == ["imagen", "modelo"]
+    assert tokenize("Retinopatía DIABÉTICA") == ["retinopatia", "diabetica"]
+    assert tokenize("") == []
+
+
+def test_bm25_ranks_title_matches_first():
+    index = PageSearchIndex()
+    index.upsert(_page("contenido", "Inicio", "la retinopatia diabetica se detecta con modelos"))
+    index.upsert(_page("titulo", "Retinopatia", "texto general"))
+    index.upsert(_page("nada", "Contacto", "correo y telefono"))
+
+    slugs = [hit["slug"] for hit in index.search("retinopatia")]
+    assert slugs == ["titulo", "contenido"]
+
+
+def test_prefix_match_on_last_term_and_snippet():
+    index = PageSearchIndex()
+    index.upsert(_page("modelo", "Arquitectura", "Usamos una red convolucional profunda"))
+    hits = index.search("convol")
+    assert [hit["slug"] for hit in hits] == ["modelo"]
+    assert "<mark>convolucional</mark>" in hits[0]["snippet"]
+    assert build_snippet("<b>sin coincidencias</b>", {"retina"}) is None
+
+
+def test_unpublished_and_removed_pages_are_not_indexed():
+    index = PageSearchIndex()
+    index.upsert(_page("borrador", "Retina", published=False))
+    index.upsert(_page("publica", "Retina"))
+    index.remove("publica")
+    assert index.size == 0
+    assert index.search("retina") == []
+
+
+class _SlowCursor:
+    """Cursor asincrono que cede el loop entre documentos para intercalar escrituras."""
+
+    def __init__(self, docs, on_first):
+        self.docs = list(docs)
+        self.on_first = on_first
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if not self.docs:
+            raise StopAsyncIteration
+        await asyncio.sleep(0)
+        if self.on_first:
+            self.on_first()
+            self.on_first = None
+        return self.docs.pop(0)
+
+
+def test_writes_during_load_survive_the_swap(monkeypatch):
+    index = PageSearchIndex()
+    index.upsert(_page("vieja", "Glaucoma"))
+
+    def concurrent_writes():
+        index.upsert(_page("nueva", "Catarata"))
+        index.remove("vieja")
+
+    cursor = _SlowCursor([_page("vieja", "Glaucoma"), _page("otra", "Miopia")], concurrent_writes)
+
+    class _Pages:
+        def find(self, *args, **kwargs):
+            return cursor
+
+    class _Db:
+        pages = _Pages()
+
+    monkeypatch.setattr(page_search, "get_database", lambda: _Db())
+    asyncio.run(index.load_from_db())
+
+    assert index.loaded
+    assert [hit["slug"] for hit in index.search("catarata")] == ["nueva"]
+    assert index.search("glaucoma") == []
+    assert [hit["slug"] for hit in index.search("miopia")] == ["otra"]
@@ -0,0 +1,53 @@
+from datetime import datetime
+
+from app.services.prediction_analytics import build_increments
+
+
+def _record(day, severity, model_severities, prediction="Sin DR", tta=False):
+    results = [
+        {"model_key": f"m{i}", "model_name": f"M{i}", "prediction": "Error" if s is None else "x",
+         "severity": s or "none"}
+        for i, s in enumerate(model_severities)
+    ]
+    agreement = sum(1 for s in model_severities if s == severity)
+    return {
+        "createdAt": datetime(2024, 3, day, 12),
+        "consensus": {"prediction": prediction, "severity": severity,
+                      "agreement_count": agreement, "total_models": len(model_severities)},
+        "results": results,
+        "options": {"tta": tta},
+    }
+
+
+def test_build_increments_groups_by_day():
+    increments = build_increments([
+        _record(1, "none", ["none", "none"], tta=True),
+        _record(1, "mild", ["mild", "none"]),
+        _record(2, "none", ["none", None]),
+        _record(2, "none", ["none", "none"], prediction="Error"),
+    ])
+
+    day1 = increments["2024-03-01"]
+    assert day1["total"] == 2
+    assert day1["severity.none"] == 1 and day1["severity.mild"] == 1
+    assert day1["unanimous"] == 1
+    assert day1["tta"] == 1
+    assert day1["agreement.2"] == 1 and day1["agreement.1"] == 1
+    assert day1["models.m1.disagree"] == 1
+    assert day1["models.m0.total"] == 2
+
+    day2 = increments["2024-03-02"]
+    assert day2["total"] == 2
+    assert day2["errors"] == 1
+    assert day2["models.m1.errors"] == 1
+    assert "models.m0.severity.none" in day2
+
+
+def test_model_names_are_safe_mongo_fields():
+    record = _record(1, "none", ["none"])
+    record["results"][0]["model_key"] = "$modelo.v2"
+    assert "models.modelo_v2.total" in build_increments([record])["2024-03-01"]
+
+
+def test_build_increments_empty():
+    assert build_increments([]) == {}
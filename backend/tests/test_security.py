@@ -0,0 +1,67 @@
+import time
+
+import pytest
+from fastapi import HTTPException
+
+from app.core import security
+from app.core.security import LoginThrottle, TokenCache, sign_resource, verify_resource_token
+
+
+def test_login_throttle_blocks_after_max_failures():
+    throttle = LoginThrottle(max_failures=3, window_seconds=60)
+    for _ in range(3):
+        throttle.check("ip:1")
+        throttle.record_failure("ip:1")
+
+    with pytest.raises(HTTPException) as exc:
+        throttle.check("ip:1")
+    assert exc.value.status_code == 429
+    assert 0 < int(exc.value.headers["Retry-After"]) <= 60
+    throttle.check("ip:2")  # otras claves no se ven afectadas
+
+
+def test_login_throttle_window_and_reset(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(security.time, "monotonic", lambda: now[0])
+    throttle = LoginThrottle(max_failures=2, window_seconds=10)
+    throttle.record_failure("ip:1")
+    throttle.record_failure("ip:1")
+    with pytest.raises(HTTPException):
+        throttle.check("ip:1")
+
+    now[0] += 10.5  # los fallos salen de la ventana
+    throttle.check("ip:1")
+
+    throttle.record_failure("ip:1")
+    throttle.record_failure("ip:1")
+    throttle.reset("ip:1")
+    throttle.check("ip:1")
+
+
+def test_token_cache_expiry_and_lru():
+    cache = TokenCache(max_entries=2)
+    cache.put("vencido", {"sub": "a", "exp": time.time() - 1})
+    assert cache.get("vencido") is None
+    cache.put("sin-exp", {"sub": "a"})
+    assert cache.get("sin-exp") is None
+
+    exp = time.time() + 60
+    cache.put("t1", {"sub": "1", "exp": exp})
+    cache.put("t2", {"sub": "2", "exp": exp})
+    assert cache.get("t1")["sub"] == "1"  # t2 pasa a ser el menos usado
+    cache.put("t3", {"sub": "3", "exp": exp})
+    assert cache.get("t2") is None
+    assert cache.get("t1") is not None and cache.get("t3") is not None
+
+    payload = cache.get("t1")
+    payload["sub"] = "modificado"
+    assert cache.get("t1")["sub"] == "1"  # devuelve copias
+
+
+def test_resource_token_is_bound_to_resource_and_expires():
+    token = sign_resource("heatmap:abc:vit_b16:0", ttl_seconds=60)
+    assert verify_resource_token("heatmap:abc:vit_b16:0", token)
+    assert not verify_resource_token("heatmap:abc:vit_b16:1", token)
+    assert not verify_resource_token("heatmap:abc:vit_b16:0", None)
+    assert not verify_resource_token("heatmap:abc:vit_b16:0", "basura")
+    assert not verify_resource_token("heatmap:abc:vit_b16:0", sign_resource("heatmap:abc:vit_b16:0", -1))
@@ -0,0 +1,9 @@
+from app.core.static_files import accepted_encodings
+
+
+def test_accepted_encodings():
+    assert accepted_encodings("gzip, deflate, br") == {"gzip", "deflate", "br"}
+    assert accepted_encodings("br;q=1.0, GZIP;q=0.5") == {"br", "gzip"}
+    assert accepted_encodings("br;q=0, gzip") == {"gzip"}
+    assert accepted_encodings("gzip; q=0.000") == set()
+    assert accepted_encodings("") == set()
@@ -0,0 +1,67 @@
+import numpy as np
+
+from app.services.vector_index import EmbeddingStore, VectorIndex
+
+
+def _brute_force(vectors: np.ndarray, query: np.ndarray, k: int) -> list[int]:
+    normed = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    scores = normed @ (query / np.linalg.norm(query))
+    return list(np.argsort(-scores)[:k])
+
+
+def test_search_matches_brute_force_across_blocks(tmp_path, monkeypatch):
+    import app.services.vector_index as vector_index
+    monkeypatch.setattr(vector_index, "SEARCH_BLOCK_ROWS", 32)  # varios bloques con pocas filas
+
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(200, 16)).astype(np.float32)
+    index = VectorIndex(str(tmp_path), dim=16, initial_capacity=8)  # obliga a crecer
+    for i, vector in enumerate(vectors):
+        index.add(f"id{i}", vector)
+
+    queries = rng.normal(size=(3, 16)).astype(np.float32)
+    results = index.search(queries, k=5)
+    for query, hits in zip(queries, results):
+        assert [id_ for id_, _ in hits] == [f"id{i}" for i in _brute_force(vectors, query, 5)]
+        scores = [score for _, score in hits]
+        assert scores == sorted(scores, reverse=True)
+
+
+def test_search_excludes_ids_and_handles_empty_index(tmp_path):
+    index = VectorIndex(str(tmp_path), dim=4)
+    assert index.search(np.ones(4), k=3) == [[]]
+
+    index.add("a", np.array([1, 0, 0, 0], dtype=np.float32))
+    index.add("b", np.array([0.9, 0.1, 0, 0], dtype=np.float32))
+    index.add("c", np.array([0, 1, 0, 0], dtype=np.float32))
+    hits = index.search(np.array([1, 0, 0, 0], dtype=np.float32), k=2, exclude={"a"})[0]
+    assert [id_ for id_, _ in hits] == ["b", "c"]
+
+
+def test_reopen_after_close_keeps_vectors(tmp_path):
+    index = VectorIndex(str(tmp_path), dim=4, flush_every=1000)
+    index.add("a", np.array([3, 4, 0, 0], dtype=np.float32))
+    index.add("a", np.array([0, 0, 1, 0], dtype=np.float32))  # reemplaza la fila
+    index.close()
+
+    reopened = VectorIndex(str(tmp_path), dim=4)
+    assert reopened.ids == ["a"]
+    np.testing.assert_allclose(reopened.get("a"), [0, 0, 1, 0])
+
+
+def test_unsynced_adds_are_dropped_consistently_after_crash(tmp_path):
+    index = VectorIndex(str(tmp_path), dim=4, flush_every=2, flush_interval=3600)
+    for i in range(3):
+        index.add(f"id{i}", np.ones(4, dtype=np.float32))
+    # Sin close(): solo las dos primeras altas se sincronizaron
+    reopened = VectorIndex(str(tmp_path), dim=4)
+    assert reopened.ids == ["id0", "id1"]
+
+
+def test_embedding_store_similar(tmp_path):
+    store = EmbeddingStore(str(tmp_path), dim=4)
+    assert store.similar("m", "missing") is None
+    store.add("m", "a", np.array([1, 0, 0, 0], dtype=np.float32))
+    store.add("m", "b", np.array([1, 0.2, 0, 0], dtype=np.float32))
+    assert [id_ for id_, _ in store.similar("m", "a", k=5)] == ["b"]
+    store.close()
@@ -83,6 +83,16 @@ export const pagesAPI = {
     return fetchWithAuth(`${API_BASE_URL}/pages`);
   },
 
+  // Listado liviano para menús: solo slug y título (o los campos indicados)
+  getSummary: async ({ fields, cursor, limit } = {}) => {
+    const params = new URLSearchParams();
+    if (fields) params.set('fields', fields);
+    if (cursor) params.set('cursor', cursor);
+    if (limit) params.set('limit', limit);
+    const query = params.toString();
+    return fetchWithAuth(`${API_BASE_URL}/pages/summary${query ? `?${query}` : ''}`);
+  },
+
   getBySlug: async (slug) => {
     return fetchWithAuth(`${API_BASE_URL}/pages/${slug}`);
   },